@@ -0,0 +1,106 @@
+# accounts.py
+"""
+등록 계정(ERAccount)의 ER userId 관리.
+
+등록할 때 닉네임 → userId 를 한 번 풀어서 저장해 두면, 닉네임을 생략한 명령어는
+닉네임 조회(호출 한도를 쓰는 API 1회) 없이 바로 userId 로 시작할 수 있다.
+저장된 userId 는 gameSync 루프가 ACCOUNT_REVALIDATE_AGE 마다 다시 확인하고,
+게임 기록에 찍힌 닉네임이 바뀌었으면 등록 닉네임도 따라 바꾼다.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_
+
+import history
+from db import SessionLocal
+from models import ERAccount, User
+
+ACCOUNT_REVALIDATE_AGE = 86400  # 저장된 userId 재확인 주기 (초)
+
+
+def active_account(discord_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """활성 닉네임과 저장된 ER userId (등록 안 했으면 (None, None), userId 를 모르면 (닉네임, None))"""
+    session = SessionLocal()
+    try:
+        user = session.get(User, discord_id)
+        nickname = user.active_er_nickname if user else None
+        if not nickname:
+            return None, None
+        row = (
+            session.query(ERAccount.er_user_id)
+            .filter(ERAccount.user_id == discord_id, ERAccount.nickname == nickname)
+            .first()
+        )
+        return nickname, row[0] if row else None
+    finally:
+        session.close()
+
+
+def save_user_id(nickname: str, er_user_id: Optional[str]):
+    """
+    이 닉네임으로 등록된 계정에 userId 저장 + 확인 시각 갱신 (None 이면 없는 닉네임이라는 기록만).
+    ER API가 실제로 답한 결과만 저장할 것 — 장애로 확인하지 못했으면 부르지 않아야 다음 주기에 다시 확인한다.
+    """
+    session = SessionLocal()
+    try:
+        (
+            session.query(ERAccount)
+            .filter(ERAccount.nickname == nickname)
+            .update({"er_user_id": er_user_id, "verified_at": datetime.now()}, synchronize_session=False)
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    if er_user_id:
+        history.remember_nickname(er_user_id, nickname)
+
+
+def stale_accounts(limit: int) -> List[Tuple[str, Optional[str]]]:
+    """한 번도 확인하지 않았거나 확인한 지 오래된 계정 (닉네임, userId) — 확인 안 한 계정부터"""
+    cutoff = datetime.now() - timedelta(seconds=ACCOUNT_REVALIDATE_AGE)
+    session = SessionLocal()
+    try:
+        rows = (
+            session.query(ERAccount.nickname, ERAccount.er_user_id)
+            .filter(or_(ERAccount.verified_at.is_(None), ERAccount.verified_at < cutoff))
+            .order_by(ERAccount.verified_at.is_not(None), ERAccount.verified_at)
+            .limit(limit)
+            .all()
+        )
+        return [(n, uid) for n, uid in rows]
+    finally:
+        session.close()
+
+
+def track_nickname(er_user_id: str, nickname: str) -> List[str]:
+    """
+    userId 의 현재 닉네임이 등록 닉네임과 다르면 등록 닉네임(과 활성 닉네임)을 바꾼다.
+    반환: 바뀌기 전 닉네임 목록
+    """
+    session = SessionLocal()
+    try:
+        accounts = (
+            session.query(ERAccount)
+            .filter(ERAccount.er_user_id == er_user_id, ERAccount.nickname != nickname)
+            .all()
+        )
+        old_names = sorted({a.nickname for a in accounts})
+        for account in accounts:
+            user = session.get(User, account.user_id)
+            if user and user.active_er_nickname == account.nickname:
+                user.active_er_nickname = nickname
+            account.nickname = nickname
+            account.verified_at = datetime.now()
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    if old_names:
+        history.remember_nickname(er_user_id, nickname)
+    return old_names
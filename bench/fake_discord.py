@@ -0,0 +1,184 @@
+# bench/fake_discord.py
+"""
+벤치마크용 가짜 Discord 계층.
+실제 cog 명령어 콜백이 사용하는 만큼만 commands.Context / Message 흉내를 낸다.
+Discord로 나간 요청 수와 업로드 바이트 수를 기록한다.
+"""
+import asyncio
+import io
+import itertools
+import os
+from dataclasses import dataclass, field
+
+import discord
+
+_ids = itertools.count(1_000_000)
+
+
+@dataclass
+class DiscordTraffic:
+    """한 명령어 실행 동안 Discord REST로 나갔을 요청 기록"""
+    sends: int = 0
+    edits: int = 0
+    deletes: int = 0
+    bytes_uploaded: int = 0
+    last_embeds: list = field(default_factory=list)
+
+    @property
+    def requests(self) -> int:
+        return self.sends + self.edits + self.deletes
+
+
+def _file_size(f: discord.File) -> int:
+    fp = f.fp
+    try:
+        pos = fp.tell()
+        fp.seek(0, os.SEEK_END)
+        size = fp.tell() - f._original_pos
+        fp.seek(pos)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+
+def _record_payload(traffic: DiscordTraffic, kwargs: dict):
+    files = list(kwargs.get("files") or [])
+    if kwargs.get("file") is not None:
+        files.append(kwargs["file"])
+    for f in files:
+        traffic.bytes_uploaded += _file_size(f)
+        f.close()
+    embeds = kwargs.get("embeds") or ([kwargs["embed"]] if kwargs.get("embed") else [])
+    if embeds:
+        traffic.last_embeds = embeds
+    for e in embeds:
+        traffic.bytes_uploaded += len(str(e.to_dict()).encode("utf-8"))
+    if kwargs.get("content"):
+        traffic.bytes_uploaded += len(str(kwargs["content"]).encode("utf-8"))
+
+
+class FakeAvatar:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+
+class FakeAuthor:
+    def __init__(self, user_id: int, name: str = "bench"):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.display_avatar = FakeAvatar()
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeAttachment:
+    def __init__(self, data: bytes, filename: str = "lobby.png"):
+        self._data = data
+        self.filename = filename
+        self.size = len(data)
+
+    async def read(self) -> bytes:
+        return self._data
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", content=None, embeds=None, attachments=None, author=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embeds = embeds or []
+        self.attachments = attachments or []
+        self.author = author
+        self.guild = channel.guild
+        self.jump_url = f"https://discord.com/channels/{channel.guild.id}/{channel.id}/{self.id}"
+
+    async def edit(self, **kwargs):
+        await self.channel.rest_delay()
+        self.channel.traffic.edits += 1
+        _record_payload(self.channel.traffic, kwargs)
+        if "content" in kwargs:
+            self.content = kwargs["content"]
+        return self
+
+    async def delete(self, **kwargs):
+        await self.channel.rest_delay()
+        self.channel.traffic.deletes += 1
+
+    async def add_reaction(self, emoji):
+        await self.channel.rest_delay()
+        self.channel.traffic.sends += 1
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+    def get_channel(self, channel_id):
+        return None
+
+
+class FakeChannel:
+    def __init__(self, guild: FakeGuild, traffic: DiscordTraffic, rest_latency: float = 0.0):
+        self.id = next(_ids)
+        self.guild = guild
+        self.traffic = traffic
+        self.rest_latency = rest_latency
+
+    async def rest_delay(self):
+        if self.rest_latency:
+            await asyncio.sleep(self.rest_latency)
+
+    async def send(self, content=None, **kwargs):
+        await self.rest_delay()
+        self.traffic.sends += 1
+        _record_payload(self.traffic, {"content": content, **kwargs})
+        return FakeMessage(self, content=content)
+
+    def typing(self):
+        return _NullTyping()
+
+
+class _NullTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeContext:
+    """commands.Context 대역. 명령어 콜백에 그대로 넘긴다."""
+    def __init__(
+        self, author_id: int = 1, guild_id: int = 1, attachments: list = None,
+        rest_latency: float = 0.0, content: str = "",
+    ):
+        self.traffic = DiscordTraffic()
+        self.guild = FakeGuild(guild_id)
+        self.channel = FakeChannel(self.guild, self.traffic, rest_latency)
+        self.author = FakeAuthor(author_id)
+        self.message = FakeMessage(self.channel, content=content, attachments=attachments or [], author=self.author)
+        self.bot = None
+        self.command = None
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    def typing(self):
+        return _NullTyping()
+
+
+def blank_lobby_png(size=(1920, 1080)) -> bytes:
+    """대기분석용 더미 스크린샷"""
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", size, (30, 30, 40)).save(buf, format="PNG")
+    return buf.getvalue()
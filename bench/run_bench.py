@@ -0,0 +1,355 @@
+# bench/run_bench.py
+"""
+명령어 end-to-end 벤치마크.
+
+실제 cog 명령어 콜백을 가짜 Context(bench/fake_discord.py)로 호출하고,
+ER API는 로컬 대역 서버(tools/mock_er_api.py), Gemini는 고정 응답으로 바꿔서
+명령어별 지연시간(p50/p95/p99), 명령어당 API 호출 수, 업로드 바이트를 측정한다.
+
+  python bench/run_bench.py                       # 전체 시나리오, 기본 설정
+  python bench/run_bench.py -s record,rank -n 30  # 일부 시나리오만
+  python bench/run_bench.py --warm                # 같은 닉네임 반복 (캐시 적중 경로)
+  python bench/run_bench.py --json bench_output.json
+
+DB는 임시 SQLite 파일을 쓰므로 bot_database.db 는 건드리지 않는다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ["record", "rank", "lobby", "profile", "union", "match"]
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="명령어 end-to-end 벤치마크")
+    p.add_argument("-s", "--scenarios", default=",".join(SCENARIOS),
+                   help=f"쉼표로 구분 ({', '.join(SCENARIOS)})")
+    p.add_argument("-n", "--iterations", type=int, default=10, help="시나리오당 실행 횟수")
+    p.add_argument("-c", "--concurrency", type=int, default=1, help="동시에 실행할 명령어 수")
+    p.add_argument("--warm", action="store_true", help="매번 같은 닉네임 사용 (기본은 매번 새 닉네임)")
+    p.add_argument("--port", type=int, default=18080, help="대역 서버 포트")
+    p.add_argument("--api-base", default=None, help="이미 떠 있는 대역 서버 주소 (지정 시 직접 띄우지 않음)")
+    p.add_argument("--rps", type=float, default=1, help="대역 서버/클라이언트 초당 호출 한도")
+    p.add_argument("--latency-ms", type=float, default=80.0, help="대역 서버 응답 지연")
+    p.add_argument("--jitter-ms", type=float, default=30.0, help="대역 서버 응답 지연 편차")
+    p.add_argument("--error-429-rate", type=float, default=0.0, help="대역 서버 무작위 429 비율")
+    p.add_argument("--gemini-ms", type=float, default=1500.0, help="가짜 Gemini 응답 지연")
+    p.add_argument("--discord-ms", type=float, default=0.0, help="가짜 Discord REST 지연")
+    p.add_argument("--json", default=None, help="결과를 JSON 파일로 저장")
+    return p.parse_args(argv)
+
+
+# ────────────────────────────────────────────
+# 가짜 Gemini
+# ────────────────────────────────────────────
+STREAM_CHUNK = 64  # 가짜 스트리밍 응답 조각 크기 (글자)
+
+
+def lobby_ocr_text(tag: str, teams: int = 8, per_team: int = 3) -> str:
+    """대기창 OCR 결과 형식(JSON)의 고정 응답 (팀마다 비공개 닉네임 하나씩 섞음)"""
+    result = []
+    for t in range(1, teams + 1):
+        players = []
+        for p in range(per_team):
+            y = 60 + (t - 1) * 110 + p * 30
+            name = f"실험체{t}" if p == per_team - 1 else f"{tag}-{t}{p}"
+            players.append({"name": name, "box": [y, 80, y + 25, 260], "confidence": 0.9, "alternates": []})
+        result.append({"team": t, "players": players})
+    return json.dumps({"teams": result}, ensure_ascii=False)
+
+
+class FakeGemini:
+    """genai.Client 대역. 팀 추출 프롬프트에는 대기창 JSON, 재질의에는 빈 객체"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.tag = "bench"
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content_stream=self.generate_content_stream))
+
+    def _text(self, contents) -> str:
+        prompt = contents[0].parts[0].text
+        return lobby_ocr_text(self.tag) if "팀 번호" in prompt else "{}"
+
+    @staticmethod
+    def _response(text: str):
+        part = SimpleNamespace(text=text)
+        return SimpleNamespace(
+            text=text,
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+        )
+
+    def generate_content(self, model, contents, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)  # 실제 SDK처럼 동기 호출 (스레드에서 실행됨)
+        return self._response(self._text(contents))
+
+    async def generate_content_stream(self, model, contents, **kwargs):
+        """응답 전체 지연을 조각 수만큼 나눠서 STREAM_CHUNK 글자씩 흘려보낸다"""
+        self.calls += 1
+        text = self._text(contents)
+        chunks = [text[i:i + STREAM_CHUNK] for i in range(0, len(text), STREAM_CHUNK)] or [""]
+
+        async def stream():
+            for chunk in chunks:
+                await asyncio.sleep(self.latency / len(chunks))
+                yield self._response(chunk)
+        return stream()
+
+
+# ────────────────────────────────────────────
+# 측정
+# ────────────────────────────────────────────
+@dataclass
+class ScenarioResult:
+    name: str
+    latencies: list = field(default_factory=list)   # 초
+    errors: int = 0
+    api_calls: int = 0
+    api_throttled: int = 0
+    discord_requests: int = 0
+    bytes_uploaded: int = 0
+    gemini_calls: int = 0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        idx = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))
+        return ordered[idx]
+
+    def summary(self) -> dict:
+        n = len(self.latencies) or 1
+        return {
+            "scenario": self.name,
+            "runs": len(self.latencies),
+            "errors": self.errors,
+            "p50_ms": round(self.percentile(50) * 1000, 1),
+            "p95_ms": round(self.percentile(95) * 1000, 1),
+            "p99_ms": round(self.percentile(99) * 1000, 1),
+            "mean_ms": round(statistics.fmean(self.latencies) * 1000, 1) if self.latencies else 0.0,
+            "api_calls_per_cmd": round(self.api_calls / n, 2),
+            "api_429_per_cmd": round(self.api_throttled / n, 2),
+            "discord_requests_per_cmd": round(self.discord_requests / n, 2),
+            "bytes_uploaded_per_cmd": round(self.bytes_uploaded / n),
+            "gemini_calls_per_cmd": round(self.gemini_calls / n, 2),
+        }
+
+
+def is_error_reply(traffic) -> bool:
+    return any(
+        (e.title or "").startswith(("❌", "⚠️")) for e in traffic.last_embeds
+    )
+
+
+class MockServer:
+    """tools/mock_er_api.py 를 하위 프로세스로 띄우고 통계를 읽는다"""
+    def __init__(self, args):
+        self.args = args
+        self.base = args.api_base or f"http://127.0.0.1:{args.port}"
+        self.proc = None
+
+    async def __aenter__(self):
+        if not self.args.api_base:
+            self.proc = subprocess.Popen([
+                sys.executable, os.path.join(ROOT, "tools", "mock_er_api.py"),
+                "--port", str(self.args.port),
+                "--rps", str(max(0, int(self.args.rps))),
+                "--latency-ms", str(self.args.latency_ms),
+                "--jitter-ms", str(self.args.jitter_ms),
+                "--error-429-rate", str(self.args.error_429_rate),
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.session = aiohttp.ClientSession()
+        for _ in range(100):
+            try:
+                await self.stats()
+                return self
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+        raise RuntimeError(f"대역 서버 응답 없음: {self.base}")
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        if self.proc:
+            self.proc.terminate()
+            self.proc.wait(timeout=5)
+
+    async def stats(self) -> dict:
+        async with self.session.get(f"{self.base}/_mock/stats") as r:
+            return await r.json()
+
+    async def reset(self):
+        async with self.session.post(f"{self.base}/_mock/reset") as r:
+            await r.read()
+
+
+# ────────────────────────────────────────────
+# 실행
+# ────────────────────────────────────────────
+def setup_database(path: str):
+    """임시 SQLite로 DB를 바꿔 끼운다 (모든 모듈이 같은 SessionLocal을 공유)"""
+    import db
+    from sqlalchemy import create_engine
+    db.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    db.SessionLocal.configure(bind=db.engine)
+    db.init_db()
+
+
+def build_cogs(gemini: FakeGemini) -> dict:
+    from cogs.record import RecordCog
+    from cogs.userRank import UserRankCog
+    from cogs.scanUsers import LobbyScan
+    from cogs.userProfile import ProfileCog
+    from cogs.unionTeam import UnionTeamCog
+    from cogs.matchDetail import MatchDetailCog
+
+    bot = SimpleNamespace(user=None, loop=asyncio.get_running_loop())
+    lobby = LobbyScan(bot)
+    lobby.gemini = gemini
+    return {
+        "record": RecordCog(bot),
+        "rank": UserRankCog(bot),
+        "lobby": lobby,
+        "profile": ProfileCog(bot),
+        "union": UnionTeamCog(bot),
+        "match": MatchDetailCog(bot),
+    }
+
+
+COMMANDS = {
+    "record": "check_record", "rank": "show_rank", "lobby": "lobby_scan",
+    "profile": "profile", "union": "union_team_info", "match": "match_detail",
+}
+
+
+async def invoke(name: str, cog, ctx, key: str, i: int):
+    """명령어 콜백 직접 호출 (봇에 등록된 Command가 부르는 것과 같은 함수)"""
+    callback = getattr(cog, COMMANDS[name]).callback
+    if name == "lobby":
+        await callback(cog, ctx)
+    elif name == "match":
+        await callback(cog, ctx, game_id=40_000_000 + (0 if key.endswith("-warm") else i))
+    else:
+        await callback(cog, ctx, nickname=key)
+
+
+async def run_scenario(name: str, cog, server: MockServer, gemini: FakeGemini, args, png: bytes) -> ScenarioResult:
+    from bench.fake_discord import FakeContext, FakeAttachment
+
+    result = ScenarioResult(name)
+    await server.reset()
+    gemini_before = gemini.calls
+    baseline_tasks = asyncio.all_tasks()
+
+    async def one(i: int):
+        key = f"b-{name}-warm" if args.warm else f"b-{name}-{os.getpid()}-{i}"
+        gemini.tag = key
+        ctx = FakeContext(
+            author_id=10_000 + i, guild_id=1 + i % 4, rest_latency=args.discord_ms / 1000,
+            attachments=[FakeAttachment(png)] if name == "lobby" else None,
+        )
+        start = time.perf_counter()
+        try:
+            await invoke(name, cog, ctx, key, i)
+            if is_error_reply(ctx.traffic):
+                result.errors += 1
+        except Exception as e:
+            result.errors += 1
+            print(f"[{name}] #{i} 예외: {e!r}")
+        result.latencies.append(time.perf_counter() - start)
+        result.discord_requests += ctx.traffic.requests
+        result.bytes_uploaded += ctx.traffic.bytes_uploaded
+
+    for start in range(0, args.iterations, args.concurrency):
+        batch = range(start, min(args.iterations, start + args.concurrency))
+        await asyncio.gather(*(one(i) for i in batch))
+
+    # 명령어가 남긴 백그라운드 작업(시즌 크롤링 등)은 다음 시나리오에 섞이지 않게 정리
+    leftovers = [t for t in asyncio.all_tasks() - baseline_tasks if t is not asyncio.current_task()]
+    for t in leftovers:
+        t.cancel()
+    await asyncio.gather(*leftovers, return_exceptions=True)
+
+    stats = await server.stats()
+    result.api_calls = stats["total"]
+    result.api_throttled = sum(stats["throttled"].values())
+    result.gemini_calls = gemini.calls - gemini_before
+    return result
+
+
+def print_table(rows: list[dict]):
+    cols = [
+        ("scenario", "시나리오"), ("runs", "n"), ("errors", "err"),
+        ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"), ("p99_ms", "p99 ms"),
+        ("api_calls_per_cmd", "API/cmd"), ("api_429_per_cmd", "429/cmd"),
+        ("discord_requests_per_cmd", "Discord/cmd"), ("bytes_uploaded_per_cmd", "bytes/cmd"),
+        ("gemini_calls_per_cmd", "Gemini/cmd"),
+    ]
+    widths = [max(len(h), *(len(str(r[k])) for r in rows)) for k, h in cols]
+    print("  ".join(h.rjust(w) for (_, h), w in zip(cols, widths)))
+    for r in rows:
+        print("  ".join(str(r[k]).rjust(w) for (k, _), w in zip(cols, widths)))
+
+
+async def main_async(args):
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in selected if s not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"알 수 없는 시나리오: {', '.join(unknown)}")
+
+    from bench.fake_discord import blank_lobby_png
+    from er_api import client
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_database(os.path.join(tmp, "bench.db"))
+        gemini = FakeGemini(args.gemini_ms / 1000)
+        png = blank_lobby_png()
+        rows = []
+        async with MockServer(args) as server:
+            cogs = build_cogs(gemini)
+            try:
+                for name in selected:
+                    res = await run_scenario(name, cogs[name], server, gemini, args, png)
+                    rows.append(res.summary())
+                    print(f"- {name} 완료 ({len(res.latencies)}회)")
+            finally:
+                await client.close()
+
+    print()
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": rows}, f, ensure_ascii=False, indent=2)
+    return rows
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    base = args.api_base or f"http://127.0.0.1:{args.port}"
+
+    # 설정 모듈이 읽기 전에 API 주소/키를 대역 서버 쪽으로 돌린다
+    os.environ["ER_API_BASE"] = base
+    os.environ["ER_RPS"] = str(args.rps)
+    os.environ.setdefault("ER_KEY", "bench")
+    os.environ.setdefault("AI_KEY", "bench")
+
+    # 이미지 경로(image/...)가 저장소 루트 기준이라 작업 디렉터리를 맞춘다
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ from discord.ext import commands
 from sqlalchemy.orm import Session
 from datetime import datetime
 
+import history
 from db import SessionLocal
+from er_api import client, UpstreamUnavailable
 from models import User, ERAccount
 
 class ERAccountCog(commands.Cog):
@@ -17,7 +19,6 @@ class ERAccountCog(commands.Cog):
     @commands.command(name="등록")
     async def register_nickname(self, ctx, *, nickname: str = None):
         user_id = str(ctx.author.id)
-        session = SessionLocal()
 
         if not nickname:
             return await ctx.reply(embed=discord.Embed(
@@ -26,6 +27,21 @@ class ERAccountCog(commands.Cog):
                 color=0xFF6B6B,
             ))
 
+        # 닉네임 → userId 를 미리 풀어 둔다 (API 장애로 못 풀면 일단 등록하고 백그라운드에서 채움)
+        try:
+            er_user_id = await client.fetch_user_id(nickname, max_stale=0)
+        except UpstreamUnavailable:
+            er_user_id = None
+        else:
+            if er_user_id is None:
+                return await ctx.reply(embed=discord.Embed(
+                    title="❌ 오류",
+                    description=f"**{nickname}** 닉네임을 찾을 수 없습니다.",
+                    color=0xFF6B6B,
+                ))
+        verified_at = datetime.now() if er_user_id else None
+
+        session = SessionLocal()
         try:
             # 유저 조회 또는 생성
             user = session.get(User, user_id)
@@ -42,8 +58,12 @@ class ERAccountCog(commands.Cog):
                 old_nickname = existing.nickname
                 existing.nickname = nickname
                 existing.registered_at = datetime.now()
+                existing.er_user_id = er_user_id
+                existing.verified_at = verified_at
                 user.active_er_nickname = nickname
                 session.commit()
+                if er_user_id:
+                    history.remember_nickname(er_user_id, nickname)
                 
                 embed = discord.Embed(
                     title="닉네임 변경 완료",
@@ -60,11 +80,15 @@ class ERAccountCog(commands.Cog):
             new_account = ERAccount(
                 user_id=user_id,
                 nickname=nickname,
-                registered_at=datetime.now()
+                registered_at=datetime.now(),
+                er_user_id=er_user_id,
+                verified_at=verified_at,
             )
             session.add(new_account)
             user.active_er_nickname = nickname
             session.commit()
+            if er_user_id:
+                history.remember_nickname(er_user_id, nickname)
 
             embed = discord.Embed(
                 title="닉네임 등록 완료",
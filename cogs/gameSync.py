@@ -0,0 +1,109 @@
+# cogs/gameSync.py
+from discord.ext import commands, tasks
+from typing import List, Tuple
+
+from sqlalchemy import func
+
+import accounts
+import history
+from db import SessionLocal
+from er_api import client, PRIORITY_BACKGROUND
+from models import ERAccount, GameSyncState
+
+SYNC_INTERVAL = 60  # 동기화 루프 주기 (초)
+SYNC_BATCH    = 5   # 루프 1회당 동기화할 계정 수
+SYNC_MAX_AGE  = 600 # 최신 페이지 재확인 주기 (초)
+REVALIDATE_BATCH = 3  # 루프 1회당 userId / 닉네임을 다시 확인할 등록 계정 수
+
+
+class GameSyncCog(commands.Cog):
+    """등록된 계정의 게임 기록을 백그라운드에서 로컬 저장소로 동기화"""
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.sync_loop.start()
+
+    async def cog_load(self):
+        # 누적 통계 테이블이 비어 있으면 저장된 게임으로 한 번 채운다
+        if not history.has_aggregates():
+            history.rebuild_aggregates()
+
+    def cog_unload(self):
+        self.sync_loop.cancel()
+
+    # ── DB ──────────────────────────────────────
+
+    def _sync_targets(self, limit: int) -> List[Tuple[str, str]]:
+        """
+        userId 를 확인한 등록 계정 중 동기화할 차례인 limit 개 (닉네임, userId)
+        — 한 번도 동기화하지 않은 계정 → 오래전에 동기화된 순.
+        userId 를 아직 모르는 계정은 revalidate_account 가 먼저 풀어 둔다.
+        """
+        synced_at = func.max(GameSyncState.synced_at)
+        session = SessionLocal()
+        try:
+            rows = (
+                session.query(func.max(ERAccount.nickname), ERAccount.er_user_id)
+                .outerjoin(GameSyncState, GameSyncState.er_user_id == ERAccount.er_user_id)
+                .filter(ERAccount.er_user_id.is_not(None))
+                .group_by(ERAccount.er_user_id)
+                .order_by(synced_at.is_not(None), synced_at)
+                .limit(limit)
+                .all()
+            )
+            return [(nickname, er_user_id) for nickname, er_user_id in rows]
+        finally:
+            session.close()
+
+    # ── 동기화 ──────────────────────────────────
+
+    async def sync_account(self, nickname: str, er_user_id: str):
+        """최신 페이지 확인 + 과거 기록 한 페이지 수집"""
+        added = await history.refresh(er_user_id, max_age=SYNC_MAX_AGE, priority=PRIORITY_BACKGROUND)
+        added += await history.backfill_step(er_user_id)
+        if added:
+            print(f"[SYNC] {nickname}: 게임 {added}개 저장")
+
+    async def revalidate_account(self, nickname: str, er_user_id: str = None):
+        """
+        등록 계정의 userId 확인.
+        userId 를 모르면 닉네임으로 풀어서 저장하고, 알면 가장 최근 게임에 찍힌 닉네임과 비교해서
+        닉네임이 바뀌었으면 등록 닉네임을 따라 바꾼다.
+        ER API가 응답하지 않으면 UpstreamUnavailable — 확인 시각을 남기지 않으므로 다음 루프에서 다시 확인한다.
+        """
+        if er_user_id is None:
+            er_user_id = await client.fetch_user_id(nickname, priority=PRIORITY_BACKGROUND, max_stale=0)
+            accounts.save_user_id(nickname, er_user_id)
+            if er_user_id:
+                print(f"[SYNC] {nickname}: userId 저장")
+            return
+
+        await history.refresh(er_user_id, max_age=SYNC_MAX_AGE, priority=PRIORITY_BACKGROUND, degrade=False)
+        latest = history.latest_games(er_user_id, 1)
+        current = latest[0].get("nickname") if latest else None
+        if current and current != nickname:
+            old_names = accounts.track_nickname(er_user_id, current)
+            print(f"[SYNC] 닉네임 변경 감지: {', '.join(old_names)} → {current}")
+        else:
+            accounts.save_user_id(nickname, er_user_id)
+
+    @tasks.loop(seconds=SYNC_INTERVAL)
+    async def sync_loop(self):
+        for nickname, er_user_id in self._sync_targets(SYNC_BATCH):
+            try:
+                await self.sync_account(nickname, er_user_id)
+            except Exception as e:
+                print(f"[SYNC] {nickname} 동기화 실패: {e}")
+
+        for nickname, er_user_id in accounts.stale_accounts(REVALIDATE_BATCH):
+            try:
+                await self.revalidate_account(nickname, er_user_id)
+            except Exception as e:
+                print(f"[SYNC] {nickname} 계정 확인 실패: {e}")
+
+    @sync_loop.before_loop
+    async def before_sync_loop(self):
+        await self.bot.wait_until_ready()
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(GameSyncCog(bot))
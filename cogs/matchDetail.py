@@ -1,36 +1,26 @@
 # cogs/matchDetail.py
 import discord
 from discord.ext import commands
-import aiohttp
 from typing import Optional
 from datetime import datetime
 
-from config import ER_KEY
 from data import Character_Names, Weapon_Types
-
-ER_BASE = "https://open-api.bser.io/v1"
+import dedup
+from er_api import client
 
 
 class MatchDetailCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.api_key = ER_KEY
-        self.base_url = ER_BASE
         self.character_names = Character_Names
         self.weapon_names = Weapon_Types
 
     async def fetch_game_detail(self, game_id: int) -> Optional[dict]:
         """특정 게임의 상세 정보 조회"""
-        headers = {"x-api-key": self.api_key}
-        
-        url = f"{self.base_url}/games/{game_id}"
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as resp:
-                if resp.status != 200:
-                    return None
-                data = await resp.json()
-                return data.get("userGames") if data.get("userGames") else None
+        data = await client.get(f"/games/{game_id}")
+        if not data:
+            return None
+        return data.get("userGames") if data.get("userGames") else None
 
     def get_character_name(self, char_num: int) -> str:
         """캐릭터 번호를 이름으로 변환"""
@@ -117,6 +107,7 @@ class MatchDetailCog(commands.Cog):
         return embed
 
     @commands.command(name="매치", aliases=["ㅁㅊ"])
+    @dedup.coalesce()
     async def match_detail(self, ctx: commands.Context, game_id: int = None):
         """특정 게임의 상세 정보 조회"""
         
@@ -2,22 +2,21 @@
 import discord
 from discord import File
 from discord.ext import commands
-from config import ER_KEY
-from data import Character_Names, Weapon_Types, Character_Names_EN
-import aiohttp
+from data import Character_Names, Weapon_Types, Character_Names_EN, CURRENT_SEASON, CURRENT_SEASON_NUM
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 import re
 import os
 
-from db import SessionLocal
-from models import User
+import accounts
+import history
+import dedup
+import swr
+from er_api import client
 
 class RecordCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.api_key = ER_KEY 
-        self.base_url = "https://open-api.bser.io/v1"
         
         # 캐릭터 이름 매핑 (characterNum -> 한글 이름)
         self.character_names = Character_Names
@@ -78,50 +77,25 @@ class RecordCog(commands.Cog):
         
         return f"{mtm} {mm}매치" 
     
-    def get_active_nickname(self, user_id: str) -> Optional[str]:
-        """DB에서 활성화된 닉네임 가져오기"""
-        session = SessionLocal()
-        try:
-            user = session.get(User, user_id)
-            if user and hasattr(user, 'active_er_nickname'):
-                return user.active_er_nickname
-            return None
-        finally:
-            session.close()
+    def get_active_nickname(self, user_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """DB에서 활성화된 닉네임과 등록 때 저장한 ER userId 가져오기"""
+        return accounts.active_account(user_id)
     
     async def fetch_user_id(self, nickname: str) -> Optional[str]:
-        """닉네임으로 유저 ID 조회"""
-        headers = {"x-api-key": self.api_key}
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{self.base_url}/user/nickname",
-                params={"query": nickname},
-                headers=headers
-            ) as resp:
-                if resp.status != 200:
-                    return None
-                data = await resp.json()
-                
-                if not data.get("user"):
-                    return None
-                    
-                return data["user"]["userId"]
+        """닉네임으로 유저 ID 조회 (확인한 대응은 다음 캐시 응답용으로 기록)"""
+        user_id = await client.fetch_user_id(nickname)
+        if user_id:
+            history.remember_nickname(user_id, nickname)
+        return user_id
     
     async def fetch_user_games(self, user_id: str, next_param: int = None) -> Optional[dict]:
-        """유저 최근 게임 기록 조회"""
-        headers = {"x-api-key": self.api_key}
-        
-        url = f"{self.base_url}/user/games/uid/{user_id}"
-        params = {}
-        if next_param:
-            params["next"] = next_param
-            
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params, headers=headers) as resp:
-                if resp.status != 200:
-                    return None
-                return await resp.json()
+        """유저 게임 기록 한 페이지 조회 (next_param: 이전 페이지 커서)"""
+        return await client.fetch_user_games(user_id, next_param)
+
+    async def load_recent_games(self, user_id: str, limit: int) -> List[dict]:
+        """최신 페이지만 확인해 로컬 저장소를 갱신한 뒤 저장소에서 최근 게임을 읽는다"""
+        await history.refresh(user_id, max_pages=history.INTERACTIVE_PAGES)
+        return history.latest_games(user_id, limit)
     
     def format_duration(self, seconds: int) -> str:
         """게임 시간을 분:초 형식으로 변환"""
@@ -137,14 +111,162 @@ class RecordCog(commands.Cog):
         """무기 번호를 이름으로 변환"""
         return self.weapon_names.get(weapon_num, f"무기{weapon_num}")
 
+    def build_record_embed(self, nickname: str, user_api_id: str, games: List[dict]) -> Tuple[discord.Embed, Optional[str]]:
+        """로컬 저장소의 누적 통계 + 최근 게임으로 전적 임베드 생성. (임베드, 썸네일 이미지 경로)"""
+        # 통계 계산 (게임 저장 시 갱신되는 누적 통계 조회)
+        # 이번 시즌 게임(일반 게임은 seasonId 0 이라 빠짐) 기준, 이번 시즌 기록이 없으면 저장된 전체 기록
+        season_id = CURRENT_SEASON_NUM
+        stats = history.summarize(user_api_id, season_id)
+        scope = f"시즌 {CURRENT_SEASON}"
+        if stats is None:
+            season_id = None
+            stats = history.summarize(user_api_id)
+            scope = "저장된 전체"
+        total_games = stats["games"]
+        wins = stats["wins"]
+        top3 = stats["top3"]
+        total_kills = stats["kills"]
+        total_deaths = stats["deaths"]
+        avg_rank = stats["rank_sum"] / total_games
+
+        # 평균 킬 / KD 계산
+        avg_kills = total_kills / total_games
+        kda = total_kills / total_deaths if total_deaths > 0 else total_kills
+
+        # 가장 많이 플레이한 캐릭터 (썸네일용)
+        char_counts = history.character_counts(user_api_id, season_id)
+        most_played_char = char_counts[0][0] if char_counts else games[0]["characterNum"]
+        most_played_skin = history.most_played_skin(user_api_id, most_played_char, season_id)
+
+        # 임베드 생성
+        embed = discord.Embed(
+            title=f"⚔️ {nickname} 님의 최근 전적",
+            description=f"{scope} {total_games}게임 통계" + (" (일반 게임 제외)" if season_id else ""),
+            color=0x0fb9b1,
+            timestamp=datetime.now()
+        )
+
+        # 전체 통계
+        embed.add_field(
+            name="𒄬 종합 통계",
+            value=(
+                f"**승리:** {wins}회 ({wins/total_games*100:.1f}%)\n"
+                f"**Top 3:** {top3}회 ({top3/total_games*100:.1f}%)\n"
+                f"**평균 순위:** {avg_rank:.1f}위\n"
+                f"**평균 킬:** {avg_kills:.1f}\n"
+                f"**KD:** {kda:.2f}"
+            ),
+            inline=False
+        )
+
+        # 가장 많이 플레이한 캐릭터
+        if char_counts:
+            most_played = char_counts[0]
+            char_name = self.get_character_name(most_played[0])
+            play_count = most_played[1]
+
+            embed.add_field(
+                name="❖ 주 캐릭터",
+                value=f"{char_name} ({play_count}회)",
+                inline=True
+            )
+
+        # 평균 게임 시간
+        avg_duration = stats["duration_sum"] / total_games
+        embed.add_field(
+            name="⏱ 평균 게임 시간",
+            value=self.format_duration(int(avg_duration)),
+            inline=True
+        )
+
+        # 최근 게임 기록
+        recent_games = []
+        games_played = 0
+        for i, game in enumerate(games[:5], 1):
+            rank = game["gameRank"]
+            char_name = self.get_character_name(game["characterNum"])
+            weapon_name = self.get_weapon_name(game["bestWeapon"])
+
+            tk = game["teamKill"]
+            kills = game["playerKill"]
+            assists = game["playerAssistant"]
+
+            # 승리 여부 표시
+            if game["matchingTeamMode"] == 4:
+                result = "승리" if rank == 1 else f"패배"
+            else:
+                result = "승리" if rank == 1 else f"{rank}위"
+
+            # 게임 타입 상세 표시
+            game_type = self.get_game_type_name(game["matchingMode"], game["matchingTeamMode"])
+
+            game_info = (
+                f"**{result}**[{game_type}]\n"
+                f"> **{char_name}** · {weapon_name}\n"
+                f"> TK/K/D/A : {tk}/{kills}/{game.get('playerDeaths', 0)}/{assists}"
+            )
+            recent_games.append(game_info)
+            games_played = i;
+
+        embed.add_field(
+            name=f"𒉻 최근 {games_played}게임 기록",
+            value="\n".join(recent_games),
+            inline=False
+        )
+
+        embed.set_footer(text="이리와 봇 · 전적")
+
+        # 가장 많이 플레이한 캐릭터 이미지 설정
+        # img_path = self.get_character_image_path(most_played_char)[most_played_skin]
+        img_paths = self.get_character_image_path(most_played_char)
+        img_path = img_paths[most_played_skin] if most_played_skin < len(img_paths) else (img_paths[0] if img_paths else None)
+
+        return embed, img_path
+
+    async def reply_record(self, ctx: commands.Context, embed: discord.Embed, img_path: Optional[str]) -> discord.Message:
+        if img_path:
+            file = File(img_path, filename=os.path.basename(img_path))
+            embed.set_thumbnail(url=f"attachment://{file.filename}")
+            return await ctx.reply(embed=embed, file=file)
+        return await ctx.reply(embed=embed)
+
+    def cached_record(self, nickname: str, user_api_id: str = None) -> Optional[Tuple[str, float, List[dict]]]:
+        """SWR_MAX_AGE 안에 동기화한 로컬 기록이 있으면 (유저 ID, 나이(초), 최근 게임)"""
+        user_api_id = user_api_id or history.cached_user_id(nickname)
+        state = history.get_state(user_api_id) if user_api_id else None
+        if not state or not state.synced_at:
+            return None
+        age = (datetime.now() - state.synced_at).total_seconds()
+        if age >= swr.SWR_MAX_AGE:
+            return None
+        games = history.latest_games(user_api_id, 5)
+        return (user_api_id, age, games) if games else None
+
+    async def revalidate_record(self, msg: discord.Message, nickname: str, user_api_id: str, img_path: Optional[str]):
+        """최신 페이지를 확인해서 새 게임이 있으면 보낸 메시지를 고친다"""
+        if not await history.refresh(user_api_id, max_pages=history.INTERACTIVE_PAGES):
+            return
+        games = history.latest_games(user_api_id, 5)
+        embed, new_img_path = self.build_record_embed(nickname, user_api_id, games)
+        if new_img_path and new_img_path != img_path:
+            file = File(new_img_path, filename=os.path.basename(new_img_path))
+            embed.set_thumbnail(url=f"attachment://{file.filename}")
+            await msg.edit(embed=embed, attachments=[file])
+        else:
+            if img_path:
+                embed.set_thumbnail(url=f"attachment://{os.path.basename(img_path)}")
+            await msg.edit(embed=embed)
+
     @commands.command(name="전적", aliases=["ㅈㅈ"])
+    @dedup.coalesce()
     async def check_record(self, ctx: commands.Context, *, nickname: str = None):
         """이터널 리턴 최근 전적 검색"""
         user_id = str(ctx.author.id)
+        stored_id = None
         
         # 닉네임이 제공되지 않았으면 DB에서 가져오기
         if not nickname:
-            nickname = self.get_active_nickname(user_id)
+            nickname, stored_id = self.get_active_nickname(user_id)
             if not nickname:
                 return await ctx.reply(embed=discord.Embed(
                     title="❌ 오류",
@@ -152,12 +274,21 @@ class RecordCog(commands.Cog):
                     color=0xFF6B6B,
                 ))
             
+        # 최근 기록이 저장돼 있으면 바로 답하고 백그라운드에서 갱신
+        cached = self.cached_record(nickname, stored_id)
+        if cached:
+            user_api_id, age, games = cached
+            embed, img_path = self.build_record_embed(nickname, user_api_id, games)
+            msg = await self.reply_record(ctx, swr.mark_age(embed, age), img_path)
+            swr.spawn(self.revalidate_record(msg, nickname, user_api_id, img_path), name=f"전적:{nickname}")
+            return
+
         # 로딩 메시지
         loading_msg = await ctx.reply(f"🔍 **{nickname}** 님의 전적을 검색 중...")
         
         try:
-            # 유저 ID 조회
-            user_api_id = await self.fetch_user_id(nickname)
+            # 유저 ID 조회 (등록 계정이면 저장된 ID)
+            user_api_id = stored_id or await self.fetch_user_id(nickname)
             
             if not user_api_id:
                 embed = discord.Embed(
@@ -169,10 +300,10 @@ class RecordCog(commands.Cog):
                 await loading_msg.edit(content=None, embed=embed)
                 return
             
-            # 최근 게임 기록 조회
-            games_data = await self.fetch_user_games(user_api_id)
+            # 최근 게임 기록 조회 (로컬 저장소)
+            games = await self.load_recent_games(user_api_id, 5)  # 최근 n게임
             
-            if not games_data or not games_data.get("userGames"):
+            if not games:
                 embed = discord.Embed(
                     title="❌ 데이터 없음",
                     description=f"**{nickname}** 님의 게임 기록을 찾을 수 없습니다.\n-# [dak.gg에서 확인하기](https://dak.gg/er/players/{nickname})",
@@ -182,129 +313,12 @@ class RecordCog(commands.Cog):
                 await loading_msg.edit(content=None, embed=embed)
                 return
             
-            games = games_data["userGames"][:5]  # 최근 n게임
-            
-            # 통계 계산
-            total_games = len(games)
-            wins = sum(1 for g in games if g["gameRank"] == 1)
-            top3 = sum(1 for g in games if g["gameRank"] <= 3)
-            total_kills = sum(g["playerKill"] for g in games)
-            total_deaths = sum(g.get("playerDeaths", 0) for g in games)
-            avg_rank = sum(g["gameRank"] for g in games) / total_games
-            
-            # 평균 KDA 계산
-            avg_kills = total_kills / total_games
-            avg_deaths = total_deaths / total_games if total_deaths > 0 else 1
-            kda = total_kills / avg_deaths if avg_deaths > 0 else total_kills
-            
-            # 가장 많이 플레이한 캐릭터 (썸네일용)
-            char_counts = {}
-            skin_counts = {}
-
-            for game in games:
-                char_num = game["characterNum"]
-                char_counts[char_num] = char_counts.get(char_num, 0) + 1
-            
-            most_played_char = max(char_counts.items(), key=lambda x: x[1])[0] if char_counts else games[0]["characterNum"]
-            
-            for game in games:
-                if game["characterNum"] != most_played_char:
-                    continue
-                skin_num = game["skinCode"] % 100
-                skin_counts[skin_num] = skin_counts.get(skin_num, 0) + 1
-
-            most_played_skin = max(skin_counts.items(), key=lambda x: x[1])[0] if skin_counts else 0   
-
-            # 임베드 생성
-            embed = discord.Embed(
-                title=f"⚔️ {nickname} 님의 최근 전적",
-                description=f"최근 {total_games}게임 통계",
-                color=0x0fb9b1,
-                timestamp=datetime.now()
-            )
-            
-
-
-            # 전체 통계
-            embed.add_field(
-                name="𒄬 종합 통계",
-                value=(
-                    f"**승리:** {wins}회 ({wins/total_games*100:.1f}%)\n"
-                    f"**Top 3:** {top3}회 ({top3/total_games*100:.1f}%)\n"
-                    f"**평균 순위:** {avg_rank:.1f}위\n"
-                    f"**평균 킬:** {avg_kills:.1f}\n"
-                    f"**KD:** {kda:.2f}"
-                ),
-                inline=False
-            )
-
-            # 가장 많이 플레이한 캐릭터
-            if char_counts:
-                most_played = max(char_counts.items(), key=lambda x: x[1])
-                char_name = self.get_character_name(most_played[0])
-                play_count = most_played[1]
-                
-                embed.add_field(
-                    name="❖ 주 캐릭터",
-                    value=f"{char_name} ({play_count}회)",
-                    inline=True
-                )
-            
-            # 평균 게임 시간
-            avg_duration = sum(g["duration"] for g in games) / total_games
-            embed.add_field(
-                name="⏱ 평균 게임 시간",
-                value=self.format_duration(int(avg_duration)),
-                inline=True
-            )
-            
-            # 최근 게임 기록
-            recent_games = []
-            games_played = 0
-            for i, game in enumerate(games[:5], 1):
-                rank = game["gameRank"]
-                char_name = self.get_character_name(game["characterNum"])
-                weapon_name = self.get_weapon_name(game["bestWeapon"])
-                
-                tk = game["teamKill"]
-                kills = game["playerKill"]
-                assists = game["playerAssistant"]
-                
-                # 승리 여부 표시
-                if game["matchingTeamMode"] == 4:
-                    result = "승리" if rank == 1 else f"패배"
-                else:
-                    result = "승리" if rank == 1 else f"{rank}위"
-                
-                # 게임 타입 상세 표시
-                game_type = self.get_game_type_name(game["matchingMode"], game["matchingTeamMode"])
-                
-                game_info = (
-                    f"**{result}**[{game_type}]\n"
-                    f"> **{char_name}** · {weapon_name}\n"
-                    f"> TK/K/D/A : {tk}/{kills}/{game.get('playerDeaths', 0)}/{assists}"
-                )
-                recent_games.append(game_info)
-                games_played = i;
-            
-            embed.add_field(
-                name=f"𒉻 최근 {games_played}게임 기록",
-                value="\n".join(recent_games),
-                inline=False
-            )
-            
-            embed.set_footer(text="이리와 봇 · 전적")
-            
-            # 가장 많이 플레이한 캐릭터 이미지 설정
-            # img_path = self.get_character_image_path(most_played_char)[most_played_skin]
-            img_paths = self.get_character_image_path(most_played_char)
-            img_path = img_paths[most_played_skin] if most_played_skin < len(img_paths) else (img_paths[0] if img_paths else None)
+            embed, img_path = self.build_record_embed(nickname, user_api_id, games)
 
             if img_path:
-                file = File(img_path, filename=os.path.basename(img_path))
-                embed.set_thumbnail(url=f"attachment://{file.filename}")
                 await loading_msg.delete()
-                await ctx.reply(embed=embed, file=file)
+                msg = await self.reply_record(ctx, embed, img_path)
+                dedup.mark_result(ctx, msg)
                 return
             await loading_msg.edit(content=None, embed=embed)
             
@@ -318,13 +332,15 @@ class RecordCog(commands.Cog):
             await loading_msg.edit(content=None, embed=embed)
 
     @commands.command(name="최근게임", aliases=["ㅊㄱㄱ"])
+    @dedup.coalesce()
     async def recent_game(self, ctx: commands.Context, *, nickname: str = None):
         """가장 최근 게임 상세 정보"""
         user_id = str(ctx.author.id)
+        stored_id = None
         
         # 닉네임이 제공되지 않았으면 DB에서 가져오기
         if not nickname:
-            nickname = self.get_active_nickname(user_id)
+            nickname, stored_id = self.get_active_nickname(user_id)
             if not nickname:
                 return await ctx.reply(embed=discord.Embed(
                     title="❌ 오류",
@@ -335,7 +351,7 @@ class RecordCog(commands.Cog):
         loading_msg = await ctx.reply(f"🔍 **{nickname}** 님의 최근 게임을 조회 중...")
         
         try:
-            user_api_id = await self.fetch_user_id(nickname)
+            user_api_id = stored_id or await self.fetch_user_id(nickname)
             if not user_api_id:
                 embed = discord.Embed(
                     title="❌ 검색 실패",
@@ -345,8 +361,8 @@ class RecordCog(commands.Cog):
                 await loading_msg.edit(content=None, embed=embed)
                 return
             
-            games_data = await self.fetch_user_games(user_api_id)
-            if not games_data or not games_data.get("userGames"):
+            games = await self.load_recent_games(user_api_id, 1)
+            if not games:
                 embed = discord.Embed(
                     title="❌ 데이터 없음",
                     description=f"게임 기록이 없습니다. \n-# [dak.gg에서 확인하기](https://dak.gg/er/players/{nickname})",
@@ -355,7 +371,7 @@ class RecordCog(commands.Cog):
                 await loading_msg.edit(content=None, embed=embed)
                 return
             
-            game = games_data["userGames"][0]  # 가장 최근 게임
+            game = games[0]  # 가장 최근 게임
             
             # 게임 결과
             rank = game["gameRank"]
@@ -485,7 +501,8 @@ class RecordCog(commands.Cog):
                 file = File(img_path, filename=os.path.basename(img_path))
                 embed.set_thumbnail(url=f"attachment://{file.filename}")
                 await loading_msg.delete()
-                await ctx.reply(embed=embed, file=file)
+                msg = await ctx.reply(embed=embed, file=file)
+                dedup.mark_result(ctx, msg)
                 return
             await loading_msg.edit(content=None, embed=embed)
             
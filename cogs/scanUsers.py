@@ -1,25 +1,36 @@
 #cogs/scanUsers.py
 import re
-import io
 import discord
 from discord.ext import commands
-import aiohttp
 import asyncio
 import base64
+import json
+import math
 import time
-from PIL import Image, ImageEnhance
+import unicodedata
+from typing import AsyncIterator, Awaitable, Callable
 from google import genai
 from google.genai import types
-from config import AI_KEY, ER_KEY
+from config import AI_KEY, ER_RPS, LOBBY_OCR_MODELS, LOBBY_SCAN_CONCURRENCY
+from er_api import client, PRIORITY_BATCH, UpstreamUnavailable
+from lobby_image import SharedImage, image_pool, remap_box
+from db import SessionLocal
+from fair_queue import FairQueue
+from models import ERAccount, GameSyncState, User
+import metrics
 
 from data import CURRENT_SEASON_NUM, CURRENT_SEASON
 
-ER_BASE    = "https://open-api.bser.io/v1"
 MATCH_MODE = 3
 
 MAX_RECHECK    = 3     # Gemini 재질의 최대 라운드
 RANK_CACHE_TTL = 3600  # 랭크 캐시 유지 시간 (초)
-MAX_RETRY_429  = 3     # 429 최대 재시도 횟수
+SCAN_LOOKUP_CONCURRENCY = max(1, round(ER_RPS))  # 대기분석 1회가 동시에 진행하는 전적 조회 수 (초당 호출 한도만큼)
+
+# ── OCR 모델 단계 올리기 ──────────────────────
+MAX_TEAM_SIZE      = 4     # 한 팀 최대 인원 (넘으면 팀 구분을 잘못 읽은 것)
+OCR_ESCALATE_RATIO = 0.34  # 닉네임 중 이 비율 이상이 조회 실패면 다음 모델로 다시 읽음
+KNOWN_NAMES_TTL    = 600   # 알려진 닉네임 목록 DB 재조회 간격 (초)
 
 # 비공개 닉네임 패턴: "실험체1", "실험체12" 등
 HIDDEN_NAME_RE = re.compile(r"^실험체\d+$")
@@ -35,13 +46,6 @@ HYPHEN_VARIANTS = [
     "\uff0d",  # － FULLWIDTH HYPHEN-MINUS
 ]
 
-# ── 좌표 파싱 정규식 ─────────────────────────
-# "닉네임A [123, 456, 150, 580]" 형태 파싱
-COORD_LINE_RE = re.compile(
-    r"^(.*?)\s*\[\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\]\s*$"
-)
-
-
 def _hyphen_variants(nickname: str) -> list[str]:
     found_hyphen = None
     for ch in HYPHEN_VARIANTS:
@@ -59,78 +63,17 @@ def _hyphen_variants(nickname: str) -> list[str]:
     return candidates
 
 
-# ────────────────────────────────────────────
-# 이미지 전처리 (밝기/대비/채도/선명도)
-# ────────────────────────────────────────────
-def _preprocess_image(image_bytes: bytes) -> bytes:
-    """OCR 정확도 향상을 위한 전처리. PNG bytes 반환."""
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = ImageEnhance.Brightness(img).enhance(0.70)
-    img = ImageEnhance.Contrast(img).enhance(1.50)
-    img = ImageEnhance.Color(img).enhance(0.00)
-    img = ImageEnhance.Sharpness(img).enhance(2.00)
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return buf.getvalue()
-
-
-# ────────────────────────────────────────────
-# 동적 크롭
-# ────────────────────────────────────────────
-def _crop_nickname_region(
-    image_bytes: bytes,
-    box: list[int],
-    padding_norm: int = 30,
-    min_output_width: int = 500,
-) -> bytes:
-    """
-    0~1000 정규화 좌표 [ymin, xmin, ymax, xmax] 로 닉네임 영역을 크롭한다.
-
-    Args:
-        padding_norm: 바운딩박스 주변 패딩 (0~1000 단위)
-        min_output_width: 결과 이미지 최소 너비 (픽셀). 작으면 업스케일.
-    Returns:
-        전처리된 크롭 PNG bytes
-    """
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    w, h = img.size
-
-    ymin_n, xmin_n, ymax_n, xmax_n = box
-
-    # 패딩 적용 및 범위 클램프
-    ymin_n = max(0, ymin_n - padding_norm)
-    xmin_n = max(0, xmin_n - padding_norm)
-    ymax_n = min(1000, ymax_n + padding_norm)
-    xmax_n = min(1000, xmax_n + padding_norm)
-
-    # 픽셀 변환
-    x0 = int(xmin_n / 1000 * w)
-    y0 = int(ymin_n / 1000 * h)
-    x1 = int(xmax_n / 1000 * w)
-    y1 = int(ymax_n / 1000 * h)
-
-    # 영역이 너무 작으면 크롭 포기 → None 반환 신호
-    if (x1 - x0) < 5 or (y1 - y0) < 5:
-        raise ValueError(f"크롭 영역이 너무 작음: box={box}, px=({x0},{y0},{x1},{y1})")
-
-    cropped = img.crop((x0, y0, x1, y1))
-
-    # 업스케일 (너비가 min_output_width 미만이면 확대)
-    if cropped.width < min_output_width:
-        scale = min_output_width / cropped.width
-        new_w = int(cropped.width  * scale)
-        new_h = int(cropped.height * scale)
-        cropped = cropped.resize((new_w, new_h), Image.LANCZOS)
+def _normalize_name(nickname: str) -> str:
+    """표기 차이(전각/반각, 대소문자, 공백, 하이픈 모양)를 지운 비교용 닉네임"""
+    name = unicodedata.normalize("NFKC", nickname).casefold()
+    for ch in HYPHEN_VARIANTS:
+        name = name.replace(ch, "-")
+    return "".join(name.split())
 
-    # 전처리 적용
-    cropped = ImageEnhance.Brightness(cropped).enhance(0.70)
-    cropped = ImageEnhance.Contrast(cropped).enhance(1.50)
-    cropped = ImageEnhance.Color(cropped).enhance(0.00)
-    cropped = ImageEnhance.Sharpness(cropped).enhance(2.00)
 
-    buf = io.BytesIO()
-    cropped.save(buf, format="PNG")
-    return buf.getvalue()
+def _not_found(r: dict) -> bool:
+    """조회 결과가 "없는 닉네임" (비공개 / API 응답 없음은 제외) — OCR 오류로 보고 다른 후보를 찾아볼 대상"""
+    return not r["hidden"] and r["tier"] is None and not r.get("unavailable")
 
 
 # ────────────────────────────────────────────
@@ -245,69 +188,189 @@ def tier_display(tier: str) -> str:
 
 
 # ────────────────────────────────────────────
-# OCR 응답 파서 (좌표 포함 버전)
+# OCR 응답 (스키마를 지정한 JSON)
 # ────────────────────────────────────────────
-def _parse_teams(text: str) -> list[list[dict]]:
-    """
-    Gemini가 반환한 팀 구분 텍스트를 파싱.
-    각 플레이어는 {"name": str, "box": [ymin,xmin,ymax,xmax] | None} 형태.
+MAX_ALTERNATES     = 4    # 닉네임당 받아 둘 대안 후보 수
+OCR_MIN_CONFIDENCE = 0.6  # 이보다 확신이 낮은 닉네임은 대안 후보도 미리 조회
+
+_BOX_SCHEMA = {"type": "array", "items": {"type": "integer"}, "minItems": 4, "maxItems": 4}
+_NAMES_SCHEMA = {"type": "array", "items": {"type": "string"}, "maxItems": MAX_ALTERNATES}
+
+# 팀 OCR: {"teams": [{"team": 1, "players": [{"name", "box", "confidence", "alternates"}]}]}
+TEAMS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "teams": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "team": {"type": "integer"},
+                    "players": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name":       {"type": "string"},
+                                "box":        _BOX_SCHEMA,
+                                "confidence": {"type": "number"},
+                                "alternates": _NAMES_SCHEMA,
+                            },
+                            "required": ["name", "box", "confidence"],
+                        },
+                    },
+                },
+                "required": ["team", "players"],
+            },
+        },
+    },
+    "required": ["teams"],
+}
+
+# 크롭 재질의: {"candidates": ["가장 확실한 후보", ...]}
+CANDIDATES_SCHEMA = {
+    "type": "object",
+    "properties": {"candidates": _NAMES_SCHEMA},
+    "required": ["candidates"],
+}
+
+# 전체 이미지 재질의: {"corrections": [{"original": "...", "candidates": [...]}]}
+CORRECTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "corrections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"original": {"type": "string"}, "candidates": _NAMES_SCHEMA},
+                "required": ["original", "candidates"],
+            },
+        },
+    },
+    "required": ["corrections"],
+}
+
+
+def _valid_names(values, exclude: str = None) -> list[str]:
+    """문자열 목록 검증: 2글자 이상, 중복 / exclude 제외, 최대 MAX_ALTERNATES 개"""
+    names: list[str] = []
+    for v in values if isinstance(values, list) else []:
+        if isinstance(v, str) and len(v.strip()) > 1 and v.strip() != exclude and v.strip() not in names:
+            names.append(v.strip())
+    return names[:MAX_ALTERNATES]
 
-    좌표가 없는 줄도 name만 추출해서 box=None으로 저장.
+
+def _valid_box(box) -> list[int] | None:
+    """0~1000 정수 4개 [ymin, xmin, ymax, xmax] (ymin < ymax, xmin < xmax)"""
+    if not isinstance(box, list) or len(box) != 4:
+        return None
+    if not all(isinstance(v, int) and not isinstance(v, bool) and 0 <= v <= 1000 for v in box):
+        return None
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return None
+    return box
+
+
+def _valid_player(obj) -> dict | None:
     """
-    TEAM_HEADER_RE = re.compile(r"^팀\s*(\d+)$")
-    teams_numbered: dict[int, list[dict]] = {}
-    current_num: int | None = None
-    current: list[dict] = []
+    플레이어 객체 검증 → {"name", "box", "confidence", "alternates"}.
+    이름이 없으면 None, 좌표가 이상하면 box=None (이름은 살린다).
+    """
+    if not isinstance(obj, dict) or not isinstance(obj.get("name"), str):
+        return None
+    name = obj["name"].strip()
+    if len(name) <= 1:
+        return None
+    conf = obj.get("confidence")
+    if isinstance(conf, (int, float)) and not isinstance(conf, bool):
+        conf = min(1.0, max(0.0, float(conf)))
+    else:
+        conf = None
+    return {
+        "name":       name,
+        "box":        _valid_box(obj.get("box")),
+        "confidence": conf,
+        "alternates": _valid_names(obj.get("alternates"), exclude=name),
+    }
 
-    for raw_line in text.splitlines():
-        line = raw_line.strip()
-        if not line:
-            continue
 
-        # 팀 헤더 체크
-        m_header = TEAM_HEADER_RE.match(line)
-        if m_header:
-            if current_num is not None and current:
-                teams_numbered[current_num] = current
-            current_num = int(m_header.group(1))
-            current = []
-            continue
+def _load_json(text: str) -> dict:
+    """JSON 객체 응답 디코드 (잘렸거나 객체가 아니면 빈 dict)"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
 
-        # 좌표 포함 줄 파싱
-        m_coord = COORD_LINE_RE.match(line)
-        if m_coord:
-            name = m_coord.group(1).strip()
-            box  = [int(m_coord.group(i)) for i in range(2, 6)]
-            if len(name) > 1 and current_num is not None:
-                current.append({"name": name, "box": box})
-        else:
-            # 좌표 없는 줄 → name만 저장
-            if len(line) > 1 and current_num is not None:
-                current.append({"name": line, "box": None})
-
-    if current_num is not None and current:
-        teams_numbered[current_num] = current
-
-    if not teams_numbered:
-        # 헤더 구분 없이 닉네임만 쭉 나열된 경우
-        entries = []
-        for l in text.splitlines():
-            l = l.strip()
-            if len(l) <= 1:
-                continue
-            m_coord = COORD_LINE_RE.match(l)
-            if m_coord:
-                name = m_coord.group(1).strip()
-                box  = [int(m_coord.group(i)) for i in range(2, 6)]
-                if len(name) > 1:
-                    entries.append({"name": name, "box": box})
-            elif len(l) > 1:
-                entries.append({"name": l, "box": None})
-        return [entries] if entries else []
+
+class _JsonObjectStream:
+    """
+    스트리밍 JSON에서 객체({...})가 닫힐 때마다 바로 디코드해서 꺼내는 증분 파서.
+    문자열 안의 괄호 / 이스케이프는 건너뛰고, 이미 훑은 부분은 다시 보지 않는다.
+    """
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._in_str = False
+        self._escape = False
+        self._starts: list[int] = []
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        found = []
+        for i in range(self._pos, len(self.text)):
+            c = self.text[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_str = False
+            elif c == '"':
+                self._in_str = True
+            elif c == "{":
+                self._starts.append(i)
+            elif c == "}" and self._starts:
+                start = self._starts.pop()
+                try:
+                    found.append(json.loads(self.text[start:i + 1]))
+                except ValueError:
+                    pass
+        self._pos = len(self.text)
+        return found
+
+
+def _teams_from_json(text: str, streamed_teams: list, streamed_players: list) -> list[list[dict]]:
+    """
+    팀 OCR 응답 → 팀별 플레이어 목록.
+    응답이 잘려서 전체 디코드가 안 되면, 스트리밍 중 완성된 팀 객체 + 남은 플레이어 객체로 복구한다.
+    """
+    raw_teams = _load_json(text).get("teams")
+    if not isinstance(raw_teams, list):
+        raw_teams = list(streamed_teams)
+        seen = {
+            p.get("name") for t in raw_teams for p in t.get("players") or [] if isinstance(p, dict)
+        }
+        leftover = [p for p in streamed_players if isinstance(p, dict) and p.get("name") not in seen]
+        if leftover:
+            raw_teams.append({"players": leftover})
+        if raw_teams:
+            print(f"[OCR 경고] 응답 JSON 불완전 → 완성된 객체 {len(raw_teams)}팀 분량으로 복구")
+
+    teams_numbered: dict[int, list[dict]] = {}
+    for idx, team in enumerate(raw_teams, 1):
+        if not isinstance(team, dict):
+            continue
+        num = team.get("team")
+        num = num if isinstance(num, int) and not isinstance(num, bool) else idx
+        players = [p for p in map(_valid_player, team.get("players") or []) if p]
+        if players:
+            teams_numbered.setdefault(num, []).extend(players)
 
     # ── 환각 팀 번호 탐지 ──
     sorted_nums = sorted(teams_numbered.keys())
-    if sorted_nums:
+    if len(sorted_nums) >= 2:
         expected_max = sorted_nums[0] + len(sorted_nums) - 1
         actual_max   = sorted_nums[-1]
         if actual_max > expected_max + 1:
@@ -320,22 +383,91 @@ def _parse_teams(text: str) -> list[list[dict]]:
 
 
 # ────────────────────────────────────────────
-# RateLimiter
+# 알려진 닉네임
 # ────────────────────────────────────────────
-class RateLimiter:
-    """초당 1회 보장"""
-    def __init__(self, rate_per_sec: float):
-        self.interval = 1.0 / rate_per_sec
-        self.lock = asyncio.Lock()
-        self.last_called = 0.0
-
-    async def wait(self):
-        async with self.lock:
-            now = time.monotonic()
-            wait_time = self.interval - (now - self.last_called)
-            if wait_time > 0:
-                await asyncio.sleep(wait_time)
-            self.last_called = time.monotonic()
+class _KnownNicknames:
+    """
+    봇이 이미 아는 닉네임 (등록 계정 / 전적 동기화 유저 / 대기분석에서 조회에 성공한 닉네임).
+    OCR 결과가 없는 닉네임이면 여기서 표기만 다른 같은 닉네임을 먼저 찾아본다 (Gemini 재질의 없이).
+    """
+    def __init__(self):
+        self._names: dict[str, set[str]] = {}  # 비교용 닉네임 → 실제 닉네임
+        self._loaded_at = 0.0
+
+    @staticmethod
+    def _load() -> set[str]:
+        session = SessionLocal()
+        try:
+            names = {n for (n,) in session.query(ERAccount.nickname)}
+            names |= {n for (n,) in session.query(User.active_er_nickname)}
+            names |= {n for (n,) in session.query(GameSyncState.nickname)}
+            names.discard(None)
+            return names
+        finally:
+            session.close()
+
+    async def refresh(self):
+        if time.monotonic() - self._loaded_at < KNOWN_NAMES_TTL:
+            return
+        self._loaded_at = time.monotonic()
+        try:
+            names = await asyncio.to_thread(self._load)
+        except Exception as e:
+            print(f"[알려진 닉네임] 불러오기 실패: {e}")
+            return
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        self._names.setdefault(_normalize_name(name), set()).add(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names.get(_normalize_name(name), ())
+
+    def same_name(self, name: str) -> str | None:
+        """표기만 다르고 비교용 닉네임이 똑같은 알려진 닉네임 (하나로 정해질 때만)"""
+        found = self._names.get(_normalize_name(name), set()) - {name}
+        return next(iter(found)) if len(found) == 1 else None
+
+
+class _ScanLookups:
+    """
+    대기분석 1회의 전적 조회. 닉네임마다 한 번만 조회하고 결과를 같이 쓴다.
+    동시에 진행하는 조회 수를 제한해서, OCR 스트리밍으로 닉네임이 한꺼번에 쏟아져도
+    대기분석 하나가 호출 한도 대기열을 통째로 차지하지 않게 한다.
+    """
+    def __init__(self, fetch: Callable[[str], Awaitable[dict]], limit: int):
+        self._fetch = fetch
+        self._slots = asyncio.Semaphore(limit)
+        self.tasks: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def start(self, name: str) -> asyncio.Task:
+        task = self.tasks.get(name)
+        if task is None:
+            task = self.tasks[name] = asyncio.create_task(self._run(name))
+        return task
+
+    async def get(self, name: str) -> dict:
+        """조회 결과 (복사본이라 고쳐 써도 된다)"""
+        return dict(await self.start(name))
+
+    async def _run(self, name: str) -> dict:
+        async with self._slots:
+            return await self._fetch(name)
+
+    def drop_pending(self):
+        """아직 끝나지 않은 조회를 취소하고 잊는다 (다시 start 하면 새로 조회)"""
+        for name, task in list(self.tasks.items()):
+            if not task.done():
+                task.cancel()
+                del self.tasks[name]
+
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
 
 
 # ────────────────────────────────────────────
@@ -345,72 +477,123 @@ class LobbyScan(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.gemini = genai.Client(api_key=AI_KEY)
-        self.rl = RateLimiter(rate_per_sec=1)
 
         self._userid_cache: dict[str, str]               = {}
         self._rank_cache:   dict[str, tuple[dict, float]] = {}
+        self.known_names = _KnownNicknames()
+        self.queue = FairQueue("lobby_scan", LOBBY_SCAN_CONCURRENCY)
+
+    def cog_unload(self):
+        image_pool.shutdown()
 
     # ── 캐시 헬퍼 ──────────────────────────────
     def _get_rank_cache(self, user_id: str) -> dict | None:
         entry = self._rank_cache.get(user_id)
-        if entry and (time.monotonic() - entry[1]) < RANK_CACHE_TTL:
-            return entry[0]
-        return None
+        hit = bool(entry and (time.monotonic() - entry[1]) < RANK_CACHE_TTL)
+        metrics.cache_result("lobby_rank", hit)
+        return entry[0] if hit else None
 
     def _set_rank_cache(self, user_id: str, data: dict):
         self._rank_cache[user_id] = (data, time.monotonic())
 
     # ── Gemini 호출 헬퍼 ────────────────────────
-    def _gemini_call(self, prompt: str, image_bytes: bytes, model_: str = "models/gemini-3-flash-preview") -> str:
-        """전처리된 이미지 bytes를 받아 Gemini에 전달하고 텍스트 응답 반환."""
+    @staticmethod
+    def _gemini_contents(prompt: str, image_bytes: bytes) -> list:
         image_b64 = base64.b64encode(image_bytes).decode("utf-8")
-        res = self.gemini.models.generate_content(
-            model=model_,
-            contents=[
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part(text=prompt),
-                        types.Part(inline_data=types.Blob(
-                            mime_type="image/png",
-                            data=image_b64
-                        ))
-                    ]
-                )
-            ]
-        )
+        return [
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part(text=prompt),
+                    types.Part(inline_data=types.Blob(
+                        mime_type="image/png",
+                        data=image_b64
+                    ))
+                ]
+            )
+        ]
+
+    @staticmethod
+    def _response_text(res) -> str:
+        if not res.candidates or not res.candidates[0].content:
+            return ""
         return "".join(
-            part.text for part in res.candidates[0].content.parts
+            part.text for part in res.candidates[0].content.parts or []
             if hasattr(part, "text") and part.text
-        ).strip()
+        )
+
+    @staticmethod
+    def _json_config(schema: dict) -> types.GenerateContentConfig:
+        """응답을 schema 모양의 JSON으로 고정"""
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_json_schema=schema,
+        )
+
+    def _gemini_call(
+        self, prompt: str, image_bytes: bytes, model_: str = "models/gemini-3-flash-preview", schema: dict = None
+    ) -> str:
+        """전처리된 이미지 bytes를 받아 Gemini에 전달하고 텍스트 응답 반환 (schema가 있으면 JSON 문자열)."""
+        with metrics.span("gemini", model_):
+            res = self.gemini.models.generate_content(
+                model=model_,
+                contents=self._gemini_contents(prompt, image_bytes),
+                config=self._json_config(schema) if schema else None,
+            )
+        return self._response_text(res).strip()
+
+    async def _gemini_stream(
+        self, prompt: str, image_bytes: bytes, model_: str, schema: dict = None
+    ) -> AsyncIterator[str]:
+        """Gemini 응답을 생성되는 대로 조각(text chunk)으로 넘겨준다."""
+        with metrics.span("gemini", model_):
+            stream = await self.gemini.aio.models.generate_content_stream(
+                model=model_,
+                contents=self._gemini_contents(prompt, image_bytes),
+                config=self._json_config(schema) if schema else None,
+            )
+            async for chunk in stream:
+                text = self._response_text(chunk)
+                if text:
+                    yield text
 
     # ── Gemini OCR (팀 구분 + 좌표 추출) ──────────
-    def extract_teams_from_image(self, image_bytes: bytes) -> list[list[dict]]:
+    async def extract_teams_from_image(
+        self, image: SharedImage, on_entry: Callable[[dict], None] = None,
+        model_: str = LOBBY_OCR_MODELS[0],
+    ) -> list[list[dict]]:
         """
         이미지에서 팀별 플레이어 목록을 추출한다.
-        각 플레이어: {"name": str, "box": [ymin, xmin, ymax, xmax] | None}
+        각 플레이어: {"name": str, "box": [ymin, xmin, ymax, xmax] | None,
+                      "confidence": float | None, "alternates": [str, ...]}
         좌표는 이미지 전체를 0~1000으로 정규화한 정수.
+
+        응답은 TEAMS_SCHEMA 모양의 JSON으로 받는다.
+        스트리밍 중 플레이어 객체가 닫힐 때마다 검증해서 on_entry(entry)를 바로 호출한다
+        (모델이 나머지를 생성하는 동안 전적 조회를 미리 시작할 수 있게).
+        모델에는 로스터 영역만 잘라 보내고, 돌려받은 좌표는 원본 기준으로 바꿔서 넘긴다.
         """
-        processed_bytes = _preprocess_image(image_bytes)
+        processed_bytes, roi, size = await image_pool.prepare(image)
+
+        def remap(entry: dict) -> dict:
+            if entry["box"] is not None:
+                entry["box"] = remap_box(entry["box"], roi, size)
+            return entry
+
         prompt = (
             "이터널 리턴 대기창 스크린샷이다.\n"
             "화면에 표시된 팀 번호(01, 02, 03 ...)를 기준으로 팀을 구분하고, "
-            "각 팀의 플레이어 닉네임과 해당 닉네임 텍스트가 위치한 영역의 좌표를 출력하라.\n\n"
-            "출력 형식 (좌표는 반드시 닉네임 뒤에 [ymin, xmin, ymax, xmax] 형태로 붙일 것):\n"
-            "팀1\n"
-            "닉네임A [123, 456, 150, 580]\n"
-            "닉네임B [210, 456, 235, 580]\n"
-            "\n"
-            "팀2\n"
-            "닉네임C [123, 600, 150, 720]\n\n"
+            "각 팀의 플레이어 닉네임과 해당 닉네임 텍스트가 위치한 영역의 좌표를 JSON으로 출력하라.\n\n"
+            "필드:\n"
+            "- team: 화면의 팀 번호 (정수)\n"
+            "- name: 닉네임\n"
+            "- box: [ymin, xmin, ymax, xmax] — 이미지 전체 크기를 0~1000으로 정규화한 정수\n"
+            "- confidence: 닉네임을 정확히 읽었다는 확신 (0~1)\n"
+            "- alternates: 확신이 낮을 때 가능성 있는 다른 표기 (최대 4개, 없으면 빈 배열)\n\n"
             "규칙:\n"
-            "- 좌표는 이미지 전체 크기를 0~1000으로 정규화한 정수 값으로 표시하라.\n"
             "- 각 좌표는 해당 닉네임 글자가 온전히 포함되도록 정확하게 잡아라.\n"
-            "- '팀N' 헤더 다음 줄부터 해당 팀 정보를 한 줄에 하나씩 나열.\n"
-            "- 팀 사이에 반드시 빈 줄 하나.\n"
             "- 화면에 보이지 않는 팀을 임의로 추가하지 말 것.\n"
-            "- 닉네임과 좌표 외 설명·번호·기호 절대 금지.\n"
-            "- 팀 구분이 불가능하면 '팀1' 하나로 전부 묶어 출력.\n\n"
+            "- 팀 구분이 불가능하면 team 1 하나로 전부 묶어 출력.\n\n"
             "닉네임 인식 주의사항:\n"
             "- 하이픈 계열 문자(─, -, 一, –, —, −, － 등)는 이미지에 보이는 그대로 출력하라. 임의로 다른 하이픈으로 바꾸지 말 것.\n"
             "- 대소문자를 정확히 구분하라.\n"
@@ -419,13 +602,24 @@ class LobbyScan(commands.Cog):
             "  · 한글 모음: ㅏ↔ㅑ, ㅓ↔ㅕ, ㅗ↔ㅛ, ㅜ↔ㅠ, ㅐ↔ㅔ, ㅡ↔ㅗ↔ㅜ, ㅣ↔ㅏ↔ㅓ\n"
             "  · 한글 초성: ㅈ↔ㅊ, ㄱ↔ㅋ, ㅂ↔ㅍ↔ㄹ↔ㅁ, ㅅ↔ㅆ, ㄷ↔ㄹ↔ㅌ\n"
         )
-        text = self._gemini_call(prompt, processed_bytes, "models/gemini-3-pro-preview")
-        # print(f"[OCR 원본 응답]\n{text}\n{'-'*30}")
-        return _parse_teams(text)
+        decoder = _JsonObjectStream()
+        streamed_teams, streamed_players = [], []
+        async for chunk in self._gemini_stream(prompt, processed_bytes, model_, TEAMS_SCHEMA):
+            for obj in decoder.feed(chunk):
+                if "players" in obj:
+                    streamed_teams.append(obj)
+                    continue
+                streamed_players.append(obj)
+                entry = _valid_player(obj)
+                if entry and on_entry:
+                    on_entry(remap(entry))
+        # print(f"[OCR 원본 응답]\n{decoder.text}\n{'-'*30}")
+        teams = _teams_from_json(decoder.text, streamed_teams, streamed_players)
+        return [[remap(e) for e in team] for team in teams]
 
     # ── 동적 크롭 재질의 (단일 닉네임) ────────────
-    def recheck_with_crop(
-        self, image_bytes: bytes, name: str, box: list[int]
+    async def recheck_with_crop(
+        self, image: SharedImage, name: str, box: list[int], model_: str = LOBBY_OCR_MODELS[0]
     ) -> list[str]:
         """
         닉네임 영역을 크롭해서 Gemini에 집중 재질의한다.
@@ -433,7 +627,7 @@ class LobbyScan(commands.Cog):
         실패 시 [name] (원래 이름) 반환.
         """
         try:
-            crop_bytes = _crop_nickname_region(image_bytes, box)
+            crop_bytes = await image_pool.crop(image, box)
         except ValueError as e:
             print(f"[크롭 실패] {name!r}: {e}")
             return [name]
@@ -441,8 +635,7 @@ class LobbyScan(commands.Cog):
         prompt = (
             "이터널 리턴 대기창에서 특정 플레이어의 닉네임 영역만 잘라낸 이미지다.\n"
             f"이 이미지에서 닉네임을 정확히 읽어라. 현재 OCR 결과는 '{name}'이지만 틀릴 수 있다.\n\n"
-            "출력 형식:\n"
-            "후보1|+]후보2|+]후보3   ← 불확실하면 최대 4개 후보를 '|+]'로 구분\n\n"
+            "candidates 배열에 닉네임 후보를 JSON으로 출력하라 (불확실하면 최대 4개).\n\n"
             "규칙:\n"
             "- 가장 확실한 후보를 맨 앞에 놓아라.\n"
             "- 확신이 있으면 후보 1개만 출력해도 됨.\n"
@@ -452,132 +645,102 @@ class LobbyScan(commands.Cog):
             "  · 숫자/라틴: 0↔O, 1↔l↔I, rn↔m\n"
             "  · 한글 모음: ㅏ↔ㅑ, ㅓ↔ㅕ, ㅗ↔ㅛ, ㅜ↔ㅠ, ㅐ↔ㅔ, ㅡ↔ㅗ↔ㅜ, ㅣ↔ㅏ↔ㅓ\n"
             "  · 한글 초성: ㅈ↔ㅊ, ㄱ↔ㅋ, ㅂ↔ㅍ↔ㄹ↔ㅁ, ㅅ↔ㅆ, ㄷ↔ㄹ↔ㅌ\n"
-            "- 하이픈이 포함된 닉네임은 다양한 하이픈 변형을 후보로 추가하라.\n"
-            "- 닉네임 외 설명·기호 절대 금지."
+            "- 하이픈이 포함된 닉네임은 다양한 하이픈 변형을 후보로 추가하라."
         )
-        text = self._gemini_call(prompt, crop_bytes)
-        candidates = [c.strip() for c in text.split("|+]") if c.strip()]
+        text = await asyncio.to_thread(self._gemini_call, prompt, crop_bytes, model_, CANDIDATES_SCHEMA)
+        candidates = _valid_names(_load_json(text).get("candidates"))
         return candidates if candidates else [name]
 
     # ── 전체 이미지 재질의 (여러 닉네임, 폴백용) ──
-    def recheck_failed_nicknames(
-        self, image_bytes: bytes, failed_names: list[str]
+    async def recheck_failed_nicknames(
+        self, image: SharedImage, failed_names: list[str], model_: str = LOBBY_OCR_MODELS[0]
     ) -> dict[str, list[str]]:
         """
         조회 실패한 닉네임 목록을 원본 이미지와 함께 Gemini에 재질의.
         반환값: { 원래_닉네임: [후보1, 후보2, ...] }
         """
-        processed_bytes = _preprocess_image(image_bytes)
+        processed_bytes, _, _ = await image_pool.prepare(image)
         names_str = "\n".join(f"- {n}" for n in failed_names)
         prompt = (
             "이터널 리턴 대기창 스크린샷이다.\n"
             "아래 닉네임들은 OCR 인식 결과인데 게임 API 조회에 실패했다. "
             "이미지를 다시 보고 각 닉네임이 실제로 어떻게 적혀 있는지 정확히 읽어라.\n\n"
             f"실패 목록:\n{names_str}\n\n"
-            "출력 형식:\n"
-            "원래닉네임|+]수정된닉네임\n"
-            "원래닉네임2|+]후보A|+]후보B|+]후보C   ← 불확실하면 후보 최대 4개를 '|+]'로 구분\n\n"
+            "corrections 배열에 실패 목록의 닉네임마다 "
+            "{original: 원래 닉네임, candidates: 실제 닉네임 후보} 를 JSON으로 출력하라.\n\n"
             "규칙:\n"
-            "- 반드시 '|+]' 구분자 사용, 한 줄에 하나씩.\n"
-            "- 변경 없으면 원래 닉네임 그대로 출력.\n"
+            "- original 은 실패 목록에 적힌 그대로 쓸 것.\n"
+            "- 변경 없으면 candidates 에 원래 닉네임 그대로.\n"
             "- 확신이 없을 때는 가능성 있는 후보를 모두 나열하라 (최대 4개).\n"
             "- 하이픈 모양 문자(─, -, 一, –, —, −, － 등)가 포함된 닉네임은 "
             "각 하이픈 변형을 후보로 추가하라.\n"
             "- OCR 혼동이 잦은 문자 쌍을 적극 고려하라:\n"
             "  · 숫자/라틴: 0↔O, 1↔l↔I, rn↔m\n"
             "  · 한글 모음: ㅏ↔ㅑ, ㅓ↔ㅕ, ㅗ↔ㅛ, ㅜ↔ㅠ, ㅐ↔ㅔ, ㅡ↔ㅗ↔ㅜ, ㅣ↔ㅏ↔ㅓ\n"
-            "  · 한글 초성: ㅈ↔ㅊ, ㄱ↔ㅋ, ㅂ↔ㅍ↔ㄹ↔ㅁ, ㅅ↔ㅆ, ㄷ↔ㄹ↔ㅌ\n"
-            "- 설명·번호·기호 절대 금지."
+            "  · 한글 초성: ㅈ↔ㅊ, ㄱ↔ㅋ, ㅂ↔ㅍ↔ㄹ↔ㅁ, ㅅ↔ㅆ, ㄷ↔ㄹ↔ㅌ"
         )
-        text = self._gemini_call(prompt, processed_bytes)
+        text = await asyncio.to_thread(self._gemini_call, prompt, processed_bytes, model_, CORRECTIONS_SCHEMA)
 
         corrections: dict[str, list[str]] = {}
-        for line in text.splitlines():
-            line = line.strip()
-            if "|+]" not in line:
+        for item in _load_json(text).get("corrections") or []:
+            if not isinstance(item, dict) or not isinstance(item.get("original"), str):
                 continue
-            parts = line.split("|+]")
-            original   = parts[0].strip()
-            candidates = [p.strip() for p in parts[1:] if p.strip()]
-            if original and candidates:
-                corrections[original] = candidates
+            candidates = _valid_names(item.get("candidates"))
+            if item["original"].strip() and candidates:
+                corrections[item["original"].strip()] = candidates
 
         for n in failed_names:
             corrections.setdefault(n, [n])
         return corrections
 
     # ── ER API ──────────────────────────────────
-    async def get_user_id(self, session, nickname):
+    async def get_user_id(self, nickname):
+        metrics.cache_result("lobby_userid", nickname in self._userid_cache)
         if nickname in self._userid_cache:
             return self._userid_cache[nickname]
 
-        headers = {"x-api-key": ER_KEY}
-        for attempt in range(MAX_RETRY_429):
-            await self.rl.wait()
-            async with session.get(
-                f"{ER_BASE}/user/nickname",
-                headers=headers,
-                params={"query": nickname}
-            ) as r:
-                if r.status == 429:
-                    wait = 2 ** attempt  # 지수 백오프: 1초 → 2초 → 4초
-                    print(f"[429] {nickname!r} 재시도 {attempt+1}/{MAX_RETRY_429}, {wait}초 대기")
-                    await asyncio.sleep(wait)
-                    continue
-                
-                body = await r.json()
-                
-                if r.status != 200:
-                    print(f"[API 실패] {nickname!r}: status={r.status}, body={body}")
-                    return None
-                
-                user_id = body.get("user", {}).get("userId")
-                
-                # ← 핵심 수정: userId=0도 유효한 값으로 처리
-                if user_id is not None:
-                    self._userid_cache[nickname] = user_id
-                    return user_id
-                
-                print(f"[userId 없음] {nickname!r}: body={body}")
-                return None
-        
-        print(f"[429 한도 초과] {nickname!r}: {MAX_RETRY_429}회 재시도 모두 실패")
-        return None
+        # 429 / 장애 대응(백오프, 서킷 브레이커)은 공용 클라이언트가 처리
+        # 대기분석 조회는 한꺼번에 몰리므로 다른 명령어 호출보다 뒤 순서로 (PRIORITY_BATCH)
+        user_id = await client.fetch_user_id(nickname, priority=PRIORITY_BATCH)
+        if user_id is None:
+            print(f"[userId 없음] {nickname!r}")
+            return None
+        self._userid_cache[nickname] = user_id
+        return user_id
 
-    async def get_rank(self, session: aiohttp.ClientSession, user_id: str) -> dict | None:
+    async def get_rank(self, user_id: str) -> dict | None:
         cached = self._get_rank_cache(user_id)
         if cached is not None:
             return cached
 
-        headers = {"x-api-key": ER_KEY}
-        for _ in range(MAX_RETRY_429):
-            await self.rl.wait()
-            async with session.get(
-                f"{ER_BASE}/rank/uid/{user_id}/{CURRENT_SEASON_NUM}/{MATCH_MODE}",
-                headers=headers
-            ) as r:
-                body = await r.json()
-                if r.status == 429:
-                    await asyncio.sleep(1)
-                    continue
-                if r.status != 200:
-                    return None
-                user_rank = body.get("userRank")
-                if user_rank:
-                    self._set_rank_cache(user_id, user_rank)
-                return user_rank
-        return None
-
-    async def get_user_data(self, session: aiohttp.ClientSession, nickname: str) -> dict:
-        """항상 dict 반환. tier/mmr/rank/hidden 포함. box는 호출자가 별도 관리."""
+        body = await client.get(
+            f"/rank/uid/{user_id}/{CURRENT_SEASON_NUM}/{MATCH_MODE}", priority=PRIORITY_BATCH, degrade=False
+        )
+        if not body:
+            return None
+        user_rank = body.get("userRank")
+        if user_rank:
+            self._set_rank_cache(user_id, user_rank)
+        return user_rank
+
+    async def get_user_data(self, nickname: str) -> dict:
+        """
+        항상 dict 반환. tier/mmr/rank/hidden 포함. box는 호출자가 별도 관리.
+        ER API가 응답하지 않아 확인하지 못했으면 "unavailable": True (tier None 이어도 없는 닉네임이 아님)
+        """
         if HIDDEN_NAME_RE.match(nickname):
             return {"nickname": nickname, "tier": None, "mmr": None, "rank": None, "hidden": True}
 
-        user_id = await self.get_user_id(session, nickname)
-        if not user_id:
-            return {"nickname": nickname, "tier": None, "mmr": None, "rank": None, "hidden": False}
-
-        rank_data = await self.get_rank(session, user_id)
+        try:
+            user_id = await self.get_user_id(nickname)
+            if not user_id:
+                return {"nickname": nickname, "tier": None, "mmr": None, "rank": None, "hidden": False}
+
+            self.known_names.add(nickname)
+            rank_data = await self.get_rank(user_id)
+        except UpstreamUnavailable as e:
+            print(f"[조회 보류] {nickname!r}: {e}")
+            return {"nickname": nickname, "tier": None, "mmr": None, "rank": None, "hidden": False, "unavailable": True}
         if not rank_data or not rank_data.get("rank"):
             return {"nickname": nickname, "tier": "Unranked", "mmr": 0, "rank": None, "hidden": False}
 
@@ -588,6 +751,32 @@ class LobbyScan(commands.Cog):
 
         return {"nickname": nickname, "tier": tier, "mmr": mmr, "rank": rank, "hidden": False}
 
+    async def _ocr_doubt(self, teams: list[list[dict]], lookups: _ScanLookups) -> str | None:
+        """팀 OCR 결과를 다음 모델로 다시 읽어야 할 이유 (괜찮으면 None)"""
+        entries = [e for team in teams for e in team]
+        if not entries:
+            return "인식 0명"
+        if any(len(team) > MAX_TEAM_SIZE for team in teams):
+            return "팀 구성 이상"
+
+        names = list(dict.fromkeys(e["name"] for e in entries if not HIDDEN_NAME_RE.match(e["name"])))
+        if not names:
+            return None
+
+        # "없는 닉네임"만 OCR 오류로 센다 (API 응답 없음은 제외). 기준을 넘는 순간 나머지를 기다리지 않는다
+        limit = math.ceil(len(names) * OCR_ESCALATE_RATIO)
+        not_found = 0
+        for next_done in asyncio.as_completed([lookups.start(n) for n in names]):
+            try:
+                r = await next_done
+            except Exception:
+                continue
+            if _not_found(r) and r["nickname"] not in self.known_names:
+                not_found += 1
+                if not_found >= limit:
+                    return f"없는 닉네임 {not_found}/{len(names)}"
+        return None
+
     # ── Command ─────────────────────────────────
     @commands.command(name="대기분석", aliases=["ㄷㄱㅂㅅ"])
     async def lobby_scan(self, ctx):
@@ -600,18 +789,71 @@ class LobbyScan(commands.Cog):
 
         image_bytes = await ctx.message.attachments[0].read()
         msg = await ctx.send("🔍 이미지 분석중...")
+
+        # 동시에 도는 분석 수 제한 — 자리가 없으면 대기 순번을 보여주며 기다린다
+        waited = False
+
+        async def show_position(pos: int):
+            nonlocal waited
+            waited = True
+            await msg.edit(content=f"⏳ 분석 대기중... (대기 {pos}번째)")
+
+        guild_id = ctx.guild.id if ctx.guild else None
+        async with self.queue.slot(guild_id, ctx.author.id, on_position=show_position):
+            if waited:
+                await msg.edit(content="🔍 이미지 분석중...")
+            await self._run_lobby_scan(ctx, msg, image_bytes)
+
+    async def _run_lobby_scan(self, ctx, msg, image_bytes: bytes):
         print(f"\n{'='*40}\n[대기분석 시작] by {ctx.author}\n{'='*40}")
 
         # ── Gemini OCR (팀 구분 + 좌표 추출) ──
-        # teams: list[list[{"name": str, "box": list|None}]]
-        ocr_teams: list[list[dict]] = await asyncio.to_thread(
-            self.extract_teams_from_image, image_bytes
+        # 응답이 스트리밍으로 오는 동안 인식된 닉네임부터 전적 조회를 먼저 시작한다
+        lookups = _ScanLookups(self.get_user_data, SCAN_LOOKUP_CONCURRENCY)
+
+        def prefetch(entry: dict):
+            name = entry["name"]
+            if HIDDEN_NAME_RE.match(name):
+                return
+            names = [name]
+            if entry["confidence"] is not None and entry["confidence"] < OCR_MIN_CONFIDENCE:
+                names += entry["alternates"]
+            for n in names:
+                lookups.start(n)
+
+        # 원본은 공유 메모리에 한 번 올려 두고 이미지 작업 프로세스들이 같이 읽는다
+        try:
+            with SharedImage(image_bytes) as image:
+                await self._scan_lobby(ctx, msg, image, lookups, prefetch)
+        finally:
+            lookups.cancel()
+
+    async def _scan_lobby(
+        self, ctx, msg, image: SharedImage, lookups: _ScanLookups, prefetch: Callable[[dict], None],
+    ):
+        await self.known_names.refresh()
+
+        # teams: list[list[{"name": str, "box": list|None, "confidence": float|None, "alternates": list}]]
+        # 가벼운 모델로 먼저 읽고, 결과가 미덥지 않을 때만 다음 모델로 다시 읽는다
+        ocr_teams: list[list[dict]] = await self.extract_teams_from_image(
+            image, on_entry=prefetch, model_=LOBBY_OCR_MODELS[0]
         )
+        for model_ in LOBBY_OCR_MODELS[1:]:
+            reason = await self._ocr_doubt(ocr_teams, lookups)
+            if reason is None:
+                break
+            print(f"[OCR 승급] {reason} → {model_}")
+            metrics.registry.inc("lobby_ocr_escalations_total", stage="teams", model=model_)
+            # 앞 모델이 읽은 닉네임으로 아직 진행 중인 조회는 버린다 (다시 읽은 닉네임으로 새로 조회)
+            lookups.drop_pending()
+            await msg.edit(content=f"🔍 이미지 정밀 분석중... ({reason})")
+            ocr_teams = await self.extract_teams_from_image(image, on_entry=prefetch, model_=model_)
 
         all_ocr = [entry for team in ocr_teams for entry in team]
         if not all_ocr:
             await msg.edit(content="❌ 닉네임 인식 실패 (이미지를 확인해주세요)")
             return
+        early = len(lookups)
 
         hidden_count = sum(1 for e in all_ocr if HIDDEN_NAME_RE.match(e["name"]))
         need_api     = len(all_ocr) - hidden_count
@@ -634,33 +876,33 @@ class LobbyScan(commands.Cog):
         ))
         print(
             f"[인식] 총={len(all_ocr)}, 팀={len(ocr_teams)}, "
-            f"비공개={hidden_count}, 좌표={box_count}, API 필요={need_api}"
+            f"비공개={hidden_count}, 좌표={box_count}, API 필요={need_api}, 미리 조회={early}"
         )
 
-        # ── ER API 순차 조회 ──
+        # ── ER API 조회 (스트리밍 중 시작한 조회는 결과만 받음) ──
         # team_results: list[list[dict]]
-        # 각 dict: get_user_data 결과 + "box" 키 추가
+        # 각 dict: get_user_data 결과 + "box" / "alternates" 키 추가
         team_results: list[list[dict]] = []
         api_done = 0
 
-        async with aiohttp.ClientSession() as session:
-            for ocr_team in ocr_teams:
-                tr = []
-                for entry in ocr_team:
-                    name = entry["name"]
-                    box  = entry["box"]
-                    if not HIDDEN_NAME_RE.match(name):
-                        api_done += 1
-                        await msg.edit(content=(
-                            f"✅ **{len(all_ocr)}명** 인식 완료 "
-                            f"(팀 {len(ocr_teams)}개 | 비공개 {hidden_count}명)\n"
-                            f"```\n{names_preview}\n```\n"
-                            f"⧖ 전적 조회중... ({api_done} / {need_api}) — `{name}`"
-                        ))
-                    data = await self.get_user_data(session, name)
-                    data["box"] = box  # 좌표 보존
-                    tr.append(data)
-                team_results.append(tr)
+        for ocr_team in ocr_teams:
+            tr = []
+            for entry in ocr_team:
+                name = entry["name"]
+                box  = entry["box"]
+                if not HIDDEN_NAME_RE.match(name):
+                    api_done += 1
+                    await msg.edit(content=(
+                        f"✅ **{len(all_ocr)}명** 인식 완료 "
+                        f"(팀 {len(ocr_teams)}개 | 비공개 {hidden_count}명)\n"
+                        f"```\n{names_preview}\n```\n"
+                        f"⧖ 전적 조회중... ({api_done} / {need_api}) — `{name}`"
+                    ))
+                data = await lookups.get(name)
+                data["box"] = box  # 좌표 보존
+                data["alternates"] = entry["alternates"]
+                tr.append(data)
+            team_results.append(tr)
 
         # ── 임베드 빌더 ──
         def build_embed(results: list[list[dict]]) -> tuple[discord.Embed, int, list[str]]:
@@ -676,6 +918,8 @@ class LobbyScan(commands.Cog):
                 for r in team_data:
                     if r["hidden"]:
                         team_lines.append("> 닉네임 비공개")
+                    elif r.get("unavailable"):
+                        team_lines.append(f"> **`{r['nickname']}`** · ⚠️ 전적 서버 응답 없음")
                     elif r["tier"] is None:
                         _fail.append(r["nickname"])
                         team_lines.append(f"> ~~**`{r['nickname']}`** ~~ · 조회 실패")
@@ -718,36 +962,77 @@ class LobbyScan(commands.Cog):
         print(f"[1차 완료] 팀={len(ocr_teams)}, 성공={ok_count}, 비공개={hidden_count}, 실패={len(fail_names)}")
 
         # ════════════════════════════════════════════
-        # 0단계: 하이픈 변형 시도 (Gemini 없음)
+        # 0단계: OCR 대안 후보 / 알려진 닉네임 / 하이픈 변형 시도 (Gemini 없음)
         # ════════════════════════════════════════════
+        any_alt_updated = False
+        for team_data in team_results:
+            for pi, r in enumerate(team_data):
+                if not _not_found(r):
+                    continue
+                for candidate in r.get("alternates") or []:
+                    new_data = await lookups.get(candidate)
+                    if new_data["tier"] is not None:
+                        new_data["box"] = r["box"]
+                        team_data[pi] = new_data
+                        any_alt_updated = True
+                        print(f"[OCR 대안 후보] {r['nickname']!r} → {candidate!r}, tier={new_data['tier']}")
+                        break
+        if any_alt_updated:
+            embed, ok_count, fail_names = build_embed(team_results)
+            await msg.edit(embed=embed)
+
+        # 표기만 다른 같은 닉네임으로만 바꾼다 (이 대기창에서 이미 찾은 닉네임은 제외 — 한 사람이 두 자리에 나오지 않게)
+        known_targets = [
+            (ti, pi, r)
+            for ti, team_data in enumerate(team_results)
+            for pi, r in enumerate(team_data)
+            if _not_found(r)
+        ]
+        found_names = {r["nickname"] for team_data in team_results for r in team_data if r["tier"] is not None}
+        any_known_updated = False
+        for ti, pi, r in known_targets:
+            old_name  = r["nickname"]
+            candidate = self.known_names.same_name(old_name)
+            if candidate is None or candidate in found_names:
+                continue
+            new_data = await lookups.get(candidate)
+            if new_data["tier"] is not None:
+                new_data["box"] = r["box"]
+                team_results[ti][pi] = new_data
+                found_names.add(candidate)
+                any_known_updated = True
+                print(f"[알려진 닉네임] {old_name!r} → {candidate!r}, tier={new_data['tier']}")
+        if any_known_updated:
+            embed, ok_count, fail_names = build_embed(team_results)
+            await msg.edit(embed=embed)
+
         hyphen_targets = [
             (ti, pi, r)
             for ti, team_data in enumerate(team_results)
             for pi, r in enumerate(team_data)
-            if not r["hidden"] and r["tier"] is None and _hyphen_variants(r["nickname"])
+            if _not_found(r) and _hyphen_variants(r["nickname"])
         ]
         if hyphen_targets:
             print(f"[하이픈 변형 시도] {len(hyphen_targets)}명 대상")
             any_hyphen_updated = False
-            async with aiohttp.ClientSession() as session:
-                for ti, pi, r in hyphen_targets:
-                    old_name   = r["nickname"]
-                    candidates = _hyphen_variants(old_name)
-                    print(f"[하이픈 변형] {old_name!r} → {candidates}")
-                    resolved   = None
-                    for candidate in candidates:
-                        new_data = await self.get_user_data(session, candidate)
-                        if new_data["tier"] is not None:
-                            new_data["nickname"] = candidate
-                            new_data["box"]      = r["box"]
-                            resolved = new_data
-                            print(f"[하이픈 성공] {old_name!r} → {candidate!r}, tier={new_data['tier']}")
-                            break
-                    if resolved:
-                        team_results[ti][pi] = resolved
-                        any_hyphen_updated   = True
-                    else:
-                        print(f"[하이픈 전부 실패] {old_name!r}")
+            for ti, pi, r in hyphen_targets:
+                old_name   = r["nickname"]
+                candidates = _hyphen_variants(old_name)
+                print(f"[하이픈 변형] {old_name!r} → {candidates}")
+                resolved   = None
+                for candidate in candidates:
+                    new_data = await lookups.get(candidate)
+                    if new_data["tier"] is not None:
+                        new_data["nickname"] = candidate
+                        new_data["box"]      = r["box"]
+                        resolved = new_data
+                        print(f"[하이픈 성공] {old_name!r} → {candidate!r}, tier={new_data['tier']}")
+                        break
+                if resolved:
+                    team_results[ti][pi] = resolved
+                    any_hyphen_updated   = True
+                else:
+                    print(f"[하이픈 전부 실패] {old_name!r}")
 
             if any_hyphen_updated:
                 embed, ok_count, fail_names = build_embed(team_results)
@@ -760,7 +1045,7 @@ class LobbyScan(commands.Cog):
             (ti, pi, r)
             for ti, team_data in enumerate(team_results)
             for pi, r in enumerate(team_data)
-            if not r["hidden"] and r["tier"] is None and r.get("box") is not None
+            if _not_found(r) and r.get("box") is not None
         ]
 
         if crop_targets:
@@ -768,17 +1053,18 @@ class LobbyScan(commands.Cog):
             tried_crop: dict[str, set[str]] = {}
             any_crop_updated = False
 
-            async with aiohttp.ClientSession() as session:
-                for ti, pi, r in crop_targets:
-                    old_name = r["nickname"]
-                    box      = r["box"]
-                    tried    = tried_crop.setdefault(old_name, set())
+            for ti, pi, r in crop_targets:
+                old_name = r["nickname"]
+                box      = r["box"]
+                tried    = tried_crop.setdefault(old_name, set())
 
-                    # Gemini 크롭 재질의 → 후보 목록
-                    crop_candidates: list[str] = await asyncio.to_thread(
-                        self.recheck_with_crop, image_bytes, old_name, box
-                    )
-                    print(f"[크롭 재질의] {old_name!r} → 후보: {crop_candidates}")
+                # Gemini 크롭 재질의 → 후보 목록 (가벼운 모델부터, 못 찾으면 다음 모델)
+                resolved = None
+                for level, model_ in enumerate(LOBBY_OCR_MODELS):
+                    if level:
+                        metrics.registry.inc("lobby_ocr_escalations_total", stage="crop", model=model_)
+                    crop_candidates: list[str] = await self.recheck_with_crop(image, old_name, box, model_)
+                    print(f"[크롭 재질의] {old_name!r} ({model_}) → 후보: {crop_candidates}")
 
                     # 새 후보만 필터
                     new_candidates = [
@@ -798,21 +1084,22 @@ class LobbyScan(commands.Cog):
                         print(f"[크롭 재질의] {old_name!r}: 새 후보 없음")
                         continue
 
-                    resolved = None
                     for candidate in new_candidates:
-                        new_data = await self.get_user_data(session, candidate)
+                        new_data = await lookups.get(candidate)
                         if new_data["tier"] is not None:
                             new_data["nickname"] = candidate
                             new_data["box"]      = box
                             resolved = new_data
                             print(f"[크롭 성공] {old_name!r} → {candidate!r}, tier={new_data['tier']}")
                             break
-
                     if resolved:
-                        team_results[ti][pi] = resolved
-                        any_crop_updated     = True
-                    else:
-                        print(f"[크롭 재질의] {old_name!r}: 모든 후보 실패")
+                        break
+
+                if resolved:
+                    team_results[ti][pi] = resolved
+                    any_crop_updated     = True
+                else:
+                    print(f"[크롭 재질의] {old_name!r}: 모든 후보 실패")
 
             if any_crop_updated:
                 embed, ok_count, fail_names = build_embed(team_results)
@@ -829,7 +1116,7 @@ class LobbyScan(commands.Cog):
                 (ti, pi, r)
                 for ti, team_data in enumerate(team_results)
                 for pi, r in enumerate(team_data)
-                if not r["hidden"] and r["tier"] is None
+                if _not_found(r)
             ]
             if not failed_entries:
                 break
@@ -837,48 +1124,49 @@ class LobbyScan(commands.Cog):
             failed_names_list = [e[2]["nickname"] for e in failed_entries]
             print(f"[전체이미지 재시도 {recheck_round}] 실패 닉네임: {failed_names_list}")
 
-            corrections: dict[str, list[str]] = await asyncio.to_thread(
-                self.recheck_failed_nicknames, image_bytes, failed_names_list
+            # 첫 라운드는 가벼운 모델, 이후 라운드는 다음 모델
+            model_ = LOBBY_OCR_MODELS[min(recheck_round - 1, len(LOBBY_OCR_MODELS) - 1)]
+            corrections: dict[str, list[str]] = await self.recheck_failed_nicknames(
+                image, failed_names_list, model_
             )
             print(f"[전체이미지 재시도 {recheck_round}] 수정안: {corrections}")
 
             any_updated       = False
             any_new_candidate = False
 
-            async with aiohttp.ClientSession() as session:
-                for ti, pi, r in failed_entries:
-                    old_name     = r["nickname"]
-                    box          = r.get("box")
-                    gemini_names = corrections.get(old_name, [old_name])
-                    tried        = tried_candidates.setdefault(old_name, set())
-
-                    new_candidates = [
-                        gn for gn in gemini_names
-                        if gn != old_name and gn not in tried
-                    ]
-                    if not new_candidates:
-                        print(f"[전체이미지 {recheck_round}] {old_name!r}: 새 후보 없음, 스킵")
-                        continue
-
-                    any_new_candidate = True
-                    tried.update(new_candidates)
-                    print(f"[전체이미지 {recheck_round}] {old_name!r} 후보: {new_candidates}")
-
-                    resolved = None
-                    for candidate in new_candidates:
-                        new_data = await self.get_user_data(session, candidate)
-                        if new_data["tier"] is not None:
-                            new_data["nickname"] = candidate
-                            new_data["box"]      = box
-                            resolved = new_data
-                            print(f"[전체이미지 성공] {old_name!r} → {candidate!r}, tier={new_data['tier']}")
-                            break
+            for ti, pi, r in failed_entries:
+                old_name     = r["nickname"]
+                box          = r.get("box")
+                gemini_names = corrections.get(old_name, [old_name])
+                tried        = tried_candidates.setdefault(old_name, set())
+
+                new_candidates = [
+                    gn for gn in gemini_names
+                    if gn != old_name and gn not in tried
+                ]
+                if not new_candidates:
+                    print(f"[전체이미지 {recheck_round}] {old_name!r}: 새 후보 없음, 스킵")
+                    continue
 
-                    if resolved:
-                        team_results[ti][pi] = resolved
-                        any_updated          = True
-                    else:
-                        print(f"[전체이미지 {recheck_round}] {old_name!r}: 모든 후보 실패")
+                any_new_candidate = True
+                tried.update(new_candidates)
+                print(f"[전체이미지 {recheck_round}] {old_name!r} 후보: {new_candidates}")
+
+                resolved = None
+                for candidate in new_candidates:
+                    new_data = await lookups.get(candidate)
+                    if new_data["tier"] is not None:
+                        new_data["nickname"] = candidate
+                        new_data["box"]      = box
+                        resolved = new_data
+                        print(f"[전체이미지 성공] {old_name!r} → {candidate!r}, tier={new_data['tier']}")
+                        break
+
+                if resolved:
+                    team_results[ti][pi] = resolved
+                    any_updated          = True
+                else:
+                    print(f"[전체이미지 {recheck_round}] {old_name!r}: 모든 후보 실패")
 
             if any_updated:
                 embed, ok_count, fail_names = build_embed(team_results)
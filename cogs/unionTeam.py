@@ -1,17 +1,24 @@
 # cogs/unionTeam.py
+import asyncio
+import json
 import discord
 from discord.ext import commands
-import aiohttp
-from typing import Optional, List, Dict
-from datetime import datetime
-
-from config import ER_KEY
-from db import SessionLocal
-from models import User
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime, timedelta
+
+import accounts
+import history
+import metrics
+import dedup
+from db import SessionLocal, bulk_upsert
+from er_api import client
+from models import UnionTeamCache
 from data import Character_Names, Weapon_Types, CURRENT_SEASON_NUM
 
-ER_BASE    = "https://open-api.bser.io/v1"
 UNION_MATCHING_MODE = 8
+UNION_FIRST_SEASON  = 29   # 유니온 도입 시즌 (시즌 6)
+UNION_CURRENT_TTL   = 600  # 현재 시즌 팀 정보 캐시 유지 시간 (초)
+UNION_GAMES_LIMIT   = 200  # 시즌 구분에 사용할 최근 유니온 게임 수
 
 # 시즌 ID → 한글 표기
 SEASON_NAMES: Dict[int, str] = {
@@ -110,35 +117,18 @@ class UnionSeasonView(discord.ui.View):
 class UnionTeamCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot     = bot
-        self.api_key = ER_KEY
 
     # ---- DB ----
 
-    def get_active_nickname(self, user_id: str) -> Optional[str]:
-        session = SessionLocal()
-        try:
-            user = session.get(User, user_id)
-            return user.active_er_nickname if user and hasattr(user, "active_er_nickname") else None
-        finally:
-            session.close()
-
-    # ---- API 공통 ----
-
-    @property
-    def _headers(self) -> dict:
-        return {"x-api-key": self.api_key}
-
-    async def _get(self, url: str, **params) -> Optional[dict]:
-        async with aiohttp.ClientSession() as s:
-            async with s.get(url, headers=self._headers,
-                             params=params if params else None) as r:
-                return await r.json() if r.status == 200 else None
+    def get_active_nickname(self, user_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """활성 닉네임 + 등록 때 저장한 ER userId"""
+        return accounts.active_account(user_id)
 
     # ---- API 개별 ----
 
     async def fetch_user_id(self, nickname: str) -> Optional[str]:
-        data = await self._get(f"{ER_BASE}/user/nickname", query=nickname)
-        return data["user"]["userId"] if data and data.get("user") else None
+        # 공용 클라이언트의 닉네임 캐시(TTL)로 — 닉네임이 바뀌거나 다른 사람이 가져가도 오래 묶이지 않게
+        return await client.fetch_user_id(nickname)
 
     def get_tier(self, tier_score: int) -> str:
         if tier_score >= 70:
@@ -156,26 +146,80 @@ class UnionTeamCog(commands.Cog):
         else:
             return "Unknown"
 
-    async def fetch_union_teams(self, user_id: str, season_id: int) -> List[Dict]:
-        data = await self._get(f"{ER_BASE}/unionTeam/uid/{user_id}/{season_id}")
-        return (data.get("teams") or []) if data else []
+    async def fetch_union_teams(self, user_id: str, season_id: int) -> Optional[List[Dict]]:
+        """유니온 팀 목록. 조회 실패 시 None (캐시하지 않음)"""
+        data = await client.get(f"/unionTeam/uid/{user_id}/{season_id}")
+        return (data.get("teams") or []) if data else None
+
+    async def fetch_union_games(self, user_id: str) -> List[Dict]:
+        """로컬 저장소 갱신 후 유니온 대전 기록 (최신순)"""
+        await history.refresh(user_id, max_pages=history.INTERACTIVE_PAGES)
+        return history.latest_games(user_id, UNION_GAMES_LIMIT, matching_mode=UNION_MATCHING_MODE)
+
+    # ---- 시즌별 팀 캐시 ----
 
-    async def fetch_user_games(self, user_id: str) -> List[Dict]:
-        data = await self._get(f"{ER_BASE}/user/games/uid/{user_id}")
-        return (data.get("userGames") or []) if data else []
+    def _load_union_cache(self, user_id: str) -> Dict[int, List[Dict]]:
+        """캐시된 시즌별 팀 목록. 지난 시즌은 항상, 현재 시즌은 TTL 안에서만 유효"""
+        session = SessionLocal()
+        try:
+            rows = session.query(UnionTeamCache).filter(UnionTeamCache.er_user_id == user_id).all()
+            result = {}
+            for row in rows:
+                if row.season_id >= CURRENT_SEASON_NUM and (
+                    not row.fetched_at
+                    or datetime.now() - row.fetched_at > timedelta(seconds=UNION_CURRENT_TTL)
+                ):
+                    continue
+                result[row.season_id] = json.loads(row.teams)
+            return result
+        finally:
+            session.close()
+
+    def _save_union_cache(self, user_id: str, teams_by_season: Dict[int, List[Dict]]):
+        if not teams_by_season:
+            return
+        session = SessionLocal()
+        try:
+            bulk_upsert(session, UnionTeamCache, [
+                {
+                    "er_user_id": user_id,
+                    "season_id": sid,
+                    "teams": json.dumps(teams, ensure_ascii=False),
+                    "fetched_at": datetime.now(),
+                }
+                for sid, teams in teams_by_season.items()
+            ])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
 
     # ---- 시즌 목록 구성 ----
 
     async def build_season_list(self, user_id: str, union_games: List[Dict]) -> List[Dict]:
         """
         유니온은 시즌 6(ID 29)부터 도입. 시즌만 해당(프리시즌 제외).
-        CURRENT_SEASON_NUM부터 29까지 2씩 내려가며 조회.
+        CURRENT_SEASON_NUM부터 29까지 2씩 내려가며 구성.
+        캐시에 없는 시즌만 동시에 조회한다 (호출 간격은 공용 클라이언트가 조절).
         """
+        season_ids = list(range(CURRENT_SEASON_NUM, UNION_FIRST_SEASON - 1, -2))
+
+        teams_by_season = self._load_union_cache(user_id)
+        missing = [sid for sid in season_ids if sid not in teams_by_season]
+        metrics.registry.inc("cache_requests_total", len(season_ids) - len(missing), cache="union_team", result="hit")
+        metrics.registry.inc("cache_requests_total", len(missing), cache="union_team", result="miss")
+        if missing:
+            fetched = await asyncio.gather(*(self.fetch_union_teams(user_id, sid) for sid in missing))
+            new = {sid: teams for sid, teams in zip(missing, fetched) if teams is not None}
+            self._save_union_cache(user_id, new)
+            teams_by_season.update(new)
+
         result: List[Dict] = []
-        sid = CURRENT_SEASON_NUM
-        while sid >= 29:
+        for sid in season_ids:
             games = [g for g in union_games if g.get("seasonId") == sid]
-            teams = await self.fetch_union_teams(user_id, sid)
+            teams = teams_by_season.get(sid)
             if games or teams:
                 result.append({
                     "seasonID":  sid,
@@ -183,7 +227,6 @@ class UnionTeamCog(commands.Cog):
                     "_games":    games,
                     "_teams":    teams or [],
                 })
-            sid -= 2
         return result
 
     # ---- 임베드 빌더 ----
@@ -235,12 +278,14 @@ class UnionTeamCog(commands.Cog):
     # ---- 커맨드 ----
 
     @commands.command(name="유니온", aliases=["ㅇㄴㅇ"])
+    @dedup.coalesce()
     async def union_team_info(self, ctx: commands.Context, *, nickname: str = None):
         """유니온 팀 정보 + 대전 기록 조회"""
         author_id = str(ctx.author.id)
+        stored_id = None
 
         if not nickname:
-            nickname = self.get_active_nickname(author_id)
+            nickname, stored_id = self.get_active_nickname(author_id)
             if not nickname:
                 return await ctx.reply(embed=discord.Embed(
                     title="❌ 오류",
@@ -251,12 +296,11 @@ class UnionTeamCog(commands.Cog):
         loading = await ctx.reply(f"🔍 **{nickname}** 님의 유니온 정보를 불러오는 중...")
 
         try:
-            user_id = await self.fetch_user_id(nickname)
+            user_id = stored_id or await self.fetch_user_id(nickname)
             if not user_id:
                 return await loading.edit(content=f"❌ **{nickname}** 닉네임을 찾을 수 없습니다.")
 
-            all_games   = await self.fetch_user_games(user_id)
-            union_games = [g for g in all_games if g.get("matchingMode") == UNION_MATCHING_MODE]
+            union_games = await self.fetch_union_games(user_id)
 
             if not union_games:
                 return await loading.edit(content=f"❌ **{nickname}** 님의 유니온 대전 기록이 없습니다.")
@@ -271,6 +315,7 @@ class UnionTeamCog(commands.Cog):
             await loading.delete()
             msg = await ctx.reply(embed=embed, view=view)
             view.message = msg
+            dedup.mark_result(ctx, msg)
 
         except Exception as e:
             import traceback; traceback.print_exc()
@@ -1,17 +1,19 @@
 # cogs/profile.py
 import asyncio
+import time
 import discord
 from discord.ext import commands
-import aiohttp
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime, timezone
 
-from config import ER_KEY
-from db import SessionLocal
-from models import User
-from data import Character_Names, CURRENT_SEASON_NUM
+import accounts
+import history
+import dedup
+import swr
+from er_api import client
+from data import Character_Names
 
-ER_BASE = "https://open-api.bser.io/v1"
+USER_GAMES_TTL = 60   # 최근 게임 캐시 (초), 나머지는 공용 클라이언트의 엔드포인트별 정책
 
 RANK_MEDAL = {1: "🥇", 2: "🥈", 3: "🥉"}
 
@@ -19,38 +21,18 @@ RANK_MEDAL = {1: "🥇", 2: "🥈", 3: "🥉"}
 class ProfileCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.api_key = ER_KEY
 
     # ── DB ──────────────────────────────────────────────────────────
 
-    def get_active_nickname(self, user_id: str) -> Optional[str]:
-        session = SessionLocal()
-        try:
-            user = session.get(User, user_id)
-            return user.active_er_nickname if user and hasattr(user, "active_er_nickname") else None
-        finally:
-            session.close()
-
-    # ── API 공통 ─────────────────────────────────────────────────────
-
-    @property
-    def _headers(self) -> dict:
-        return {"x-api-key": self.api_key}
+    def get_active_nickname(self, user_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """활성 닉네임 + 등록 때 저장한 ER userId"""
+        return accounts.active_account(user_id)
 
-    async def _get(self, url: str, **params) -> Optional[dict]:
-        async with aiohttp.ClientSession() as s:
-            async with s.get(
-                url,
-                headers=self._headers,
-                params=params if params else None,
-            ) as r:
-                return await r.json() if r.status == 200 else None
-
-    # ── API 개별 ─────────────────────────────────────────────────────
+    # ── API 개별 (공용 클라이언트, 신선한 응답은 캐시에서) ──────────
 
     async def fetch_user_info(self, nickname: str) -> Optional[dict]:
-        """닉네임으로 userId + 기본 정보 반환"""
-        data = await self._get(f"{ER_BASE}/user/nickname", query=nickname)
+        """닉네임으로 userId + 기본 정보 반환 (없는 닉네임이면 None, ER API가 응답하지 않으면 UpstreamUnavailable)"""
+        data = await client.get("/user/nickname", degrade=False, query=nickname)
         return data.get("user") if data and data.get("user") else None
 
     async def fetch_user_stats(self, user_id: str, season_id: int = 0) -> List[dict]:
@@ -58,12 +40,12 @@ class ProfileCog(commands.Cog):
         시즌 별 캐릭터 스탯 (season_id=0 → 전 시즌 합산)
         반환: userStats 리스트
         """
-        data = await self._get(f"{ER_BASE}/user/stats/{user_id}/{season_id}")
+        data = await client.get(f"/user/stats/{user_id}/{season_id}")
         return (data.get("userStats") or []) if data else []
 
     async def fetch_user_games(self, user_id: str) -> List[dict]:
         """최근 게임 목록 (최신순)"""
-        data = await self._get(f"{ER_BASE}/user/games/uid/{user_id}")
+        data = await client.get(f"/user/games/uid/{user_id}", ttl=USER_GAMES_TTL)
         return (data.get("userGames") or []) if data else []
 
     # ── 유틸 ─────────────────────────────────────────────────────────
@@ -90,6 +72,19 @@ class ProfileCog(commands.Cog):
         except Exception:
             return None
 
+    @staticmethod
+    def sum_character_stats(stats_list: List[dict]) -> Tuple[int, Dict[int, int]]:
+        """characterStats 합산 → (totalSecondsPlayed 합계, {characterCode: totalGames 합계})"""
+        total_seconds = 0
+        char_totals: Dict[int, int] = {}
+        for stat_entry in stats_list:
+            for cs in (stat_entry.get("characterStats") or []):
+                total_seconds += cs.get("totalSecondsPlayed", 0) or 0
+                code = cs.get("characterCode", 0)
+                if code:
+                    char_totals[code] = char_totals.get(code, 0) + (cs.get("totalGames", 0) or 0)
+        return total_seconds, char_totals
+
     # ── 임베드 빌더 ──────────────────────────────────────────────────
 
     def build_embed(
@@ -118,11 +113,8 @@ class ProfileCog(commands.Cog):
                 inline=True,
             )
 
-        # ── 플레이타임: stats season 0 totalSecondsPlayed 합산 ──
-        total_seconds = 0
-        for stat_entry in stats_list:
-            for cs in (stat_entry.get("characterStats") or []):
-                total_seconds += cs.get("totalSecondsPlayed", 0) or 0
+        # ── 플레이타임 / 캐릭터별 판수: characterStats 한 번만 순회 ──
+        total_seconds, char_totals = self.sum_character_stats(stats_list)
 
         embed.add_field(
             name="플레이타임",
@@ -142,16 +134,11 @@ class ProfileCog(commands.Cog):
                     inline=True,
                 )
 
-        # ── 모스트 캐릭터 (전 시즌 totalGames 합산) ──
-        char_totals: Dict[int, int] = {}
-        for stat_entry in stats_list:
-            for cs in (stat_entry.get("characterStats") or []):
-                code = cs.get("characterCode", 0)
-                if not code:
-                    continue
-                char_totals[code] = char_totals.get(code, 0) + (cs.get("totalGames", 0) or 0)
+        # stats에 없으면 로컬 저장소의 캐릭터별 판수로 대체
+        if not char_totals and user_info.get("userId") is not None:
+            char_totals = dict(history.character_counts(str(user_info["userId"])))
 
-        # stats에 없으면 games characterNum 카운트로 대체
+        # 로컬 기록도 없으면 games characterNum 카운트로 대체
         if not char_totals and games:
             for g in games:
                 code = g.get("characterNum", 0)
@@ -178,15 +165,63 @@ class ProfileCog(commands.Cog):
         embed.set_footer(text="이리와 봇 · 플레이어 프로필")
         return embed
 
+    # ── stale-while-revalidate ──────────────────────────────────────
+
+    @staticmethod
+    def profile_paths(nickname: str, user_id: str) -> List[Tuple[str, dict]]:
+        """프로필 한 번에 필요한 세 요청 (경로, 쿼리)"""
+        return [
+            ("/user/nickname", {"query": nickname}),
+            (f"/user/stats/{user_id}/0", {}),
+            (f"/user/games/uid/{user_id}", {}),
+        ]
+
+    async def cached_profile(self, nickname: str, user_id: str = None) -> Optional[Tuple[str, float, List[dict]]]:
+        """
+        세 응답이 모두 SWR_MAX_AGE 안에 캐시돼 있고 닉네임 응답이 같은 userId 를 가리키면
+        (유저 ID, 나이(초), 응답 본문 목록)
+        """
+        user_id = user_id or history.cached_user_id(nickname)
+        if not user_id:
+            return None
+        entries = await asyncio.gather(
+            *(client.peek(path, **params) for path, params in self.profile_paths(nickname, user_id))
+        )
+        if any(e is None for e in entries):
+            return None
+        age = time.time() - min(e.stored_at for e in entries)
+        user = entries[0].body.get("user")
+        if age >= swr.SWR_MAX_AGE or not user or str(user.get("userId")) != user_id:
+            return None
+        return user_id, age, [e.body for e in entries]
+
+    def embed_from_bodies(self, nickname: str, bodies: List[dict]) -> discord.Embed:
+        info, stats, games = bodies
+        return self.build_embed(
+            nickname, info["user"], stats.get("userStats") or [], games.get("userGames") or []
+        )
+
+    async def revalidate_profile(self, msg: discord.Message, nickname: str, user_id: str, shown: List[dict]):
+        """세 응답을 다시 받아 바뀐 게 있으면 보낸 메시지를 고친다"""
+        bodies = await asyncio.gather(
+            *(client.refresh(path, **params) for path, params in self.profile_paths(nickname, user_id))
+        )
+        if any(b is None for b in bodies) or not bodies[0].get("user") or list(bodies) == shown:
+            return
+        history.ingest_games(user_id, bodies[2].get("userGames") or [])
+        await msg.edit(embed=self.embed_from_bodies(nickname, bodies))
+
     # ── 커맨드 ───────────────────────────────────────────────────────
 
     @commands.command(name="프로필", aliases=["ㅍㄹㅍ"])
+    @dedup.coalesce()
     async def profile(self, ctx: commands.Context, *, nickname: str = None):
         """플레이어 프로필 조회"""
         author_id = str(ctx.author.id)
+        stored_id = None
 
         if not nickname:
-            nickname = self.get_active_nickname(author_id)
+            nickname, stored_id = self.get_active_nickname(author_id)
             if not nickname:
                 return await ctx.reply(
                     embed=discord.Embed(
@@ -199,10 +234,29 @@ class ProfileCog(commands.Cog):
                     )
                 )
 
+        # 최근에 받아 둔 응답이 있으면 바로 답하고 백그라운드에서 갱신
+        cached = await self.cached_profile(nickname, stored_id)
+        if cached:
+            user_id, age, bodies = cached
+            msg = await ctx.reply(embed=swr.mark_age(self.embed_from_bodies(nickname, bodies), age))
+            if age >= swr.SWR_FRESH_AGE:
+                swr.spawn(self.revalidate_profile(msg, nickname, user_id, bodies), name=f"프로필:{nickname}")
+            return
+
         loading = await ctx.reply(f"🔍 **{nickname}** 님의 프로필을 불러오는 중...")
 
         try:
-            user_info = await self.fetch_user_info(nickname)
+            # 등록 계정 / 최근 확인한 닉네임 대응으로 userId를 알고 있으면 세 요청을 동시에 보낸다
+            cached_id = stored_id or history.cached_user_id(nickname)
+            if cached_id:
+                user_info, stats_list, games = await asyncio.gather(
+                    self.fetch_user_info(nickname),
+                    self.fetch_user_stats(cached_id, 0),  # 0 = 전 시즌
+                    self.fetch_user_games(cached_id),
+                )
+            else:
+                user_info = await self.fetch_user_info(nickname)
+
             if not user_info:
                 return await loading.edit(
                     content=f"❌ **{nickname}** 닉네임을 찾을 수 없습니다."
@@ -210,11 +264,14 @@ class ProfileCog(commands.Cog):
 
             user_id = str(user_info["userId"])
 
-            # 1 RPS 제한 — 순차 요청
-            await asyncio.sleep(1)
-            stats_list = await self.fetch_user_stats(user_id, 0)  # 0 = 전 시즌
-            await asyncio.sleep(1)
-            games = await self.fetch_user_games(user_id)
+            if user_id != cached_id:
+                # 호출 간격은 공용 클라이언트의 호출 한도가 조절
+                stats_list, games = await asyncio.gather(
+                    self.fetch_user_stats(user_id, 0),  # 0 = 전 시즌
+                    self.fetch_user_games(user_id),
+                )
+            history.remember_nickname(user_id, nickname)  # 방금 확인한 대응 (NICKNAME_TTL 동안 재사용)
+            history.ingest_games(user_id, games)  # 로컬 저장소에 누적
 
             embed = self.build_embed(nickname, user_info, stats_list, games)
             await loading.edit(content=None, embed=embed)
@@ -1,15 +1,16 @@
 # cogs/user_rank.py
 import discord
 from discord.ext import commands
-from config import ER_KEY
-import aiohttp
-from typing import Optional, Dict, List
+from er_api import client, ER_BASE_V2, PRIORITY_COMMAND, PRIORITY_BACKGROUND
+import accounts
+import metrics
+import dedup
+import swr
+from task_scope import TaskScope
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime
-import asyncio
-import os, re
+import os, re, time
 
-from db import SessionLocal
-from models import User
 
 # 시즌 ID -> 한글 이름 매핑
 SEASON_NAMES = {
@@ -83,9 +84,21 @@ class SeasonSelectView(discord.ui.View):
         self.selected_season = available_seasons[0] if available_seasons else None
         self.message = None  # ✅ 메시지 참조 저장
         self.is_loading = False  # ✅ 로딩 상태
+        self.tasks = TaskScope(f"랭크:{nickname}")  # 이 View가 살아 있는 동안만 도는 백그라운드 조회
 
         # 드롭다운 생성
         self.create_select_menu()
+
+    async def on_timeout(self):
+        # 더 이상 고를 수 없으니 남은 시즌 조회도 멈춘다 (호출 한도 반환)
+        self.cog.release_view(self, reason="timeout")
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
     
     def create_select_menu(self):
         """사용 가능한 시즌으로 드롭다운 생성"""
@@ -192,10 +205,9 @@ class SeasonSelectView(discord.ui.View):
 class UserRankCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.api_key = ER_KEY 
-        self.base_url = "https://open-api.bser.io/v1"
-        self.base_url_v2 = "https://open-api.bser.io/v2"
         self.seasons_cache = None  # 시즌 정보 캐시
+        self.recent_results: Dict[str, Dict] = {}  # 닉네임 → 최근 조회 결과 (바로 답하기용)
+        self.active_views: Dict[str, SeasonSelectView] = {}  # 닉네임 → 백그라운드 조회를 맡은 View
 
         #티어 이미지 폴더
         self.tier_image_folder = "images/tier"
@@ -216,16 +228,9 @@ class UserRankCog(commands.Cog):
         return None
 
 
-    def get_active_nickname(self, user_id: str) -> Optional[str]:
-        """DB에서 활성화된 닉네임 가져오기"""
-        session = SessionLocal()
-        try:
-            user = session.get(User, user_id)
-            if user and hasattr(user, 'active_er_nickname'):
-                return user.active_er_nickname
-            return None
-        finally:
-            session.close()
+    def get_active_nickname(self, user_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """DB에서 활성화된 닉네임과 등록 때 저장한 ER userId 가져오기"""
+        return accounts.active_account(user_id)
     def season_1to3_tier(self, mmr: int, rank: int) -> str:
         if mmr >= 6200:
             if rank and rank <= 200:
@@ -483,81 +488,25 @@ class UserRankCog(commands.Cog):
         """시즌 정보 조회 (캐싱)"""
         if self.seasons_cache:
             return self.seasons_cache
-        
-        headers = {"x-api-key": self.api_key}
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{self.base_url_v2}/data/Season",
-                headers=headers
-            ) as resp:
-                if resp.status != 200:
-                    return None
-                data = await resp.json()
-                
-                if data.get("code") == 200 and data.get("data"):
-                    self.seasons_cache = data["data"]
-                    return self.seasons_cache
-                return None
+
+        data = await client.get("/data/Season", base=ER_BASE_V2)
+        if data and data.get("code") == 200 and data.get("data"):
+            self.seasons_cache = data["data"]
+            return self.seasons_cache
+        return None
     
     async def fetch_user_id(self, nickname: str) -> Optional[str]:
         """닉네임으로 유저 ID 조회"""
-        headers = {"x-api-key": self.api_key}
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{self.base_url}/user/nickname",
-                params={"query": nickname},
-                headers=headers
-            ) as resp:
-                if resp.status != 200:
-                    return None
-                data = await resp.json()
-                
-                if not data.get("user"):
-                    return None
-                    
-                return data["user"]["userId"]
+        return await client.fetch_user_id(nickname)
     
-    async def fetch_user_rank(self, user_id: str, season_id: int, team_mode: int = 3, retry: int = 1) -> Optional[Dict]:
-        """유저 랭크 정보 조회 (Rate limit 재시도)"""
-        headers = {"x-api-key": self.api_key}
-        url = f"{self.base_url}/rank/uid/{user_id}/{season_id}/{team_mode}"
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as resp:
-                    status = resp.status
-                    
-                    if status == 429:  # Rate limit
-                        # print(f"⚠️ Rate limit! 시즌 {season_id}")
-                        
-                        # ✅ 재시도 (최대 1회)
-                        if retry > 0:
-                            # print(f"   → 2초 후 재시도...")
-                            await asyncio.sleep(2.0)
-                            return await self.fetch_user_rank(user_id, season_id, team_mode, retry - 1)
-                        return None
-                    
-                    if status != 200:
-                        text = await resp.text()
-                        # print(f"⚠️ 시즌 {season_id} HTTP {status}: {text[:100]}")
-                        return None
-                    
-                    data = await resp.json()
-                    
-                    if data.get("code") != 200:
-                        # print(f"⚠️ 시즌 {season_id} API code={data.get('code')}")
-                        return None
-                    
-                    if data.get("userRank"):
-                        return data["userRank"]
-                    
-                    return None
-                
-        except Exception as e:
-            # print(f"❌ 시즌 {season_id} 예외: {e}")
+    async def fetch_user_rank(
+        self, user_id: str, season_id: int, team_mode: int = 3, priority: int = PRIORITY_COMMAND,
+    ) -> Optional[Dict]:
+        """유저 랭크 정보 조회 (429 / 장애 대응은 공용 클라이언트가 처리)"""
+        data = await client.get(f"/rank/uid/{user_id}/{season_id}/{team_mode}", priority=priority)
+        if not data or data.get("code") != 200:
             return None
+        return data.get("userRank") or None
     
     async def get_available_seasons(self, user_id: str, max_seasons: int = None) -> List[Dict]:
         """유저가 플레이한 시즌 목록 조회 (전체 조회)"""
@@ -581,9 +530,6 @@ class UserRankCog(commands.Cog):
             if( season_id <= 17 or season['seasonName'].startswith('Pre')):
                 continue
             
-            if i > 0:
-                await asyncio.sleep(1.2)
-            
             try:
                 rank_data = await self.fetch_user_rank(user_id, season_id)
                 
@@ -636,10 +582,8 @@ class UserRankCog(commands.Cog):
             
             season_name = get_season_korean_name(season_id)
             
-            await asyncio.sleep(1.2)
-            
             try:
-                rank_data = await self.fetch_user_rank(user_id, season_id)
+                rank_data = await self.fetch_user_rank(user_id, season_id, priority=PRIORITY_BACKGROUND)
                 
                 if rank_data:
                     mmr = rank_data.get('mmr', 0)
@@ -673,6 +617,11 @@ class UserRankCog(commands.Cog):
                 # print(f"⚠️ [백그라운드] {season_name} (ID:{season_id}): 예외 - {e}")
         # print(f"=== 백그라운드 조회 완료: 총 {len(view.available_seasons)}개 시즌 ===")
 
+        # 전 시즌 조회가 끝난 결과는 다음 조회 때 다시 훑지 않는다
+        entry = self.recent_results.get(view.nickname)
+        if entry and entry["seasons"] is view.available_seasons:
+            entry["complete"] = True
+
     
     async def create_rank_embed(self, user_id: str, nickname: str, season_info: Dict) -> tuple[Optional[discord.Embed], Optional[str]]:
         season_id = season_info["seasonID"]
@@ -724,13 +673,98 @@ class UserRankCog(commands.Cog):
         return embed, img_path  # ✅ 이미지 경로도 함께 반환
 
     
+    # ── stale-while-revalidate ──────────────────
+
+    def remember_result(self, nickname: str, user_api_id: str, seasons: List[Dict], complete: bool = False):
+        """조회 결과 저장. seasons는 View가 쓰는 리스트 그대로 (백그라운드 조회로 늘어나면 같이 반영)"""
+        now = time.time()
+        self.recent_results = {
+            k: v for k, v in self.recent_results.items() if now - v["stored_at"] < swr.SWR_MAX_AGE
+        }
+        self.recent_results[nickname] = {
+            "user_api_id": user_api_id, "seasons": seasons, "stored_at": now, "complete": complete,
+        }
+
+    def cached_result(self, nickname: str) -> Optional[Tuple[str, float, List[Dict], bool]]:
+        entry = self.recent_results.get(nickname)
+        if not entry or not entry["seasons"]:
+            return None
+        age = time.time() - entry["stored_at"]
+        if age >= swr.SWR_MAX_AGE:
+            return None
+        return entry["user_api_id"], age, list(entry["seasons"]), entry["complete"]
+
+    async def revalidate_rank(self, view: 'SeasonSelectView', complete: bool):
+        """최근 시즌을 다시 조회해서 바뀐 게 있으면 보낸 메시지를 고친다"""
+        fresh = await self.get_available_seasons(view.user_api_id, max_seasons=5)
+        if fresh:
+            merged = {s["seasonID"]: s for s in view.available_seasons}
+            changed = False
+            for season in fresh:
+                old = merged.get(season["seasonID"])
+                if old is None or old.get("_rankData") != season["_rankData"]:
+                    changed = True
+                merged[season["seasonID"]] = season
+            view.available_seasons[:] = sorted(merged.values(), key=lambda x: x["seasonID"], reverse=True)
+            self.remember_result(view.nickname, view.user_api_id, view.available_seasons, complete)
+
+            if changed and view.message:
+                selected_id = view.selected_season["seasonID"] if view.selected_season else None
+                view.selected_season = merged.get(selected_id, view.available_seasons[0])
+                embed, img_path = await self.create_rank_embed(view.user_api_id, view.nickname, view.selected_season)
+                if embed:
+                    view.create_select_menu()
+                    attachments = []
+                    if img_path and os.path.exists(img_path):
+                        attachments = [discord.File(img_path, filename=os.path.basename(img_path))]
+                    await view.message.edit(embed=embed, view=view, attachments=attachments)
+
+        if not complete:
+            await self.get_available_seasons_progressive(view.user_api_id, view, initial_count=4)
+
+    # ── 백그라운드 조회 관리 ───────────────────
+
+    def supervise_view(self, view: 'SeasonSelectView'):
+        """
+        닉네임당 백그라운드 시즌 조회는 가장 최근 View 하나만 돌린다.
+        이전 View의 조회는 멈추고, 그때까지 찾은 시즌은 새 View가 이어받는다
+        (이어서 도는 조회는 이미 있는 시즌을 건너뛴다).
+        """
+        old = self.active_views.get(view.nickname)
+        if old is not None and old is not view:
+            if old.tasks.active and not old.tasks.closed:
+                metrics.registry.inc("rank_crawls_cancelled_total", reason="superseded")
+            old.tasks.cancel()
+            known = {s["seasonID"] for s in view.available_seasons}
+            view.available_seasons.extend(s for s in old.available_seasons if s["seasonID"] not in known)
+            view.available_seasons.sort(key=lambda x: x["seasonID"], reverse=True)
+            view.create_select_menu()
+        self.active_views[view.nickname] = view
+
+        entry = self.recent_results.get(view.nickname)
+        if entry:
+            entry["seasons"] = view.available_seasons
+
+    def release_view(self, view: 'SeasonSelectView', reason: str):
+        if view.tasks.active and not view.tasks.closed:
+            metrics.registry.inc("rank_crawls_cancelled_total", reason=reason)
+        view.tasks.cancel()
+        if self.active_views.get(view.nickname) is view:
+            del self.active_views[view.nickname]
+
+    def cog_unload(self):
+        for view in list(self.active_views.values()):
+            self.release_view(view, reason="unload")
+
     @commands.command(name="랭크", aliases=["ㄹㅋ"])
+    @dedup.coalesce()
     async def show_rank(self, ctx: commands.Context, *, nickname: str = None):
         """이터널 리턴 랭킹 조회"""
         user_id = str(ctx.author.id)
+        stored_id = None
         
         if not nickname:
-            nickname = self.get_active_nickname(user_id)
+            nickname, stored_id = self.get_active_nickname(user_id)
             if not nickname:
                 return await ctx.reply(embed=discord.Embed(
                     title="❌ 오류",
@@ -738,10 +772,28 @@ class UserRankCog(commands.Cog):
                     color=0xFF6B6B,
                 ))
         
+        # 최근에 조회한 결과가 있으면 바로 답하고 백그라운드에서 갱신
+        cached = self.cached_result(nickname)
+        if cached:
+            user_api_id, age, seasons, complete = cached
+            embed, img_path = await self.create_rank_embed(user_api_id, nickname, seasons[0])
+            if embed:
+                view = SeasonSelectView(self, ctx, user_id, nickname, user_api_id, seasons)
+                swr.mark_age(embed, age)
+                if img_path and os.path.exists(img_path):
+                    file_obj = discord.File(img_path, filename=os.path.basename(img_path))
+                    view.message = await ctx.send(file=file_obj, embed=embed, view=view)
+                else:
+                    view.message = await ctx.send(embed=embed, view=view)
+                self.supervise_view(view)
+                if age >= swr.SWR_FRESH_AGE or not complete:
+                    view.tasks.spawn(self.revalidate_rank(view, complete))
+                return
+
         loading_msg = await ctx.send(f"🔍 **{nickname}** 님의 랭킹을 조회 중...")
         
         try:
-            user_api_id = await self.fetch_user_id(nickname)
+            user_api_id = stored_id or await self.fetch_user_id(nickname)
             
             if not user_api_id:
                 embed = discord.Embed(
@@ -790,8 +842,11 @@ class UserRankCog(commands.Cog):
                 msg = loading_msg
             
             view.message = msg
+            dedup.mark_result(ctx, msg)
+            self.remember_result(nickname, user_api_id, view.available_seasons)
+            self.supervise_view(view)
             
-            asyncio.create_task(self.get_available_seasons_progressive(user_api_id, view, initial_count=4))
+            view.tasks.spawn(self.get_available_seasons_progressive(user_api_id, view, initial_count=4))
             
         except Exception as e:
             error_embed = discord.Embed(
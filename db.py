@@ -1,16 +1,42 @@
 # db.py
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, String, Table, create_engine, inspect, select, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# SQLite 데이터베이스 파일 경로
-DATABASE_URL = "sqlite:///./bot_database.db"
+from config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE,
+)
+
+SCHEMA_LOCK_ID = 7240519  # Postgres 스키마 갱신용 advisory lock 번호 (봇 프로세스끼리 공유)
+
+
+def _create_engine(url: str) -> Engine:
+    """DATABASE_URL 에 맞는 엔진 (SQLite: 파일 하나, 그 외: 커넥션 풀)"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False},  # SQLite용 설정
+            query_cache_size=DB_STATEMENT_CACHE_SIZE,
+        )
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        query_cache_size=DB_STATEMENT_CACHE_SIZE,
+    )
+
 
 # SQLAlchemy 엔진 생성
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # SQLite용 설정
-)
+engine = _create_engine(DATABASE_URL)
 
 # 세션 팩토리
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,10 +44,121 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base 클래스 (모든 모델이 상속받을 기본 클래스)
 Base = declarative_base()
 
+# 적용한 마이그레이션 기록 (migrations.MIGRATIONS 의 버전)
+schema_migrations = Table(
+    "schema_migrations", Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.now),
+)
+
+UPSERT_MAX_PARAMS = 900  # 한 INSERT 문에 넣을 최대 바인드 변수 수 (구버전 SQLite 한도 999)
+
+
+def _sync_columns():
+    """기존 테이블에 모델에 새로 추가된 컬럼(nullable)을 반영"""
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing or not col.nullable:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}'))
+
+
+def _sync_indexes():
+    """모델에 선언된 인덱스 중 없는 것을 만든다"""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+@contextmanager
+def _schema_lock():
+    """
+    스키마 갱신 구간을 봇 프로세스끼리 한 번에 하나만 실행 (Postgres advisory lock).
+    SQLite 는 한 파일을 한 프로세스가 쓰는 구성이라 잠그지 않는다.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEMA_LOCK_ID})
+
+
+def _run_migrations():
+    """아직 적용하지 않은 마이그레이션을 버전 순서대로 하나씩 (각각 한 트랜잭션으로) 적용"""
+    from migrations import MIGRATIONS
+
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    for version, name, migrate in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.now()))
+        print(f"- 마이그레이션 {version} 적용: {name}")
+
+
 # 데이터베이스 초기화 함수
 def init_db():
-    """데이터베이스 테이블 생성"""
+    """
+    데이터베이스 테이블 생성 + 스키마 갱신
+    1) 없는 테이블 생성  2) 새 컬럼 추가  3) 데이터 마이그레이션  4) 인덱스/제약 생성
+    (유니크 인덱스가 기존 중복 데이터에 막히지 않도록 마이그레이션이 먼저 정리한다)
+    """
     # models를 임포트해야 Base.metadata가 테이블 정보를 알 수 있음
     import models
-    Base.metadata.create_all(bind=engine)
-    print("- 데이터베이스 테이블 생성 완료 (users, er_accounts)")
\ No newline at end of file
+    with _schema_lock():
+        Base.metadata.create_all(bind=engine)
+        _sync_columns()
+        _run_migrations()
+        _sync_indexes()
+    print(f"- 데이터베이스 연결: {engine.url.render_as_string(hide_password=True)}")
+    print("- 데이터베이스 테이블 생성 완료 (users, er_accounts)")
+
+
+def bulk_upsert(session, model, rows: List[Dict], update: Optional[List[str]] = None):
+    """
+    rows 를 기본키 기준으로 한 번에 넣거나 덮어쓴다 (INSERT ... ON CONFLICT DO UPDATE).
+    update: 충돌 시 덮어쓸 컬럼 (기본: 기본키를 뺀 rows 의 모든 컬럼, 빈 목록이면 기존 행 유지)
+    행마다 SELECT 후 INSERT/UPDATE 하는 session.merge 대신 쓴다. 커밋은 호출한 쪽에서.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    keys = [c.name for c in table.primary_key.columns]
+    if update is None:
+        update = [c for c in rows[0] if c not in keys]
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        for row in rows:
+            session.merge(model(**row))
+        return
+
+    chunk = max(1, UPSERT_MAX_PARAMS // len(rows[0]))
+    for i in range(0, len(rows), chunk):
+        stmt = insert(table).values(rows[i:i + chunk])
+        if update:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=keys, set_={c: stmt.excluded[c] for c in update}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+        session.execute(stmt)
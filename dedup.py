@@ -0,0 +1,141 @@
+# dedup.py
+"""
+같은 명령어 연타 묶기.
+
+로딩 메시지가 떠 있는 동안 같은 사람이 같은 명령어를 같은 인자로 다시 보내면
+새로 조회하지 않고, 먼저 실행 중인(또는 DEDUP_WINDOW 안에 끝난) 명령어의 답장 메시지로 안내만 한다.
+
+    @commands.command(name="전적")
+    @dedup.coalesce()
+    async def check_record(self, ctx, *, nickname: str = None): ...
+
+main.py 의 before_invoke / after_invoke 에서 command_started / command_finished 를 불러 줘야 한다.
+로딩 메시지를 지우고 결과를 새 메시지로 보내는 명령어는 mark_result(ctx, 결과 메시지) 로 결과를 알려 준다
+(안 알려 주면 마지막으로 보낸 답장, 그것도 지워졌으면 원래 명령어 메시지로 안내).
+"""
+import asyncio
+import time
+from typing import Dict, Optional, Set, Tuple
+
+import discord
+from discord.ext import commands
+
+import metrics
+
+DEDUP_WINDOW = 10  # 끝난 명령어에도 이 시간(초) 안에 온 같은 요청은 묶는다
+
+Key = Tuple[int, str, str]
+
+_tasks: Set[asyncio.Task] = set()
+
+
+class DuplicateCommand(commands.CheckFailure):
+    """같은 요청이 이미 처리 중 (앞선 결과로 안내하므로 따로 에러 응답하지 않음)"""
+
+
+class _Invocation:
+    def __init__(self, message: discord.Message):
+        self.message = message                         # 원래 명령어 메시지
+        self.response: Optional[discord.Message] = None  # 봇이 마지막으로 보낸 답장
+        self.result: Optional[discord.Message] = None    # 명령어가 mark_result 로 알려 준 결과 메시지
+        self.done = asyncio.Event()
+        self.finished_at: Optional[float] = None
+
+
+_registry: Dict[Key, _Invocation] = {}
+
+
+def _key(ctx: commands.Context) -> Key:
+    args = ctx.message.content[len(ctx.prefix or "") + len(ctx.invoked_with or ""):]
+    return ctx.author.id, ctx.command.qualified_name, " ".join(args.split())
+
+
+def _expire():
+    now = time.monotonic()
+    for key, inv in list(_registry.items()):
+        if inv.finished_at is not None and now - inv.finished_at > DEDUP_WINDOW:
+            del _registry[key]
+
+
+def coalesce():
+    """중복 요청이면 DuplicateCommand 를 내고 앞선 실행 결과로 안내하는 명령어 체크"""
+    async def predicate(ctx: commands.Context) -> bool:
+        _expire()
+        key = _key(ctx)
+        inv = _registry.get(key)
+        if inv is None:
+            ctx._dedup_key = key
+            return True
+
+        metrics.registry.inc("commands_deduplicated_total", command=key[1])
+        task = asyncio.create_task(_attach(ctx, inv), name=f"dedup:{key[1]}")
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+        raise DuplicateCommand(f"같은 요청 처리 중: {key[1]} {key[2]}")
+
+    return commands.check(predicate)
+
+
+async def _attach(ctx: commands.Context, inv: _Invocation):
+    """중복 메시지에 ⏳ 를 달아 두었다가, 앞선 실행이 끝나면 그 답장으로 안내"""
+    try:
+        if not inv.done.is_set():
+            await ctx.message.add_reaction("⏳")
+            await inv.done.wait()
+            await ctx.message.remove_reaction("⏳", ctx.me)
+        target = await _surviving_reply(inv) or inv.message
+        await ctx.reply(f"↪️ 같은 요청의 결과: {target.jump_url}", mention_author=False)
+    except discord.HTTPException as e:
+        print(f"[DEDUP] 안내 실패: {e}")
+
+
+async def _surviving_reply(inv: _Invocation) -> Optional[discord.Message]:
+    """결과 메시지(없으면 마지막 답장) 중 아직 지워지지 않은 것"""
+    for msg in dict.fromkeys(m for m in (inv.result, inv.response) if m is not None):
+        try:
+            return await msg.channel.fetch_message(msg.id)
+        except discord.NotFound:
+            continue
+    return None
+
+
+# ── 명령어 훅 ─────────────────────────────────
+
+def command_started(ctx: commands.Context):
+    """bot.before_invoke 에서 호출. coalesce 체크를 통과한 명령어만 등록한다"""
+    key = getattr(ctx, "_dedup_key", None)
+    if key is None:
+        return
+    inv = _Invocation(ctx.message)
+    _registry[key] = inv
+
+    # 마지막으로 보낸 답장을 기억해 둔다 (ctx.reply 도 ctx.send 를 거친다)
+    send = ctx.send
+
+    async def send_and_remember(*args, **kwargs):
+        msg = await send(*args, **kwargs)
+        inv.response = msg
+        return msg
+
+    ctx.send = send_and_remember
+
+
+def mark_result(ctx: commands.Context, message: discord.Message):
+    """이 실행의 결과 메시지 (중복 요청은 이 메시지로 안내)"""
+    key = getattr(ctx, "_dedup_key", None)
+    inv = _registry.get(key) if key else None
+    if inv is not None and inv.message.id == ctx.message.id:
+        inv.result = message
+
+
+def command_finished(ctx: commands.Context):
+    """bot.after_invoke 에서 호출 (명령어가 실패해도 호출됨)"""
+    key = getattr(ctx, "_dedup_key", None)
+    inv = _registry.get(key) if key else None
+    if inv is None or inv.message.id != ctx.message.id:
+        return
+    inv.finished_at = time.monotonic()
+    inv.done.set()
+    if ctx.command_failed:
+        # 실패한 실행에는 묶지 않는다 (다시 보내면 새로 실행)
+        del _registry[key]
@@ -0,0 +1,627 @@
+# er_api.py
+import asyncio
+import heapq
+import itertools
+import json
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Set, Tuple
+
+import aiohttp
+
+import metrics
+from config import ER_KEY, ER_RPS, ER_API_BASE
+from db import SessionLocal, bulk_upsert
+from models import ApiResponseCache
+
+ER_BASE    = f"{ER_API_BASE}/v1"
+ER_BASE_V2 = f"{ER_API_BASE}/v2"
+
+MAX_RETRY_429 = 3  # 429 최대 재시도 횟수
+
+# 429 대응: Retry-After(없으면 지수 백오프) 동안 호출 한도 전체를 멈추고 간격을 넓혔다가 성공할 때마다 천천히 되돌린다
+BACKOFF_BASE     = 1.0   # Retry-After가 없을 때 첫 대기 (초, 시도마다 2배)
+BACKOFF_MAX      = 30.0  # 한 번에 기다리는 최대 시간 (초)
+SLOWDOWN_FACTOR  = 1.5   # 429 한 번마다 호출 간격 배율
+SLOWDOWN_MAX     = 4.0   # 기본 간격 대비 최대 배율
+RECOVERY_FACTOR  = 0.95  # 성공 한 번마다 호출 간격 배율
+
+# 서킷 브레이커: 연속 실패가 쌓이면 잠시 호출을 끊고 캐시/즉시 실패로 답한다
+BREAKER_THRESHOLD    = 5      # 연속 실패 몇 번에 열지
+BREAKER_COOLDOWN     = 15.0   # 처음 열렸을 때 시험 호출까지 기다리는 시간 (초)
+BREAKER_COOLDOWN_MAX = 300.0  # 시험 호출이 계속 실패할 때 최대 대기 (초, 실패마다 2배)
+
+
+# 호출 우선순위 (낮을수록 먼저 처리)
+PRIORITY_COMMAND    = 0  # 유저가 기다리는 명령어
+PRIORITY_BATCH      = 1  # 유저가 기다리지만 호출을 한꺼번에 많이 보내는 작업 (대기분석 전적 조회) — 다른 명령어 뒤로
+PRIORITY_BACKGROUND = 2  # 백그라운드 동기화/크롤링
+
+# 시간 예산
+# 요청 1회: 연결 / 응답 대기 각각 끊는 시간. 경로 접두사별로 다르게 (목록·기록 페이지가 더 무겁다)
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=3, sock_read=8)
+TIMEOUT_POLICIES: Tuple[Tuple[str, aiohttp.ClientTimeout], ...] = (
+    ("/user/nickname", aiohttp.ClientTimeout(total=5, connect=3, sock_read=4)),
+    ("/rank/uid/",     aiohttp.ClientTimeout(total=5, connect=3, sock_read=4)),
+    ("/user/stats/",   aiohttp.ClientTimeout(total=8, connect=3, sock_read=6)),
+    ("/games/",        aiohttp.ClientTimeout(total=8, connect=3, sock_read=6)),
+    ("/user/games/",   aiohttp.ClientTimeout(total=12, connect=3, sock_read=10)),
+    ("/unionTeam/",    aiohttp.ClientTimeout(total=10, connect=3, sock_read=8)),
+)
+# 호출 1번 전체(첫 요청부터 429 재시도까지, 한도 대기열에서 차례를 기다린 시간은 제외): 넘기면 캐시/None으로 답한다
+CALL_BUDGETS = {
+    PRIORITY_COMMAND:    15.0,  # 유저가 기다리는 명령어
+    PRIORITY_BATCH:      15.0,
+    PRIORITY_BACKGROUND: 60.0,  # 백그라운드는 한도 대기가 길어도 괜찮다
+}
+
+
+# 지금 진행 중인 호출의 시간 예산 (Timeout, 초) — 첫 요청 슬롯을 받을 때 시작
+_budget: ContextVar[Optional[Tuple[asyncio.Timeout, float]]] = ContextVar("er_api_budget", default=None)
+
+
+@asynccontextmanager
+async def call_budget(priority: int):
+    """
+    CALL_BUDGETS 시간 예산 (넘기면 asyncio.TimeoutError).
+    호출 한도 대기열에서 차례를 기다리는 동안은 재지 않고, 첫 요청이 나갈 때부터 잰다.
+    한도가 낮을 때 대기열에 줄 선 호출이 요청 한 번 못 해 보고 시간 초과로 끝나지 않게.
+    """
+    async with asyncio.timeout(None) as timeout:
+        token = _budget.set((timeout, CALL_BUDGETS[priority]))
+        try:
+            yield
+        finally:
+            _budget.reset(token)
+
+
+def _start_budget():
+    current = _budget.get()
+    if current is not None and current[0].when() is None:
+        timeout, seconds = current
+        timeout.reschedule(asyncio.get_running_loop().time() + seconds)
+
+
+# ────────────────────────────────────────────
+# RateLimiter
+# ────────────────────────────────────────────
+class RateLimiter:
+    """
+    초당 rate_per_sec 회 보장 (모든 호출자가 공유).
+    동시에 여러 호출이 대기하면 우선순위 → 도착 순서로 슬롯을 배정한다.
+    """
+    def __init__(self, rate_per_sec: float):
+        self.base_interval = 1.0 / rate_per_sec
+        self.interval = self.base_interval
+        self.next_slot = 0.0
+        self._waiters: list = []            # heap: (priority, seq, future)
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def wait(self, priority: int = PRIORITY_COMMAND):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await fut
+
+    async def _dispatch(self):
+        while self._waiters:
+            delay = self.next_slot - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue  # 자는 동안 backoff()로 다음 슬롯이 밀렸을 수 있다
+            # 대기 중 더 높은 우선순위 호출이 들어왔을 수 있으므로 슬롯이 열린 시점에 고른다
+            while self._waiters:
+                _, _, fut = heapq.heappop(self._waiters)
+                if not fut.done():  # 취소된 호출은 건너뜀
+                    fut.set_result(None)
+                    self.next_slot = time.monotonic() + self.interval
+                    break
+
+    def backoff(self, delay: float):
+        """429: delay 동안 모든 호출을 멈추고 이후 간격을 넓힌다"""
+        self.next_slot = max(self.next_slot, time.monotonic() + delay)
+        self.interval = min(self.base_interval * SLOWDOWN_MAX, self.interval * SLOWDOWN_FACTOR)
+        metrics.registry.set("er_api_interval_seconds", self.interval)
+
+    def recover(self):
+        """성공 응답마다 넓혀 둔 간격을 기본값 쪽으로 되돌린다"""
+        if self.interval > self.base_interval:
+            self.interval = max(self.base_interval, self.interval * RECOVERY_FACTOR)
+            metrics.registry.set("er_api_interval_seconds", self.interval)
+
+
+# ────────────────────────────────────────────
+# CircuitBreaker
+# ────────────────────────────────────────────
+class UpstreamUnavailable(Exception):
+    """ER API가 응답하지 않음 (네트워크 오류 / 5xx / 429 재시도 소진 / 서킷 열림)"""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """서킷이 열려 있어 호출하지 않고 바로 실패"""
+
+
+class CircuitBreaker:
+    """
+    closed   : 정상. 연속 실패가 threshold 에 닿으면 open
+    open     : cooldown 동안 호출 없이 즉시 실패
+    half_open: cooldown 이 지나면 시험 호출 하나만 보내고, 성공하면 closed / 실패하면 다시 open (cooldown 2배)
+    """
+    STATES = ("closed", "open", "half_open")
+
+    def __init__(self, threshold: int, cooldown: float, cooldown_max: float):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown_max = cooldown_max
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False  # half_open 시험 호출이 나가 있는지
+        self._publish()
+
+    def retry_in(self) -> float:
+        """open 상태에서 시험 호출까지 남은 시간 (초)"""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and self.retry_in() <= 0:
+            self._set("half_open")
+        if self.state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        metrics.registry.inc("er_api_circuit_rejected_total")
+        return False
+
+    def success(self):
+        self.failures = 0
+        self._trial = False
+        if self.state != "closed":
+            self.cooldown = self.base_cooldown
+            self._set("closed")
+            print("[API] 서킷 닫힘 — ER API 정상화")
+
+    def abandon(self):
+        """시험 호출이 결과 없이 끝남 (취소 등): 성공/실패로 치지 않고 다음 호출이 시험하도록 자리만 비운다"""
+        self._trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == "half_open":
+            self.cooldown = min(self.cooldown_max, self.cooldown * 2)
+            self._open()
+        elif self.state == "closed" and self.failures >= self.threshold:
+            self._open()
+
+    def _open(self):
+        self._trial = False
+        self.opened_at = time.monotonic()
+        self._set("open")
+        print(f"[API] 서킷 열림 — 연속 실패 {self.failures}회, {self.cooldown:.0f}초 동안 호출 중단")
+
+    def _set(self, state: str):
+        self.state = state
+        self._publish()
+
+    def _publish(self):
+        for s in self.STATES:
+            metrics.registry.set("er_api_circuit_state", 1 if s == self.state else 0, state=s)
+
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Retry-After 헤더 (초 또는 HTTP 날짜) → 기다릴 초"""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# ────────────────────────────────────────────
+# 응답 캐시 정책
+# ────────────────────────────────────────────
+# 경로 접두사 → (신선 TTL, 추가 stale 허용 시간) 초
+#   나이 < TTL          : 캐시 응답 그대로
+#   나이 < TTL + stale  : 캐시 응답을 바로 주고 백그라운드에서 재검증
+#   그 외               : 조건부 요청(If-None-Match / If-Modified-Since)으로 다시 받음
+# 여기 없는 경로(게임 기록 페이지 등)는 호출자가 ttl을 주지 않으면 캐시하지 않는다.
+CACHE_POLICIES: Tuple[Tuple[str, Tuple[float, float]], ...] = (
+    ("/data/Season",  (86400, 7 * 86400)),   # 시즌 목록
+    ("/games/",       (30 * 86400, 0)),      # 끝난 게임 상세는 바뀌지 않음
+    ("/user/stats/",  (600, 86400)),         # 캐릭터별 누적 통계
+    ("/user/nickname", (600, 86400)),        # 닉네임 → userId
+    ("/rank/uid/",    (300, 3600)),          # 시즌 랭크
+)
+
+# 유저가 기다리는 호출(백그라운드 외)에 stale 응답을 줄 수 있는 최대 추가 시간 (초).
+# 응답 나이를 표시하는 명령어는 client.peek 로 따로 처리하므로, get() 은 오래된 응답을 지금 값처럼 주지 않게 짧게 잡는다
+INTERACTIVE_MAX_STALE = 60
+
+MEMORY_CACHE_MAX   = 2000             # 메모리에 들고 있을 응답 수
+DISK_CACHE_MAX_AGE = 31 * 86400       # 이보다 오래된 디스크 캐시는 정리
+DISK_PRUNE_EVERY   = 500              # 디스크 저장 몇 번마다 정리할지
+
+
+def request_timeout(path: str) -> aiohttp.ClientTimeout:
+    return next((t for prefix, t in TIMEOUT_POLICIES if path.startswith(prefix)), DEFAULT_TIMEOUT)
+
+
+def cache_policy(path: str) -> Tuple[float, float]:
+    return next((policy for prefix, policy in CACHE_POLICIES if path.startswith(prefix)), (0, 0))
+
+
+@dataclass
+class CachedResponse:
+    body: dict
+    stored_at: float                  # time.time()
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+# ────────────────────────────────────────────
+# 공용 클라이언트
+# ────────────────────────────────────────────
+class ERClient:
+    """
+    ER Open API 공용 클라이언트.
+    세션과 호출 한도를 봇 전체(명령어 + 백그라운드 작업)가 공유한다.
+    응답은 메모리 + DB(api_response_caches)에 캐시해서 재시작 후에도 쓴다.
+    DB 읽기/쓰기는 이벤트 루프를 막지 않게 스레드에서 (쓰기는 모아서 한 번에).
+    """
+    def __init__(self, api_key: str, rate_per_sec: float = ER_RPS):
+        self.api_key = api_key
+        self.rl = RateLimiter(rate_per_sec)
+        self.breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN, BREAKER_COOLDOWN_MAX)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._cache: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}    # 같은 요청 동시 호출 병합
+        self._revalidating: Set[asyncio.Task] = set()     # 백그라운드 재검증 (참조 유지용)
+        self._pending_writes: Dict[str, CachedResponse] = {}  # 아직 DB에 쓰지 않은 응답
+        self._flusher: Optional[asyncio.Task] = None
+        self._disk_writes = 0
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={"x-api-key": self.api_key},
+                timeout=DEFAULT_TIMEOUT,
+                trace_configs=[metrics.er_trace_config()],
+            )
+        return self._session
+
+    async def close(self):
+        for task in list(self._revalidating):
+            task.cancel()
+        if self._flusher is not None:
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        await self._flush_writes()  # 남은 캐시 쓰기 마무리 (쓰기 작업이 취소된 경우 포함)
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def get(
+        self, path: str, base: str = ER_BASE, ttl: Optional[float] = None,
+        priority: int = PRIORITY_COMMAND, degrade: bool = True, max_stale: Optional[float] = None,
+        **params,
+    ) -> Optional[dict]:
+        """
+        GET 요청. 200이 아니면 None (429는 Retry-After / 지수 백오프 후 재시도).
+        ttl을 주지 않으면 CACHE_POLICIES의 엔드포인트별 정책을 따르고,
+        ttl=0 이면 캐시를 건너뛰고 항상 새로 받는다.
+        신선 TTL이 지난 응답은 백그라운드 우선순위에서만 정책의 stale 시간만큼 쓰고,
+        그 외에는 INTERACTIVE_MAX_STALE 까지만 쓴다. max_stale 로 더 줄일 수 있다 (0 이면 stale 응답 안 씀).
+        ER API가 응답하지 않으면(서킷 열림 / 시간 예산 초과 포함) 나이와 상관없이 캐시된 응답으로, 없으면 None.
+        degrade=False 면 캐시도 없을 때 None 대신 UpstreamUnavailable
+        ("없는 데이터"와 "확인 못 함"을 구분해야 하는 호출자용).
+        """
+        key = self._key(base, path, params)
+        fresh, stale = cache_policy(path) if ttl is None else (ttl, 0)
+        if priority != PRIORITY_BACKGROUND:
+            stale = min(stale, INTERACTIVE_MAX_STALE)
+        if max_stale is not None:
+            stale = min(stale, max_stale)
+        if fresh <= 0:
+            return await self._fetch_or_degrade(key, base, path, params, priority, store=False, degrade=degrade)
+
+        entry = await self._lookup(key)
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            if age < fresh:
+                metrics.cache_result("er_api", True)
+                return entry.body
+            if age < fresh + stale:
+                metrics.registry.inc("cache_requests_total", cache="er_api", result="stale")
+                self._revalidate_later(key, base, path, params)
+                return entry.body
+        metrics.cache_result("er_api", False)
+        return await self._fetch_or_degrade(key, base, path, params, priority, store=True, degrade=degrade)
+
+    async def peek(self, path: str, base: str = ER_BASE, **params) -> Optional[CachedResponse]:
+        """나이와 상관없이 캐시된 응답 (API 호출 없음)"""
+        return await self._lookup(self._key(base, path, params))
+
+    async def refresh(
+        self, path: str, base: str = ER_BASE, priority: int = PRIORITY_BACKGROUND, **params,
+    ) -> Optional[dict]:
+        """캐시를 무시하고 다시 받아 캐시에 저장 (캐시된 응답이 있으면 조건부 요청). 실패하면 None"""
+        key = self._key(base, path, params)
+        try:
+            async with call_budget(priority):
+                return await self._fetch_shared(key, base, path, params, priority, store=True)
+        except (UpstreamUnavailable, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[API] 갱신 실패 {path}: {e!r}")
+            return None
+
+    @staticmethod
+    def _key(base: str, path: str, params: dict) -> str:
+        return f"{base}{path}?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+    # ── 캐시 저장소 ─────────────────────────────
+
+    async def _lookup(self, key: str) -> Optional[CachedResponse]:
+        entry = self._cache.get(key) or self._pending_writes.get(key)
+        if entry is None:
+            entry = await asyncio.to_thread(self._load_disk, key)
+            if entry is None:
+                return None
+            # 읽는 동안 새 응답이 들어왔으면 그쪽을 쓴다
+            entry = self._cache.get(key) or entry
+            self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: CachedResponse):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > MEMORY_CACHE_MAX:
+            self._cache.popitem(last=False)
+
+    def _load_disk(self, key: str) -> Optional[CachedResponse]:
+        session = SessionLocal()
+        try:
+            row = session.get(ApiResponseCache, key)
+            if row is None:
+                return None
+            return CachedResponse(
+                body=json.loads(row.body),
+                stored_at=row.fetched_at.timestamp() if row.fetched_at else 0.0,
+                etag=row.etag,
+                last_modified=row.last_modified,
+            )
+        except Exception as e:
+            print(f"[API 캐시] 읽기 실패: {e}")
+            return None
+        finally:
+            session.close()
+
+    def _store(self, key: str, entry: CachedResponse):
+        """메모리에는 바로, DB에는 백그라운드에서 모아서 쓴다"""
+        self._remember(key, entry)
+        self._pending_writes[key] = entry
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_writes())
+
+    async def _flush_writes(self):
+        while self._pending_writes:
+            batch, self._pending_writes = self._pending_writes, {}
+            await asyncio.to_thread(self._write_disk, batch)
+
+    def _write_disk(self, batch: Dict[str, CachedResponse]):
+        session = SessionLocal()
+        try:
+            bulk_upsert(session, ApiResponseCache, [{
+                "key": key,
+                "body": json.dumps(entry.body, ensure_ascii=False),
+                "etag": entry.etag,
+                "last_modified": entry.last_modified,
+                "fetched_at": datetime.fromtimestamp(entry.stored_at),
+            } for key, entry in batch.items()])
+            before, self._disk_writes = self._disk_writes, self._disk_writes + len(batch)
+            if before // DISK_PRUNE_EVERY != self._disk_writes // DISK_PRUNE_EVERY:
+                cutoff = datetime.now() - timedelta(seconds=DISK_CACHE_MAX_AGE)
+                session.query(ApiResponseCache).filter(ApiResponseCache.fetched_at < cutoff).delete()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"[API 캐시] 저장 실패: {e}")
+        finally:
+            session.close()
+
+    # ── 요청 ────────────────────────────────────
+
+    async def _fetch_or_degrade(
+        self, key: str, base: str, path: str, params: dict, priority: int, store: bool,
+        degrade: bool = True,
+    ) -> Optional[dict]:
+        """
+        장애 중이거나 시간 예산을 넘기면 캐시된 응답(나이 무관)으로 답한다.
+        캐시도 없으면 None (degrade=False 면 UpstreamUnavailable).
+        """
+        try:
+            async with call_budget(priority):
+                return await self._fetch_shared(key, base, path, params, priority, store)
+        except (UpstreamUnavailable, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            cached = await self._lookup(key)
+            metrics.registry.inc("er_api_degraded_total", result="cache" if cached else "none")
+            if not isinstance(e, CircuitOpen):
+                print(f"[API] {path} 실패, {'캐시로 응답' if cached else '응답 없음'}: {e!r}")
+            if cached:
+                return cached.body
+            if degrade:
+                return None
+            if isinstance(e, UpstreamUnavailable):
+                raise
+            raise UpstreamUnavailable(f"ER API 응답 없음 ({type(e).__name__})") from e
+
+    def _revalidate_later(self, key: str, base: str, path: str, params: dict):
+        """stale 응답을 돌려준 뒤 백그라운드 우선순위로 다시 받아 둔다"""
+        if key in self._inflight or self.breaker.state == "open":
+            return
+
+        async def revalidate():
+            try:
+                async with call_budget(PRIORITY_BACKGROUND):
+                    await self._fetch_shared(key, base, path, params, PRIORITY_BACKGROUND, store=True)
+            except Exception as e:
+                print(f"[API 캐시] 재검증 실패 {path}: {e}")
+
+        task = asyncio.create_task(revalidate())
+        self._revalidating.add(task)
+        task.add_done_callback(self._revalidating.discard)
+
+    async def _fetch_shared(
+        self, key: str, base: str, path: str, params: dict, priority: int, store: bool,
+    ) -> Optional[dict]:
+        # 같은 요청이 이미 진행 중이면 그 결과를 같이 기다린다
+        shared = self._inflight.get(key)
+        if shared is not None:
+            metrics.registry.inc("cache_requests_total", cache="er_api_inflight", result="merged")
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                # 먼저 요청한 쪽만 취소된 경우에는 직접 요청한다
+                if not shared.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            data = await self._fetch(key, base, path, params, priority, store)
+            fut.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # 같이 기다리는 호출이 없을 때 경고 방지
+            raise
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    async def _fetch(
+        self, key: str, base: str, path: str, params: dict, priority: int, store: bool,
+    ) -> Optional[dict]:
+        """캐시된 응답이 있으면 조건부 요청, 304면 캐시 응답을 갱신해서 돌려준다"""
+        cached = await self._lookup(key) if store else None
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        status, body, resp_headers = await self._request(base, path, params, priority, headers)
+        if status == 304 and cached:
+            metrics.registry.inc("cache_requests_total", cache="er_api", result="revalidated")
+            cached.stored_at = time.time()
+            self._store(key, cached)
+            return cached.body
+        if status != 200:
+            return None
+        if store:
+            self._store(key, CachedResponse(
+                body=body,
+                stored_at=time.time(),
+                etag=resp_headers.get("ETag"),
+                last_modified=resp_headers.get("Last-Modified"),
+            ))
+        return body
+
+    async def _request(
+        self, base: str, path: str, params: dict, priority: int, headers: dict = None,
+    ) -> Tuple[int, Optional[dict], Mapping[str, str]]:
+        """
+        (상태 코드, 본문, 응답 헤더).
+        네트워크 오류 / 5xx / 429 재시도 소진은 서킷 브레이커에 실패로 기록하고 UpstreamUnavailable.
+        서킷이 열려 있으면 호출하지 않고 바로 CircuitOpen.
+        """
+        session = await self.session()
+        for attempt in range(MAX_RETRY_429):
+            if not self.breaker.allow():
+                raise CircuitOpen(f"서킷 열림 ({self.breaker.retry_in():.0f}초 후 재시도)")
+            trial = self.breaker.state == "half_open"  # half_open 에서 통과했다면 이 호출이 시험 호출
+            try:
+                await self.rl.wait(priority)
+                _start_budget()
+                async with session.get(
+                    f"{base}{path}", params=params if params else None, headers=headers,
+                    timeout=request_timeout(path),
+                ) as r:
+                    status = r.status
+                    if status == 429:
+                        # 서버가 알려준 만큼(없으면 1초 → 2초 → 4초) 모든 호출을 같이 멈춘다
+                        delay = retry_after(r.headers)
+                        if delay is None:
+                            delay = BACKOFF_BASE * 2 ** attempt * random.uniform(1.0, 1.5)
+                        self.rl.backoff(min(BACKOFF_MAX, delay))
+                        if self.breaker.state == "half_open":
+                            self.breaker.success()  # 시험 호출에 응답은 왔으니 서버는 살아 있다
+                        continue
+                    if status >= 500:
+                        raise UpstreamUnavailable(f"HTTP {status}")
+                    body = await r.json() if status == 200 else None
+                    resp_headers = r.headers.copy()
+            except (UpstreamUnavailable, aiohttp.ClientError, asyncio.TimeoutError):
+                self.breaker.failure()
+                raise
+            except BaseException:
+                # 한도 대기나 요청 중 취소됨 (시간 예산 초과 / 명령어 취소): half_open 시험 자리를 돌려준다
+                if trial:
+                    self.breaker.abandon()
+                raise
+            self.breaker.success()
+            self.rl.recover()
+            return status, body, resp_headers
+        self.breaker.failure()
+        raise UpstreamUnavailable(f"429 {MAX_RETRY_429}회 연속")
+
+    # ── 개별 엔드포인트 ──────────────────────────
+
+    async def fetch_user_id(
+        self, nickname: str, priority: int = PRIORITY_COMMAND, max_stale: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        닉네임으로 유저 ID 조회. 없는 닉네임이면 None, ER API가 응답하지 않으면 UpstreamUnavailable.
+        max_stale=0: 신선 TTL이 지난 캐시는 쓰지 않고 다시 확인 (등록 / 계정 재확인)
+        """
+        data = await self.get(
+            "/user/nickname", priority=priority, degrade=False, max_stale=max_stale, query=nickname
+        )
+        if not data or not data.get("user"):
+            return None
+        return str(data["user"]["userId"])
+
+    async def fetch_user_games(
+        self, user_id: str, next_param: int = None, priority: int = PRIORITY_COMMAND, degrade: bool = True,
+    ) -> Optional[dict]:
+        """
+        유저 게임 기록 한 페이지 조회 (최신순).
+        응답의 "next" 값을 next_param으로 넘기면 그 다음(더 오래된) 페이지.
+        degrade=False 면 ER API가 응답하지 않을 때 None 대신 UpstreamUnavailable.
+        """
+        if next_param:
+            return await self.get(f"/user/games/uid/{user_id}", priority=priority, degrade=degrade, next=next_param)
+        return await self.get(f"/user/games/uid/{user_id}", priority=priority, degrade=degrade)
+
+
+client = ERClient(ER_KEY)
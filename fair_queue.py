@@ -0,0 +1,148 @@
+# fair_queue.py
+"""
+동시 실행 수를 제한하는 공정 작업 대기열.
+
+빈 자리가 없으면 작업은 대기열에 들어가고, 자리가 나면 서버(guild) → 사용자 순으로 번갈아 꺼낸다.
+한 서버나 한 사용자가 명령어를 몰아서 보내도 다른 서버/사용자의 작업이 그 뒤에 통째로 밀리지 않는다.
+
+    async with queue.slot(guild_id, user_id, on_position=...):
+        ...  # 자리를 얻은 뒤 실행
+
+on_position(n) 은 기다리는 동안 대기 순번(1부터)이 바뀔 때마다 호출된다.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Hashable, Optional
+
+import metrics
+
+
+class _Job:
+    __slots__ = ("guild", "user", "started", "wake")
+
+    def __init__(self, guild: Hashable, user: Hashable):
+        self.guild   = guild
+        self.user    = user
+        self.started = False
+        self.wake    = asyncio.Event()
+
+
+class FairQueue:
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.running = 0
+        # guild → user → 작업 (앞쪽이 다음 차례)
+        self._pending: "OrderedDict[Hashable, OrderedDict[Hashable, deque[_Job]]]" = OrderedDict()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(jobs) for users in self._pending.values() for jobs in users.values())
+
+    # ── 순서 ───────────────────────────────────
+
+    def _order(self) -> list[_Job]:
+        """대기 중인 작업을 실제로 꺼내질 순서대로 (서버/사용자 라운드 로빈)"""
+        guilds = OrderedDict(
+            (g, OrderedDict((u, deque(jobs)) for u, jobs in users.items()))
+            for g, users in self._pending.items()
+        )
+        order = []
+        while guilds:
+            guild, users = next(iter(guilds.items()))
+            user, jobs = next(iter(users.items()))
+            order.append(jobs.popleft())
+            users.move_to_end(user)
+            if not jobs:
+                del users[user]
+            guilds.move_to_end(guild)
+            if not users:
+                del guilds[guild]
+        return order
+
+    def position(self, job: _Job) -> int:
+        order = self._order()
+        return order.index(job) + 1 if job in order else 0
+
+    # ── 넣기 / 꺼내기 ──────────────────────────
+
+    def _enqueue(self, job: _Job):
+        self._pending.setdefault(job.guild, OrderedDict()).setdefault(job.user, deque()).append(job)
+
+    def _remove(self, job: _Job):
+        users = self._pending.get(job.guild)
+        jobs = users.get(job.user) if users else None
+        if jobs and job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                del users[job.user]
+            if not users:
+                del self._pending[job.guild]
+
+    def _dispatch(self):
+        """빈 자리만큼 다음 차례 작업을 시작시키고, 남은 작업에는 순번이 바뀌었음을 알린다"""
+        while self.running < self.concurrency and self._pending:
+            guild, users = next(iter(self._pending.items()))
+            user, jobs = next(iter(users.items()))
+            job = jobs.popleft()
+            users.move_to_end(user)
+            if not jobs:
+                del users[user]
+            self._pending.move_to_end(guild)
+            if not users:
+                del self._pending[guild]
+            job.started = True
+            self.running += 1
+            job.wake.set()
+        for users in self._pending.values():
+            for jobs in users.values():
+                for job in jobs:
+                    job.wake.set()
+        self._publish()
+
+    def _release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _publish(self):
+        metrics.registry.set("job_queue_running", self.running, queue=self.name)
+        metrics.registry.set("job_queue_waiting", self.waiting, queue=self.name)
+
+    # ── 사용 ───────────────────────────────────
+
+    @asynccontextmanager
+    async def slot(
+        self, guild: Hashable, user: Hashable,
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None,
+    ):
+        job = _Job(guild, user)
+        self._enqueue(job)
+        enqueued = time.perf_counter()
+        self._dispatch()
+        try:
+            last = None
+            while True:
+                job.wake.clear()
+                if job.started:
+                    break
+                pos = self.position(job)
+                if on_position and pos != last:
+                    last = pos
+                    await on_position(pos)
+                    continue  # 콜백 중에 순번이 또 바뀌었을 수 있음
+                await job.wake.wait()
+        except BaseException:
+            if job.started:
+                self._release()
+            else:
+                self._remove(job)
+                self._dispatch()
+            raise
+
+        metrics.registry.observe("job_queue_wait_seconds", time.perf_counter() - enqueued, queue=self.name)
+        try:
+            yield
+        finally:
+            self._release()
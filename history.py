@@ -0,0 +1,345 @@
+# history.py
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from db import SessionLocal
+from models import UserGame, GameSyncState, UserStatAggregate
+from er_api import client, PRIORITY_COMMAND, PRIORITY_BACKGROUND
+
+FRESH_SECONDS = 60  # 이 시간 안에 최신 페이지를 확인했다면 API 호출 생략
+MAX_GAP_PAGES = 5   # 한 번의 갱신에서 따라갈 최대 페이지 수 (공백 메우기, 남으면 다음 갱신에서 이어감)
+INTERACTIVE_PAGES = 1  # 명령어 응답 경로는 최신 페이지만 (공백은 백그라운드 동기화가 이어서 메움)
+NICKNAME_TTL = 3600 # 닉네임 → userId 대응을 믿는 시간 (닉네임 변경 / 다른 유저가 가져간 닉네임 대비)
+
+
+# ────────────────────────────────────────────
+# 로컬 저장소
+# ────────────────────────────────────────────
+def _game_columns(g: dict) -> dict:
+    """userGames 1행 → UserGame 컬럼 값"""
+    return {
+        "season_id": g.get("seasonId"),
+        "matching_mode": g.get("matchingMode"),
+        "matching_team_mode": g.get("matchingTeamMode"),
+        "start_dtm": g.get("startDtm"),
+        "character_num": g.get("characterNum"),
+        "skin_code": g.get("skinCode"),
+        "best_weapon": g.get("bestWeapon"),
+        "game_rank": g.get("gameRank"),
+        "player_kill": g.get("playerKill"),
+        "player_deaths": g.get("playerDeaths"),
+        "player_assistant": g.get("playerAssistant"),
+        "team_kill": g.get("teamKill"),
+        "duration": g.get("duration"),
+        "mmr_gain": g.get("mmrGain"),
+    }
+
+
+def ingest_games(er_user_id: str, games: List[dict]) -> int:
+    """userGames 목록을 저장하고 새로 추가된 개수를 반환"""
+    if not games:
+        return 0
+
+    session = SessionLocal()
+    try:
+        ids = [g["gameId"] for g in games if g.get("gameId")]
+        existing = {
+            row[0] for row in session.query(UserGame.game_id)
+            .filter(UserGame.er_user_id == er_user_id, UserGame.game_id.in_(ids))
+        }
+
+        new_games = []
+        for g in games:
+            game_id = g.get("gameId")
+            if not game_id or game_id in existing:
+                continue
+            session.add(UserGame(
+                er_user_id=er_user_id,
+                game_id=game_id,
+                payload=json.dumps(g, ensure_ascii=False),
+                **_game_columns(g),
+            ))
+            existing.add(game_id)
+            new_games.append(g)
+
+        _apply_to_aggregates(session, er_user_id, new_games)
+        session.commit()
+        return len(new_games)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def latest_games(er_user_id: str, limit: int = 20, matching_mode: int = None) -> List[dict]:
+    """로컬에 저장된 게임을 최신순으로 반환 (userGames 원본 형태)"""
+    session = SessionLocal()
+    try:
+        q = session.query(UserGame.payload).filter(UserGame.er_user_id == er_user_id)
+        if matching_mode is not None:
+            q = q.filter(UserGame.matching_mode == matching_mode)
+        rows = q.order_by(UserGame.game_id.desc()).limit(limit).all()
+        return [json.loads(row[0]) for row in rows]
+    finally:
+        session.close()
+
+
+def _apply_to_aggregates(session, er_user_id: str, games: List[dict]):
+    """새로 저장된 게임을 유저/시즌/캐릭터 누적 통계에 더한다 (같은 트랜잭션)"""
+    rows: Dict[Tuple[int, int], UserStatAggregate] = {}
+    for g in games:
+        key = (g.get("seasonId") or 0, g.get("characterNum") or 0)
+        agg = rows.get(key) or session.get(UserStatAggregate, (er_user_id, *key))
+        if agg is None:
+            agg = UserStatAggregate(
+                er_user_id=er_user_id, season_id=key[0], character_num=key[1],
+                games=0, wins=0, top3=0, kills=0, deaths=0, assists=0,
+                rank_sum=0, duration_sum=0, skins="{}",
+            )
+            session.add(agg)
+        rows[key] = agg
+
+        rank = g.get("gameRank") or 0
+        agg.games += 1
+        agg.wins += 1 if rank == 1 else 0
+        agg.top3 += 1 if 0 < rank <= 3 else 0
+        agg.kills += g.get("playerKill") or 0
+        agg.deaths += g.get("playerDeaths") or 0
+        agg.assists += g.get("playerAssistant") or 0
+        agg.rank_sum += rank
+        agg.duration_sum += g.get("duration") or 0
+
+        if g.get("skinCode") is not None:
+            skins = json.loads(agg.skins or "{}")
+            skin = str(g["skinCode"] % 100)
+            skins[skin] = skins.get(skin, 0) + 1
+            agg.skins = json.dumps(skins)
+        agg.updated_at = datetime.now()
+
+
+def rebuild_aggregates(er_user_id: str = None):
+    """저장된 게임으로 누적 통계를 처음부터 다시 계산 (er_user_id=None이면 전체)"""
+    session = SessionLocal()
+    try:
+        q = session.query(UserStatAggregate)
+        games_q = session.query(UserGame.er_user_id, UserGame.payload)
+        if er_user_id:
+            q = q.filter(UserStatAggregate.er_user_id == er_user_id)
+            games_q = games_q.filter(UserGame.er_user_id == er_user_id)
+        q.delete(synchronize_session=False)
+
+        by_user: Dict[str, List[dict]] = {}
+        for uid, payload in games_q:
+            by_user.setdefault(uid, []).append(json.loads(payload))
+        for uid, games in by_user.items():
+            _apply_to_aggregates(session, uid, games)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def has_aggregates() -> bool:
+    session = SessionLocal()
+    try:
+        return session.query(UserStatAggregate.er_user_id).first() is not None
+    finally:
+        session.close()
+
+
+def _aggregate_query(session, er_user_id: str, season_id: Optional[int], *cols):
+    q = session.query(*cols).filter(UserStatAggregate.er_user_id == er_user_id)
+    if season_id is not None:
+        q = q.filter(UserStatAggregate.season_id == season_id)
+    return q
+
+
+def summarize(er_user_id: str, season_id: Optional[int] = None) -> Optional[dict]:
+    """
+    누적 통계 합계 (season_id=None이면 전 시즌).
+    반환: {"games", "wins", "top3", "kills", "deaths", "assists", "rank_sum", "duration_sum"} 또는 None
+    """
+    a = UserStatAggregate
+    session = SessionLocal()
+    try:
+        row = _aggregate_query(
+            session, er_user_id, season_id,
+            func.sum(a.games), func.sum(a.wins), func.sum(a.top3), func.sum(a.kills),
+            func.sum(a.deaths), func.sum(a.assists), func.sum(a.rank_sum), func.sum(a.duration_sum),
+        ).one()
+    finally:
+        session.close()
+
+    if not row[0]:
+        return None
+    keys = ("games", "wins", "top3", "kills", "deaths", "assists", "rank_sum", "duration_sum")
+    return dict(zip(keys, (int(v or 0) for v in row)))
+
+
+def character_counts(er_user_id: str, season_id: Optional[int] = None) -> List[Tuple[int, int]]:
+    """캐릭터별 판수 [(characterNum, 판수), ...] 판수 내림차순"""
+    a = UserStatAggregate
+    session = SessionLocal()
+    try:
+        rows = (
+            _aggregate_query(session, er_user_id, season_id, a.character_num, func.sum(a.games))
+            .filter(a.character_num != 0)
+            .group_by(a.character_num)
+            .order_by(func.sum(a.games).desc())
+            .all()
+        )
+        return [(int(c), int(n)) for c, n in rows]
+    finally:
+        session.close()
+
+
+def most_played_skin(er_user_id: str, character_num: int, season_id: Optional[int] = None) -> int:
+    """해당 캐릭터로 가장 많이 사용한 스킨 번호 (skinCode % 100)"""
+    a = UserStatAggregate
+    session = SessionLocal()
+    try:
+        rows = (
+            _aggregate_query(session, er_user_id, season_id, a.skins)
+            .filter(a.character_num == character_num)
+            .all()
+        )
+    finally:
+        session.close()
+
+    totals: Dict[str, int] = {}
+    for (skins,) in rows:
+        for skin, cnt in json.loads(skins or "{}").items():
+            totals[skin] = totals.get(skin, 0) + cnt
+    return int(max(totals.items(), key=lambda x: x[1])[0]) if totals else 0
+
+
+def get_state(er_user_id: str) -> Optional[GameSyncState]:
+    session = SessionLocal()
+    try:
+        return session.get(GameSyncState, er_user_id)
+    finally:
+        session.close()
+
+
+def cached_user_id(nickname: str, max_age: int = NICKNAME_TTL) -> Optional[str]:
+    """max_age 초 안에 확인한 닉네임이면 API 호출 없이 userId 반환"""
+    session = SessionLocal()
+    try:
+        row = (
+            session.query(GameSyncState.er_user_id)
+            .filter(
+                GameSyncState.nickname == nickname,
+                GameSyncState.nickname_at >= datetime.now() - timedelta(seconds=max_age),
+            )
+            .order_by(GameSyncState.nickname_at.desc())
+            .first()
+        )
+        return row[0] if row else None
+    finally:
+        session.close()
+
+
+def remember_nickname(er_user_id: str, nickname: str):
+    """ER API / 계정 확인으로 확인한 닉네임 → userId 대응을 기록 (다음 조회에서 닉네임 조회 생략용)"""
+    _save_state(er_user_id, nickname=nickname, nickname_at=datetime.now())
+
+
+def _save_state(er_user_id: str, **fields):
+    session = SessionLocal()
+    try:
+        state = session.get(GameSyncState, er_user_id)
+        if state is None:
+            state = GameSyncState(er_user_id=er_user_id)
+            session.add(state)
+        for k, v in fields.items():
+            setattr(state, k, v)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# ────────────────────────────────────────────
+# 동기화
+# ────────────────────────────────────────────
+async def refresh(
+    er_user_id: str, max_age: int = FRESH_SECONDS,
+    priority: int = PRIORITY_COMMAND, degrade: bool = True, max_pages: int = MAX_GAP_PAGES,
+) -> int:
+    """
+    최신 페이지 확인 후 새 게임을 저장한다.
+    max_age 초 안에 이미 확인했다면 API를 호출하지 않는다.
+    새 게임이 한 페이지를 전부 채우면 로컬 최신 게임에 닿을 때까지 next를 따라간다.
+    max_pages 안에 닿지 못하면 멈춘 곳(gap_next)과 목표(gap_until)를 저장해 두고 다음 갱신에서 이어간다.
+    degrade=False 면 최신 페이지를 ER API 장애로 못 받았을 때 UpstreamUnavailable.
+    반환: 새로 추가된 게임 수
+    """
+    state = get_state(er_user_id)
+    if state and state.synced_at and datetime.now() - state.synced_at < timedelta(seconds=max_age):
+        return 0
+
+    known_newest = state.newest_game_id if state else None
+    gap_next = state.gap_next if state else None
+    gap_until = state.gap_until if state else None
+
+    data = await client.fetch_user_games(er_user_id, priority=priority, degrade=degrade)
+    if data is None:
+        return 0
+
+    games = data.get("userGames") or []
+    added = ingest_games(er_user_id, games)
+
+    fields = {"synced_at": datetime.now()}
+    if games:
+        fields["newest_game_id"] = max(g["gameId"] for g in games)
+    if state is None or state.synced_at is None:
+        # 첫 동기화 (닉네임만 기록돼 있던 경우 포함): 첫 페이지의 next부터 과거 기록 수집 시작
+        fields["backfill_next"] = data.get("next")
+        fields["backfill_done"] = not data.get("next")
+
+    # 공백 메우기: 페이지 전체가 새 게임이면 이전 페이지도 확인
+    if known_newest is not None and games and data.get("next") and min(g["gameId"] for g in games) > known_newest:
+        # 새 공백. 이전 갱신에서 다 못 메운 공백이 남아 있으면 그 아래쪽 끝까지 한 번에 이어서 메운다
+        gap_next = data["next"]
+        if gap_until is None:
+            gap_until = known_newest
+    pages = 1
+    while gap_next and pages < max_pages:
+        data = await client.fetch_user_games(er_user_id, gap_next, priority=priority)
+        if not data:
+            break  # 커서는 그대로 두고 다음 갱신에서 다시
+        games = data.get("userGames") or []
+        added += ingest_games(er_user_id, games)
+        gap_next = data.get("next")
+        pages += 1
+        if not games or min(g["gameId"] for g in games) <= gap_until:
+            gap_next = None
+    fields["gap_next"] = gap_next
+    fields["gap_until"] = gap_until if gap_next else None
+
+    _save_state(er_user_id, **fields)
+    return added
+
+
+async def backfill_step(er_user_id: str, priority: int = PRIORITY_BACKGROUND) -> int:
+    """과거 기록 한 페이지를 수집한다. 반환: 새로 추가된 게임 수"""
+    state = get_state(er_user_id)
+    if state is None or state.backfill_done or not state.backfill_next:
+        return 0
+
+    data = await client.fetch_user_games(er_user_id, state.backfill_next, priority=priority)
+    if data is None:
+        return 0
+
+    added = ingest_games(er_user_id, data.get("userGames") or [])
+    next_param = data.get("next")
+    _save_state(er_user_id, backfill_next=next_param, backfill_done=not next_param)
+    return added
@@ -0,0 +1,281 @@
+# lobby_image.py
+"""
+대기분석 이미지 처리 (PIL).
+
+ROI 검출 / 축소 / 전처리 / 닉네임 크롭은 CPU를 오래 쓰므로 전용 프로세스 풀(ImagePool)에서 돌린다.
+스레드풀에서 돌리면 GIL을 두고 이벤트 루프와 다투지만, 프로세스는 코어를 따로 쓴다.
+원본 스크린샷은 SharedImage로 공유 메모리에 한 번만 올려 두고, 작업마다 이름만 넘겨서
+크롭 재질의가 여러 번 일어나도 수 MB 이미지를 매번 파이프로 복사하지 않는다.
+"""
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+
+from PIL import Image, ImageEnhance, ImageFilter
+
+import metrics
+from config import LOBBY_IMAGE_WORKERS
+
+
+# ────────────────────────────────────────────
+# 이미지 전처리 (밝기/대비/채도/선명도)
+# ────────────────────────────────────────────
+def enhance(img: Image.Image) -> Image.Image:
+    img = ImageEnhance.Brightness(img).enhance(0.70)
+    img = ImageEnhance.Contrast(img).enhance(1.50)
+    img = ImageEnhance.Color(img).enhance(0.00)
+    img = ImageEnhance.Sharpness(img).enhance(2.00)
+    return img
+
+
+# ────────────────────────────────────────────
+# 로스터 영역(ROI) 검출
+# ────────────────────────────────────────────
+# 대기창 스크린샷(1440p / 4K)을 통째로 보내지 않고 닉네임이 몰려 있는 패널만 잘라서 줄여 보낸다.
+# 글자가 많은 곳은 엣지가 촘촘하므로, 축소한 엣지 이미지의 행/열 평균(투영)이 높은 구간을 패널로 본다.
+ROI_PROBE_WIDTH  = 480   # 검출용 축소 너비 (px)
+ROI_EDGE_LEVEL   = 48    # 이 밝기 이상인 엣지 픽셀만 센다
+ROI_DENSITY      = 0.25  # 행/열 엣지 밀도가 최댓값의 이 비율 이상인 구간을 패널로 봄
+ROI_MARGIN       = 0.02  # 검출 영역 바깥 여유 (원본 대비 비율)
+ROI_MIN_AREA     = 0.10  # 검출 영역이 원본의 이 비율보다 작으면 검출 실패로 보고 전체 사용
+ROI_MAX_SIDE     = 1600  # 모델에 보낼 이미지의 최대 긴 변 (px)
+
+
+def _dense_span(profile: list[int], level: float) -> tuple[int, int] | None:
+    """profile 값이 level 이상인 첫 위치 ~ 마지막 위치"""
+    hits = [i for i, v in enumerate(profile) if v >= level]
+    return (hits[0], hits[-1] + 1) if hits else None
+
+
+def find_roster_roi(img: Image.Image) -> tuple[int, int, int, int]:
+    """닉네임 패널 영역 (x0, y0, x1, y1) 픽셀. 못 찾으면 이미지 전체."""
+    w, h = img.size
+    full = (0, 0, w, h)
+    scale = ROI_PROBE_WIDTH / w if w > ROI_PROBE_WIDTH else 1.0
+    pw, ph = max(1, int(w * scale)), max(1, int(h * scale))
+
+    edges = (
+        img.convert("L")
+        .resize((pw, ph), Image.BILINEAR)
+        .filter(ImageFilter.FIND_EDGES)
+        .point(lambda v: 255 if v >= ROI_EDGE_LEVEL else 0)
+    )
+    # BOX 축소 = 행/열 평균 (파이썬 루프 없이 투영)
+    cols = list(edges.resize((pw, 1), Image.BOX).getdata())
+    rows = list(edges.resize((1, ph), Image.BOX).getdata())
+    if not cols or max(cols) == 0 or max(rows) == 0:
+        return full
+
+    x_span = _dense_span(cols, max(cols) * ROI_DENSITY)
+    y_span = _dense_span(rows, max(rows) * ROI_DENSITY)
+    if not x_span or not y_span:
+        return full
+
+    mx, my = int(w * ROI_MARGIN), int(h * ROI_MARGIN)
+    x0 = max(0, int(x_span[0] / scale) - mx)
+    x1 = min(w, int(x_span[1] / scale) + mx)
+    y0 = max(0, int(y_span[0] / scale) - my)
+    y1 = min(h, int(y_span[1] / scale) + my)
+    if (x1 - x0) * (y1 - y0) < w * h * ROI_MIN_AREA:
+        return full
+    return x0, y0, x1, y1
+
+
+def prepare_ocr_image(image_bytes: bytes) -> tuple[bytes, tuple[int, int, int, int], tuple[int, int]]:
+    """
+    OCR용 이미지: 로스터 영역만 잘라 ROI_MAX_SIDE 이하로 줄이고 전처리.
+    Returns: (PNG bytes, ROI 픽셀 좌표, 원본 크기) — 좌표 복원은 remap_box
+    """
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    roi = find_roster_roi(img)
+    cropped = img.crop(roi)
+    longest = max(cropped.size)
+    if longest > ROI_MAX_SIDE:
+        ratio = ROI_MAX_SIDE / longest
+        cropped = cropped.resize(
+            (max(1, int(cropped.width * ratio)), max(1, int(cropped.height * ratio))), Image.LANCZOS
+        )
+    buf = io.BytesIO()
+    enhance(cropped).save(buf, format="PNG")
+    print(f"[ROI] 원본 {img.width}x{img.height} → 영역 {roi} → 전송 {cropped.width}x{cropped.height}")
+    return buf.getvalue(), roi, img.size
+
+
+def remap_box(box: list[int], roi: tuple[int, int, int, int], size: tuple[int, int]) -> list[int]:
+    """ROI 기준 0~1000 좌표 [ymin, xmin, ymax, xmax] → 원본 이미지 기준 0~1000 좌표"""
+    x0, y0, x1, y1 = roi
+    w, h = size
+    ymin, xmin, ymax, xmax = box
+    to_y = lambda v: round((y0 + v / 1000 * (y1 - y0)) / h * 1000)
+    to_x = lambda v: round((x0 + v / 1000 * (x1 - x0)) / w * 1000)
+    return [to_y(ymin), to_x(xmin), to_y(ymax), to_x(xmax)]
+
+
+# ────────────────────────────────────────────
+# 동적 크롭
+# ────────────────────────────────────────────
+def crop_nickname_region(
+    image_bytes: bytes,
+    box: list[int],
+    padding_norm: int = 30,
+    min_output_width: int = 500,
+) -> bytes:
+    """
+    0~1000 정규화 좌표 [ymin, xmin, ymax, xmax] 로 닉네임 영역을 크롭한다.
+
+    Args:
+        padding_norm: 바운딩박스 주변 패딩 (0~1000 단위)
+        min_output_width: 결과 이미지 최소 너비 (픽셀). 작으면 업스케일.
+    Returns:
+        전처리된 크롭 PNG bytes
+    """
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    w, h = img.size
+
+    ymin_n, xmin_n, ymax_n, xmax_n = box
+
+    # 패딩 적용 및 범위 클램프
+    ymin_n = max(0, ymin_n - padding_norm)
+    xmin_n = max(0, xmin_n - padding_norm)
+    ymax_n = min(1000, ymax_n + padding_norm)
+    xmax_n = min(1000, xmax_n + padding_norm)
+
+    # 픽셀 변환
+    x0 = int(xmin_n / 1000 * w)
+    y0 = int(ymin_n / 1000 * h)
+    x1 = int(xmax_n / 1000 * w)
+    y1 = int(ymax_n / 1000 * h)
+
+    # 영역이 너무 작으면 크롭 포기 → None 반환 신호
+    if (x1 - x0) < 5 or (y1 - y0) < 5:
+        raise ValueError(f"크롭 영역이 너무 작음: box={box}, px=({x0},{y0},{x1},{y1})")
+
+    cropped = img.crop((x0, y0, x1, y1))
+
+    # 업스케일 (너비가 min_output_width 미만이면 확대)
+    if cropped.width < min_output_width:
+        scale = min_output_width / cropped.width
+        new_w = int(cropped.width  * scale)
+        new_h = int(cropped.height * scale)
+        cropped = cropped.resize((new_w, new_h), Image.LANCZOS)
+
+    # 전처리 적용
+    cropped = enhance(cropped)
+
+    buf = io.BytesIO()
+    cropped.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+# ────────────────────────────────────────────
+# 공유 메모리 이미지
+# ────────────────────────────────────────────
+class SharedImage:
+    """
+    원본 이미지 bytes를 공유 메모리에 올려 둔 것. 만든 쪽(봇 프로세스)이 끝나면 close() 한다.
+    with SharedImage(image_bytes) as image: ...
+    """
+    def __init__(self, image_bytes: bytes):
+        self.size = len(image_bytes)
+        self.prepared: Optional[tuple[bytes, tuple[int, int, int, int], tuple[int, int]]] = None  # image_pool.prepare 결과
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, self.size))
+        self._shm.buf[:self.size] = image_bytes
+
+    @property
+    def ref(self) -> tuple[str, int]:
+        """작업 프로세스에 넘기는 (공유 메모리 이름, 크기)"""
+        return self._shm.name, self.size
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self) -> "SharedImage":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_shared(ref: tuple[str, int]) -> bytes:
+    name, size = ref
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+
+# 작업 프로세스에서 실행되는 함수 (모듈 최상위에 있어야 pickle 가능)
+def _prepare_job(ref: tuple[str, int]):
+    return prepare_ocr_image(_read_shared(ref))
+
+
+def _crop_job(ref: tuple[str, int], box: list[int]) -> bytes:
+    return crop_nickname_region(_read_shared(ref), box)
+
+
+# ────────────────────────────────────────────
+# 프로세스 풀
+# ────────────────────────────────────────────
+class ImagePool:
+    """
+    대기분석 이미지 작업 전용 프로세스 풀.
+    동시에 도는 작업은 workers 개로 묶고, 나머지는 루프 안에서 기다린다.
+    workers 가 0이면 예전처럼 스레드에서 돌린다.
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._sem = asyncio.Semaphore(max(1, workers))
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # fork 는 봇 프로세스의 스레드 / 이벤트 루프 상태까지 복제하므로 spawn 으로 띄운다
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            print(f"[IMAGE] 프로세스 풀 시작 (workers={self.workers})")
+        return self._executor
+
+    async def _run(self, name: str, fn: Callable, *args):
+        async with self._sem:
+            with metrics.span("image", name):
+                if self.workers <= 0:
+                    return await asyncio.to_thread(fn, *args)
+                loop = asyncio.get_running_loop()
+                try:
+                    return await loop.run_in_executor(self._get_executor(), fn, *args)
+                except BrokenProcessPool:
+                    # 작업 프로세스가 죽으면 풀을 새로 띄워 한 번만 다시 시도
+                    print(f"[IMAGE] 프로세스 풀 손상 → 재시작 ({name})")
+                    self.shutdown()
+                    return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    async def prepare(self, image: SharedImage) -> tuple[bytes, tuple[int, int, int, int], tuple[int, int]]:
+        """
+        prepare_ocr_image 를 작업 프로세스에서 실행.
+        이미지당 한 번만 돌리고 결과를 image 에 보관한다 (모델 승급 / 재질의 라운드가 같이 씀).
+        """
+        if image.prepared is None:
+            image.prepared = await self._run("prepare", _prepare_job, image.ref)
+        return image.prepared
+
+    async def crop(self, image: SharedImage, box: list[int]) -> bytes:
+        """crop_nickname_region 을 작업 프로세스에서 실행 (영역이 너무 작으면 ValueError)"""
+        return await self._run("crop", _crop_job, image.ref, box)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_pool = ImagePool(LOBBY_IMAGE_WORKERS)
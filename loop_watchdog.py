@@ -0,0 +1,112 @@
+# loop_watchdog.py
+"""
+이벤트 루프 블로킹 감시.
+
+- 루프 안의 heartbeat 태스크가 LOOP_LAG_INTERVAL 마다 깨어나며 지연(lag)을 잰다.
+- 별도 스레드가 heartbeat를 지켜보다가 LOOP_BLOCK_MS 이상 멈추면
+  그 순간 루프 스레드의 스택과 실행 중이던 태스크를 로그로 남긴다.
+- 지연 분포는 metrics 의 loop_lag_seconds(히스토그램) / loop_lag_quantile_seconds(최근 p50/p95/p99)로 내보낸다.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+import metrics
+from config import LOOP_BLOCK_MS, LOOP_LAG_INTERVAL
+
+LAG_WINDOW     = 600  # 백분위 계산에 쓰는 최근 측정 수
+QUANTILE_EVERY = 10   # 몇 번 측정마다 백분위 갱신
+STACK_LIMIT    = 30   # 로그에 남길 스택 프레임 수
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: float, interval: float):
+        self.threshold = threshold_ms / 1000
+        self.interval  = interval
+        self._lags: deque = deque(maxlen=LAG_WINDOW)
+        self._last_beat = time.perf_counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """실행 중인 이벤트 루프 안에서 호출"""
+        if self.threshold <= 0 or self._heartbeat_task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+
+    def lag_quantiles(self) -> dict:
+        lags = sorted(self._lags)
+        if not lags:
+            return {}
+        return {q: lags[min(len(lags) - 1, int(len(lags) * q))] for q in (0.5, 0.95, 0.99)}
+
+    # ── 루프 쪽 ────────────────────────────────
+
+    async def _heartbeat(self):
+        beats = 0
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - start - self.interval)
+            self._last_beat = now
+            self._lags.append(lag)
+            metrics.registry.observe("loop_lag_seconds", lag)
+
+            beats += 1
+            if beats % QUANTILE_EVERY == 0:
+                for q, value in self.lag_quantiles().items():
+                    metrics.registry.set("loop_lag_quantile_seconds", value, quantile=f"{q:g}")
+
+    # ── 감시 스레드 ────────────────────────────
+
+    def _watch(self):
+        blocked_since = None
+        while not self._stop.wait(self.interval):
+            stalled = time.perf_counter() - self._last_beat - self.interval
+            if stalled >= self.threshold:
+                if blocked_since is None:
+                    blocked_since = self._last_beat
+                    metrics.registry.inc("loop_blocked_total")
+                    self._report(stalled)
+            elif blocked_since is not None:
+                total = self._last_beat - blocked_since - self.interval
+                print(f"[LOOP] 블로킹 해제 (약 {total * 1000:.0f}ms)")
+                blocked_since = None
+
+    def _report(self, stalled: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop)
+        where = "-"
+        if task is not None:
+            coro = task.get_coro()
+            where = f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+        stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT)) if frame else "(스택 없음)\n"
+        print(
+            f"[LOOP] 이벤트 루프가 {stalled * 1000:.0f}ms 이상 멈춤 — 실행 중 태스크: {where}\n"
+            f"{stack}"
+        )
+
+
+watchdog = LoopWatchdog(LOOP_BLOCK_MS, LOOP_LAG_INTERVAL)
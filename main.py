@@ -3,8 +3,13 @@ import discord
 from discord.ext import commands
 
 # DB 임포트
-from db import init_db
-from config import DISCORD_TOKEN, PREFIXES, GAME_STATUS
+from db import init_db, engine
+from er_api import client
+from config import DISCORD_TOKEN, PREFIXES, GAME_STATUS, METRICS_HOST, METRICS_PORT
+import metrics
+import dedup
+from profiler import profiler
+from loop_watchdog import watchdog
 
 # Intents 설정
 intents = discord.Intents.default()
@@ -37,6 +42,25 @@ async def on_ready():
 async def on_message(message):
     pass
 
+@bot.before_invoke
+async def before_command(ctx: commands.Context):
+    metrics.command_started(ctx)
+    profiler.command_started(ctx)
+    dedup.command_started(ctx)
+
+@bot.after_invoke
+async def after_command(ctx: commands.Context):
+    dedup.command_finished(ctx)
+    metrics.command_finished(ctx)
+    await profiler.command_finished(ctx)
+
+@bot.event
+async def on_command_error(ctx: commands.Context, error: commands.CommandError):
+    # 연타로 묶인 요청은 앞선 실행 결과로 안내했으므로 조용히 넘긴다
+    if isinstance(error, dedup.DuplicateCommand):
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)
+
 async def load_cogs():
     extensions = [
         "cogs.help",
@@ -48,6 +72,7 @@ async def load_cogs():
         "cogs.unionTeam",
         "cogs.userProfile",
         "cogs.router",
+        "cogs.gameSync",
     ]
 
     for ext in extensions:
@@ -59,9 +84,19 @@ async def load_cogs():
 
 async def main():
     init_db()
+    metrics.instrument_engine(engine)
+    metrics.instrument_discord(bot)
     async with bot:
         await load_cogs()
-        await bot.start(DISCORD_TOKEN)
+        metrics_runner = await metrics.start_server(METRICS_HOST, METRICS_PORT)
+        watchdog.start()
+        try:
+            await bot.start(DISCORD_TOKEN)
+        finally:
+            await watchdog.stop()
+            await client.close()
+            if metrics_runner:
+                await metrics_runner.cleanup()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,263 @@
+# metrics.py
+"""
+명령어 단위 계측.
+
+명령어 1회 = command span, 그 안에서 일어난 ER API / Gemini / DB / Discord REST 호출 = 하위 span.
+하위 span은 contextvars로 어느 명령어 안에서 일어났는지 알 수 있다
+(asyncio.to_thread 로 넘긴 작업도 컨텍스트가 복사되므로 같이 잡힌다).
+
+수집한 값은 GET /metrics 에서 Prometheus 텍스트 형식으로 내보낸다.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+PREFIX = "er_bot"
+
+# 초 단위 히스토그램 버킷
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# 현재 실행 중인 명령어 이름 (명령어 밖이면 "-")
+current_command: contextvars.ContextVar[str] = contextvars.ContextVar("current_command", default="-")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+# ────────────────────────────────────────────
+# 저장소
+# ────────────────────────────────────────────
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.total += 1
+        self.sum += value
+        for i, le in enumerate(BUCKETS):
+            if value <= le:
+                self.counts[i] += 1
+                break
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()  # Gemini 호출은 스레드에서 기록됨
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.help: Dict[str, str] = {}
+
+    def observe(self, metric: str, value: float, /, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            hist = self.histograms.setdefault(metric, {}).setdefault(key, Histogram())
+            hist.observe(value)
+
+    def inc(self, metric: str, value: float = 1, /, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(metric, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, metric: str, value: float, /, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.gauges.setdefault(metric, {})[key] = value
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for kind, store in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, series in sorted(store.items()):
+                    full = f"{PREFIX}_{name}"
+                    if name in self.help:
+                        lines.append(f"# HELP {full} {self.help[name]}")
+                    lines.append(f"# TYPE {full} {kind}")
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{full}{_fmt_labels(labels)} {value:g}")
+
+            for name, series in sorted(self.histograms.items()):
+                full = f"{PREFIX}_{name}"
+                if name in self.help:
+                    lines.append(f"# HELP {full} {self.help[name]}")
+                lines.append(f"# TYPE {full} histogram")
+                for labels, hist in sorted(series.items()):
+                    cumulative = 0
+                    for le, count in zip(BUCKETS, hist.counts):
+                        cumulative += count
+                        lines.append(f"{full}_bucket{_fmt_labels(labels + (('le', f'{le:g}'),))} {cumulative}")
+                    lines.append(f"{full}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {hist.total}")
+                    lines.append(f"{full}_sum{_fmt_labels(labels)} {hist.sum:.6f}")
+                    lines.append(f"{full}_count{_fmt_labels(labels)} {hist.total}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    def escape(v) -> str:
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+registry = Registry()
+registry.help.update({
+    "command_seconds": "명령어 전체 처리 시간",
+    "span_seconds": "명령어 안에서 일어난 외부 호출 시간 (kind=er_api|gemini|db|discord|image)",
+    "er_api_responses_total": "ER API 응답 수 (상태 코드별)",
+    "er_api_429_total": "ER API 429 응답 수",
+    "cache_requests_total": "캐시 조회 수 (result=hit|miss|merged)",
+    "loop_lag_seconds": "이벤트 루프 지연 (예정보다 늦게 깨어난 시간)",
+    "loop_lag_quantile_seconds": "최근 이벤트 루프 지연 백분위",
+    "loop_blocked_total": "이벤트 루프가 임계값 이상 멈춘 횟수",
+    "er_api_interval_seconds": "ER API 호출 간격 (429 이후 넓어졌다가 천천히 복구)",
+    "er_api_circuit_state": "ER API 서킷 브레이커 상태 (현재 상태만 1)",
+    "er_api_circuit_rejected_total": "서킷이 열려 있어 보내지 않은 ER API 호출 수",
+    "er_api_degraded_total": "ER API 장애로 캐시(result=cache) 또는 빈 응답(result=none)으로 답한 수",
+    "lobby_ocr_escalations_total": "대기분석 OCR을 다음(무거운) 모델로 넘긴 수 (stage=teams|crop)",
+    "commands_deduplicated_total": "연타로 들어와 앞선 같은 명령어 결과로 묶인 요청 수",
+    "job_queue_running": "작업 대기열에서 실행 중인 작업 수",
+    "job_queue_waiting": "작업 대기열에서 자리를 기다리는 작업 수",
+    "job_queue_wait_seconds": "작업이 대기열에서 자리를 얻기까지 기다린 시간",
+    "rank_crawls_cancelled_total": "중간에 멈춘 랭크 시즌 백그라운드 조회 수 (reason=timeout|superseded|unload)",
+})
+
+
+# ────────────────────────────────────────────
+# 기록 헬퍼
+# ────────────────────────────────────────────
+def observe_span(kind: str, name: str, seconds: float):
+    registry.observe("span_seconds", seconds, kind=kind, name=name, command=current_command.get())
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """with metrics.span("gemini", model): ... (동기/비동기 코드 모두 사용 가능)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_span(kind, name, time.perf_counter() - start)
+
+
+def cache_result(cache: str, hit: bool):
+    registry.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+# ── 명령어 span ────────────────────────────────
+
+def command_started(ctx) -> None:
+    """bot.before_invoke 에서 호출. 같은 태스크 안의 하위 span이 이 명령어로 묶인다."""
+    name = ctx.command.qualified_name if ctx.command else "-"
+    current_command.set(name)
+    ctx._metrics_started = time.perf_counter()
+
+
+def command_finished(ctx) -> None:
+    """bot.after_invoke 에서 호출 (명령어가 실패해도 호출됨)"""
+    started = getattr(ctx, "_metrics_started", None)
+    if started is None:
+        return
+    name = ctx.command.qualified_name if ctx.command else "-"
+    status = "error" if ctx.command_failed else "ok"
+    registry.observe("command_seconds", time.perf_counter() - started, command=name, status=status)
+
+
+# ── ER API (aiohttp 트레이스) ───────────────────
+
+# URL 경로 → 엔드포인트 이름 (ID가 들어간 부분은 잘라서 라벨 수를 고정)
+ER_ENDPOINTS = (
+    "/v1/user/nickname", "/v1/user/games/uid", "/v1/user/stats", "/v1/rank/uid",
+    "/v1/unionTeam/uid", "/v1/games", "/v2/data/Season",
+)
+
+
+def er_endpoint(path: str) -> str:
+    return next((p for p in ER_ENDPOINTS if path.startswith(p)), "other")
+
+
+async def _on_request_start(session, trace_ctx, params):
+    trace_ctx.start = time.perf_counter()
+
+
+async def _on_request_end(session, trace_ctx, params):
+    endpoint = er_endpoint(urlsplit(str(params.url)).path)
+    status = params.response.status
+    observe_span("er_api", endpoint, time.perf_counter() - trace_ctx.start)
+    registry.inc("er_api_responses_total", endpoint=endpoint, status=str(status))
+    if status == 429:
+        registry.inc("er_api_429_total", endpoint=endpoint, command=current_command.get())
+
+
+async def _on_request_exception(session, trace_ctx, params):
+    endpoint = er_endpoint(urlsplit(str(params.url)).path)
+    observe_span("er_api", endpoint, time.perf_counter() - trace_ctx.start)
+    registry.inc("er_api_responses_total", endpoint=endpoint, status="error")
+
+
+def er_trace_config() -> aiohttp.TraceConfig:
+    """ER API용 aiohttp 세션에 붙이는 트레이스 설정"""
+    tc = aiohttp.TraceConfig()
+    tc.on_request_start.append(_on_request_start)
+    tc.on_request_end.append(_on_request_end)
+    tc.on_request_exception.append(_on_request_exception)
+    return tc
+
+
+# ── DB (SQLAlchemy 이벤트) ─────────────────────
+
+def instrument_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_metrics_start")
+        if stack:
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "-"
+            observe_span("db", verb, time.perf_counter() - stack.pop())
+
+
+# ── Discord REST ──────────────────────────────
+
+def instrument_discord(bot):
+    """bot.http.request 를 감싸서 Discord REST 호출 시간을 잰다"""
+    http = bot.http
+    original = http.request
+
+    async def request(route, **kwargs):
+        with span("discord", f"{route.method} {route.path}"):
+            return await original(route, **kwargs)
+
+    http.request = request
+
+
+# ────────────────────────────────────────────
+# /metrics 엔드포인트
+# ────────────────────────────────────────────
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_server(host: str, port: int) -> Optional[web.AppRunner]:
+    """port가 0이면 서버를 띄우지 않는다"""
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[METRICS] http://{host}:{port}/metrics")
+    return runner
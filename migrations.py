@@ -0,0 +1,35 @@
+# migrations.py
+"""
+버전 순서대로 한 번씩만 적용되는 DB 마이그레이션 (db.init_db 에서 실행).
+
+새 nullable 컬럼과 인덱스는 모델에 선언만 하면 init_db 가 알아서 반영하므로,
+여기에는 기존 데이터를 고치거나 옮겨야 하는 변경만 적는다.
+이미 배포된 항목은 고치지 말고 새 버전을 추가할 것.
+
+    (버전, 이름, fn(conn))  — conn 은 트랜잭션 안의 Connection
+"""
+from sqlalchemy import text
+
+
+def _dedupe_er_accounts(conn):
+    """유저당 계정 1개 (유니크 인덱스 전에 가장 최근 등록만 남김)"""
+    conn.execute(text(
+        "DELETE FROM er_accounts WHERE id NOT IN ("
+        " SELECT MAX(id) FROM er_accounts GROUP BY user_id"
+        ")"
+    ))
+
+
+def _backfill_er_user_ids(conn):
+    """동기화 기록에 이미 있는 닉네임 → userId 로 등록 계정의 er_user_id 채우기 (API 호출 없이)"""
+    conn.execute(text(
+        "UPDATE er_accounts SET er_user_id = ("
+        " SELECT s.er_user_id FROM game_sync_states s WHERE s.nickname = er_accounts.nickname LIMIT 1"
+        ") WHERE er_user_id IS NULL"
+    ))
+
+
+MIGRATIONS = [
+    (1, "er_accounts 유저당 1계정으로 정리", _dedupe_er_accounts),
+    (2, "er_accounts.er_user_id 를 동기화 기록으로 채우기", _backfill_er_user_ids),
+]
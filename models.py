@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -24,8 +24,17 @@ class ERAccount(Base):
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     nickname = Column(String, nullable=False, unique=False)
     registered_at = Column(DateTime, default=datetime.now)
+    er_user_id = Column(String, nullable=True)          # 등록 시 조회한 ER userId (없으면 아직 모름)
+    verified_at = Column(DateTime, nullable=True)       # er_user_id / 닉네임을 마지막으로 확인한 시각
     
     user = relationship("User", back_populates="er_accounts")
+
+    __table_args__ = (
+        Index("ux_er_accounts_user_id", "user_id", unique=True),  # 유저당 계정 1개 (migrations 1)
+        Index("ix_er_accounts_nickname", "nickname"),
+        Index("ix_er_accounts_er_user_id", "er_user_id"),
+        Index("ix_er_accounts_verified_at", "verified_at"),
+    )
     
     def __repr__(self):
         return f"<ERAccount(nickname={self.nickname}, user_id={self.user_id})>"
@@ -39,4 +48,101 @@ class GuildConfig(Base):
     set_at = Column(DateTime, default=datetime.now)    # 최종 설정 일시
 
     def __repr__(self):
-        return f"<GuildConfig(guild_id={self.guild_id}, bot_channel_id={self.bot_channel_id})>"
\ No newline at end of file
+        return f"<GuildConfig(guild_id={self.guild_id}, bot_channel_id={self.bot_channel_id})>"
+
+class UserGame(Base):
+    """로컬에 저장된 유저 게임 기록 (userGames 응답 1행)"""
+    __tablename__ = "user_games"
+
+    er_user_id = Column(String, primary_key=True)       # ER userId
+    game_id = Column(BigInteger, primary_key=True)      # gameId (클수록 최신)
+    season_id = Column(Integer, nullable=True)
+    matching_mode = Column(Integer, nullable=True)
+    matching_team_mode = Column(Integer, nullable=True)
+    start_dtm = Column(String, nullable=True)
+
+    # 통계용 컬럼 (payload에서 추출)
+    character_num = Column(Integer, nullable=True)
+    skin_code = Column(Integer, nullable=True)
+    best_weapon = Column(Integer, nullable=True)
+    game_rank = Column(Integer, nullable=True)
+    player_kill = Column(Integer, nullable=True)
+    player_deaths = Column(Integer, nullable=True)
+    player_assistant = Column(Integer, nullable=True)
+    team_kill = Column(Integer, nullable=True)
+    duration = Column(Integer, nullable=True)
+    mmr_gain = Column(Integer, nullable=True)
+
+    payload = Column(Text, nullable=False)              # userGames 원본 JSON
+
+    __table_args__ = (
+        Index("ix_user_games_user_season", "er_user_id", "season_id"),
+        Index("ix_user_games_user_character", "er_user_id", "character_num"),
+        Index("ix_user_games_user_mode", "er_user_id", "matching_mode"),
+    )
+
+    def __repr__(self):
+        return f"<UserGame(er_user_id={self.er_user_id}, game_id={self.game_id})>"
+
+class GameSyncState(Base):
+    """유저별 게임 기록 동기화 상태"""
+    __tablename__ = "game_sync_states"
+
+    er_user_id = Column(String, primary_key=True)
+    nickname = Column(String, nullable=True, index=True)
+    newest_game_id = Column(BigInteger, nullable=True)  # 로컬에 있는 가장 최신 gameId
+    backfill_next = Column(BigInteger, nullable=True)   # 과거 기록 수집용 next 커서
+    backfill_done = Column(Boolean, default=False)      # 과거 기록 수집 완료 여부
+    gap_next = Column(BigInteger, nullable=True)        # 다 못 메운 공백(최신 ↔ 이전 최신 사이)을 이어서 메울 next 커서
+    gap_until = Column(BigInteger, nullable=True)       # 공백의 아래쪽 끝 gameId (여기 닿으면 다 메운 것)
+    synced_at = Column(DateTime, nullable=True)         # 최신 페이지 확인 시각
+    nickname_at = Column(DateTime, nullable=True)       # nickname → er_user_id 대응을 ER API / 계정 확인으로 확인한 시각
+
+    def __repr__(self):
+        return f"<GameSyncState(er_user_id={self.er_user_id}, newest_game_id={self.newest_game_id})>"
+
+class UserStatAggregate(Base):
+    """유저 / 시즌 / 캐릭터별 누적 통계 (게임 저장 시 증분 갱신)"""
+    __tablename__ = "user_stat_aggregates"
+
+    er_user_id = Column(String, primary_key=True)
+    season_id = Column(Integer, primary_key=True)       # userGames seasonId (일반 게임은 0)
+    character_num = Column(Integer, primary_key=True)
+    games = Column(Integer, default=0, nullable=False)
+    wins = Column(Integer, default=0, nullable=False)
+    top3 = Column(Integer, default=0, nullable=False)
+    kills = Column(Integer, default=0, nullable=False)
+    deaths = Column(Integer, default=0, nullable=False)
+    assists = Column(Integer, default=0, nullable=False)
+    rank_sum = Column(Integer, default=0, nullable=False)
+    duration_sum = Column(Integer, default=0, nullable=False)
+    skins = Column(Text, default="{}", nullable=False)  # {"스킨번호": 판수} JSON
+    updated_at = Column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"<UserStatAggregate(er_user_id={self.er_user_id}, season_id={self.season_id}, character_num={self.character_num}, games={self.games})>"
+
+class UnionTeamCache(Base):
+    """유니온 팀 조회 결과 캐시 (지난 시즌은 영구, 현재 시즌은 TTL)"""
+    __tablename__ = "union_team_caches"
+
+    er_user_id = Column(String, primary_key=True)
+    season_id = Column(Integer, primary_key=True)
+    teams = Column(Text, nullable=False)                # /unionTeam 응답 teams JSON
+    fetched_at = Column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"<UnionTeamCache(er_user_id={self.er_user_id}, season_id={self.season_id})>"
+
+class ApiResponseCache(Base):
+    """ER API 응답 캐시 (엔드포인트별 TTL, ETag/Last-Modified 재검증용)"""
+    __tablename__ = "api_response_caches"
+
+    key = Column(String, primary_key=True)              # 요청 URL + 정렬된 쿼리
+    body = Column(Text, nullable=False)                 # 응답 JSON
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    fetched_at = Column(DateTime, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f"<ApiResponseCache(key={self.key}, fetched_at={self.fetched_at})>"
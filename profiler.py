@@ -0,0 +1,214 @@
+# profiler.py
+"""
+느린 명령어 샘플링 프로파일러 (PROFILE_SLOW_MS > 0 일 때만 동작).
+
+명령어가 실행되는 동안
+  - 스레드 샘플: 별도 스레드가 PROFILE_INTERVAL_MS 마다 이벤트 루프 스레드와 작업 스레드
+    (asyncio.to_thread 로 넘긴 PIL / Gemini 작업)의 스택을 찍는다.
+    루프 스레드가 select 에 있으면 쉬는 중, 다른 곳에 있으면 루프를 막고 있는 것.
+  - await 샘플: 루프 안에서 명령어 태스크가 지금 무엇을 기다리는지(await 체인)를 찍는다.
+    API 대기 / DB / Gemini 대기를 구분할 수 있다.
+  - 루프 지연: 같은 주기에 sleep 이 얼마나 늦게 깨어나는지 잰다.
+
+명령어가 PROFILE_SLOW_MS 보다 오래 걸렸을 때만 PROFILE_DIR 에 결과를 남기고,
+파일은 최근 PROFILE_KEEP 개만 유지한다.
+스택은 flamegraph.pl / speedscope 에 바로 넣을 수 있는 folded 형식("a;b;c 횟수")으로 쓴다.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import PROFILE_SLOW_MS, PROFILE_DIR, PROFILE_KEEP, PROFILE_INTERVAL_MS
+
+MAX_DEPTH      = 48    # 스택 최대 깊이 (안쪽 프레임 기준)
+AWAIT_INTERVAL = 0.02  # await 샘플 / 루프 지연 측정 주기 (초)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _fold(frames) -> str:
+    """바깥 → 안쪽 순서의 프레임 목록을 folded 문자열로"""
+    return ";".join(_frame_label(f) for f in frames[-MAX_DEPTH:])
+
+
+def _thread_stack(frame) -> list:
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _is_idle_worker(frames) -> bool:
+    """일감을 기다리는 스레드풀 작업 스레드인지"""
+    top = frames[-1].f_code.co_name
+    return top == "_worker" or (
+        top in ("get", "wait", "acquire") and any(f.f_code.co_name == "_worker" for f in frames)
+    )
+
+
+class _Run:
+    """프로파일 중인 명령어 1회"""
+    def __init__(self, ctx, task: asyncio.Task):
+        self.command  = ctx.command.qualified_name if ctx.command else "-"
+        self.author   = str(getattr(ctx, "author", "-"))
+        self.content  = getattr(getattr(ctx, "message", None), "content", "") or ""
+        self.task     = task
+        self.started  = time.perf_counter()
+        self.thread_samples: Counter = Counter()
+        self.await_samples:  Counter = Counter()
+        self.lags: list = []
+
+
+class SlowCommandProfiler:
+    def __init__(self, threshold_ms: float, out_dir: str, keep: int, interval_ms: float):
+        self.threshold = threshold_ms / 1000
+        self.out_dir   = out_dir
+        self.keep      = keep
+        self.interval  = interval_ms / 1000
+        self._runs: Dict[int, _Run] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._probe: Optional[asyncio.Task] = None
+        self._loop_thread_id: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    # ── 명령어 훅 ──────────────────────────────
+
+    def command_started(self, ctx):
+        if not self.enabled:
+            return
+        run = _Run(ctx, asyncio.current_task())
+        with self._lock:
+            self._runs[id(ctx)] = run
+        self._loop_thread_id = threading.get_ident()
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._sample_threads, name="profiler", daemon=True)
+            self._sampler.start()
+        if self._probe is None or self._probe.done():
+            self._probe = asyncio.create_task(self._probe_loop())
+        self._wake.set()
+
+    async def command_finished(self, ctx):
+        if not self.enabled:
+            return
+        with self._lock:
+            run = self._runs.pop(id(ctx), None)
+        if run is None:
+            return
+        elapsed = time.perf_counter() - run.started
+        if elapsed >= self.threshold:
+            try:
+                path = await asyncio.to_thread(self._write, run, elapsed)
+                print(f"[PROFILE] {run.command} {elapsed * 1000:.0f}ms → {path}")
+            except OSError as e:
+                print(f"[PROFILE] 저장 실패: {e}")
+
+    # ── 샘플링 ─────────────────────────────────
+
+    def _sample_threads(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                runs = list(self._runs.values())
+            if not runs:
+                self._wake.clear()
+                self._wake.wait()
+                continue
+
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = _thread_stack(frame)
+                if not frames or _is_idle_worker(frames):
+                    continue
+                if ident == self._loop_thread_id:
+                    top = frames[-1].f_code.co_name
+                    prefix = "[loop idle]" if top in ("select", "poll", "epoll", "control") else "[loop]"
+                else:
+                    prefix = f"[thread {names.get(ident, ident)}]"
+                stacks.append(f"{prefix};{_fold(frames)}")
+
+            with self._lock:
+                for run in runs:
+                    run.thread_samples.update(stacks)
+            time.sleep(self.interval)
+
+    async def _probe_loop(self):
+        while True:
+            with self._lock:
+                runs = list(self._runs.values())
+            if not runs:
+                return
+            for run in runs:
+                if not run.task.done():
+                    run.await_samples[_fold(run.task.get_stack())] += 1
+
+            start = time.perf_counter()
+            await asyncio.sleep(AWAIT_INTERVAL)
+            lag = time.perf_counter() - start - AWAIT_INTERVAL
+            with self._lock:
+                for run in self._runs.values():
+                    run.lags.append(max(0.0, lag))
+
+    # ── 저장 ───────────────────────────────────
+
+    def _write(self, run: _Run, elapsed: float) -> str:
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        safe = "".join(c if c.isalnum() else "_" for c in run.command)
+        path = os.path.join(self.out_dir, f"{stamp}_{safe}_{elapsed * 1000:.0f}ms.txt")
+
+        lags = sorted(run.lags)
+        lines = [
+            f"# command: {run.command}",
+            f"# author: {run.author}",
+            f"# message: {run.content[:200]}",
+            f"# elapsed_ms: {elapsed * 1000:.1f}",
+            f"# thread_samples: {sum(run.thread_samples.values())} (interval {self.interval * 1000:g}ms)",
+            f"# await_samples: {sum(run.await_samples.values())} (interval {AWAIT_INTERVAL * 1000:g}ms)",
+        ]
+        if lags:
+            p95 = lags[min(len(lags) - 1, int(len(lags) * 0.95))]
+            lines.append(
+                f"# loop_lag_ms: mean={statistics.fmean(lags) * 1000:.1f} "
+                f"p95={p95 * 1000:.1f} max={lags[-1] * 1000:.1f}"
+            )
+        lines.append("")
+        lines.append("## threads (folded)")
+        lines += [f"{stack} {n}" for stack, n in run.thread_samples.most_common()]
+        lines.append("")
+        lines.append("## awaits (folded)")
+        lines += [f"{stack} {n}" for stack, n in run.await_samples.most_common()]
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self._rotate()
+        return path
+
+    def _rotate(self):
+        files = sorted(
+            (os.path.join(self.out_dir, f) for f in os.listdir(self.out_dir) if f.endswith(".txt")),
+            key=os.path.getmtime,
+        )
+        for old in files[:-self.keep] if self.keep > 0 else []:
+            os.remove(old)
+
+
+profiler = SlowCommandProfiler(PROFILE_SLOW_MS, PROFILE_DIR, PROFILE_KEEP, PROFILE_INTERVAL_MS)
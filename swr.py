@@ -0,0 +1,53 @@
+# swr.py
+"""
+명령어 응답 stale-while-revalidate 헬퍼.
+
+이전에 받아 둔 데이터가 SWR_MAX_AGE 안이면 명령어는 그 데이터로 바로 답하고(나이 표시),
+백그라운드에서 새로 받아 바뀐 게 있을 때만 보낸 메시지를 수정한다.
+"""
+import asyncio
+from typing import Coroutine, Set
+
+import discord
+
+SWR_MAX_AGE   = 3600  # 이보다 오래된 데이터는 기다려서 새로 받는다 (초)
+SWR_FRESH_AGE = 60    # 이보다 새로운 데이터는 나이 표시도, 백그라운드 갱신도 하지 않는다 (초)
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def age_text(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return "방금"
+    if seconds < 3600:
+        return f"{seconds // 60}분 전"
+    if seconds < 86400:
+        return f"{seconds // 3600}시간 전"
+    return f"{seconds // 86400}일 전"
+
+
+def mark_age(embed: discord.Embed, seconds: float) -> discord.Embed:
+    """푸터 끝에 데이터 나이를 붙인다"""
+    if seconds < SWR_FRESH_AGE:
+        return embed
+    footer = embed.footer.text or ""
+    embed.set_footer(
+        text=f"{footer} · ⏱ {age_text(seconds)} 기록" if footer else f"⏱ {age_text(seconds)} 기록",
+        icon_url=embed.footer.icon_url,
+    )
+    return embed
+
+
+def spawn(coro: Coroutine, name: str = None) -> asyncio.Task:
+    """백그라운드 갱신 실행 (참조를 들고 있다가 끝나면 정리, 예외는 로그만)"""
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+
+    def done(t: asyncio.Task):
+        _tasks.discard(t)
+        if not t.cancelled() and t.exception():
+            print(f"[SWR] 백그라운드 갱신 실패 ({t.get_name()}): {t.exception()!r}")
+
+    task.add_done_callback(done)
+    return task
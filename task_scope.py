@@ -0,0 +1,49 @@
+# task_scope.py
+"""
+수명이 정해진 백그라운드 태스크 묶음.
+
+View 같은 주인 객체가 스코프를 하나 들고 있다가, 주인이 끝나면(on_timeout 등)
+스코프를 닫아서 그 안에서 띄운 태스크를 한 번에 취소한다.
+취소된 ER API 호출은 호출 한도 대기열에서도 빠지므로 살아 있는 명령어에 한도가 돌아간다.
+"""
+import asyncio
+from typing import Coroutine, Set
+
+
+class TaskScope:
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    def spawn(self, coro: Coroutine, name: str = None) -> asyncio.Task:
+        """스코프에 묶인 태스크 실행 (예외는 로그만). 이미 닫힌 스코프면 바로 취소된 태스크"""
+        task = asyncio.create_task(coro, name=name or self.name)
+        if self.closed:
+            task.cancel()
+            return task
+        self._tasks.add(task)
+
+        def done(t: asyncio.Task):
+            self._tasks.discard(t)
+            if not t.cancelled() and t.exception():
+                print(f"[TASK] {self.name} 백그라운드 작업 실패 ({t.get_name()}): {t.exception()!r}")
+
+        task.add_done_callback(done)
+        return task
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def cancel(self):
+        """스코프를 닫고 남은 태스크를 모두 취소"""
+        self.closed = True
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def aclose(self):
+        """cancel() 후 태스크가 실제로 끝날 때까지 기다림"""
+        tasks = list(self._tasks)
+        self.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
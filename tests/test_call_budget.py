@@ -0,0 +1,131 @@
+# tests/test_call_budget.py
+import asyncio
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+import er_api
+from er_api import ERClient, UpstreamUnavailable
+
+
+async def _serve(handler):
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def _client(monkeypatch) -> ERClient:
+    api = ERClient("test", rate_per_sec=1)
+    monkeypatch.setattr(api, "_load_disk", lambda key: None)  # 디스크 캐시 쓰지 않음
+    monkeypatch.setattr(api, "_write_disk", lambda batch: None)
+    return api
+
+
+def test_queue_wait_does_not_count_against_budget(monkeypatch):
+    monkeypatch.setitem(er_api.CALL_BUDGETS, er_api.PRIORITY_COMMAND, 0.2)
+
+    async def handler(request):
+        return web.json_response({"ok": True})
+
+    async def scenario():
+        runner, base = await _serve(handler)
+        api = _client(monkeypatch)
+        try:
+            api.rl.next_slot = time.monotonic() + 0.5  # 예산보다 오래 줄을 선다
+            assert await api.get("/ping", base=base, ttl=0) == {"ok": True}
+        finally:
+            await api.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_budget_still_bounds_slow_request(monkeypatch):
+    monkeypatch.setitem(er_api.CALL_BUDGETS, er_api.PRIORITY_COMMAND, 0.2)
+
+    async def handler(request):
+        await asyncio.sleep(1)
+        return web.json_response({"ok": True})
+
+    async def scenario():
+        runner, base = await _serve(handler)
+        api = _client(monkeypatch)
+        try:
+            assert await api.get("/slow", base=base, ttl=0) is None
+            with pytest.raises(UpstreamUnavailable):
+                await api.get("/slow", base=base, ttl=0, degrade=False)
+        finally:
+            await api.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_fetch_user_id_tells_not_found_from_unavailable(monkeypatch):
+    async def handler(request):
+        nickname = request.query.get("query")
+        if nickname == "down":
+            return web.json_response({"code": 500}, status=500)
+        if nickname == "missing":
+            return web.json_response({"code": 404, "message": "Not Found"}, status=404)
+        return web.json_response({"code": 200, "user": {"userId": 42, "nickname": nickname}})
+
+    async def scenario():
+        runner, base = await _serve(handler)
+        api = _client(monkeypatch)
+        monkeypatch.setattr(api, "get", _with_base(api.get, base))
+        try:
+            assert await api.fetch_user_id("found") == "42"
+            assert await api.fetch_user_id("missing") is None
+            with pytest.raises(UpstreamUnavailable):
+                await api.fetch_user_id("down")
+        finally:
+            await api.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def _with_base(get, base):
+    async def wrapped(path, **kwargs):
+        return await get(path, base=base, **kwargs)
+    return wrapped
+
+
+def test_disk_cache_io_runs_off_event_loop(monkeypatch):
+    async def handler(request):
+        return web.json_response({"ok": True})
+
+    async def scenario():
+        runner, base = await _serve(handler)
+        api = _client(monkeypatch)
+        loop_thread = threading.get_ident()
+        threads, written = [], []
+
+        def load_disk(key):
+            threads.append(threading.get_ident())
+            return None
+
+        def write_disk(batch):
+            threads.append(threading.get_ident())
+            written.extend(batch)
+
+        monkeypatch.setattr(api, "_load_disk", load_disk)
+        monkeypatch.setattr(api, "_write_disk", write_disk)
+        try:
+            assert await api.get("/cached", base=base, ttl=60) == {"ok": True}
+        finally:
+            await api.close()  # 남은 쓰기까지 마무리
+            await runner.cleanup()
+
+        assert written == [api._key(base, "/cached", {})]
+        assert threads and loop_thread not in threads
+
+    asyncio.run(scenario())
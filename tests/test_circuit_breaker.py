@@ -0,0 +1,110 @@
+# tests/test_circuit_breaker.py
+import asyncio
+import time
+
+import pytest
+
+from er_api import CircuitBreaker, CircuitOpen, ERClient
+
+
+def _open_breaker(breaker: CircuitBreaker):
+    for _ in range(breaker.threshold):
+        breaker.failure()
+    assert breaker.state == "open"
+
+
+def _expire_cooldown(breaker: CircuitBreaker):
+    breaker.opened_at = time.monotonic() - breaker.cooldown - 1
+
+
+def test_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker(threshold=3, cooldown=10, cooldown_max=100)
+    assert breaker.allow()
+    _open_breaker(breaker)
+    assert not breaker.allow()
+    assert breaker.retry_in() > 0
+
+
+def test_half_open_allows_single_trial():
+    breaker = CircuitBreaker(threshold=3, cooldown=10, cooldown_max=100)
+    _open_breaker(breaker)
+    _expire_cooldown(breaker)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_trial_success_closes():
+    breaker = CircuitBreaker(threshold=3, cooldown=10, cooldown_max=100)
+    _open_breaker(breaker)
+    _expire_cooldown(breaker)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_trial_failure_reopens_with_longer_cooldown():
+    breaker = CircuitBreaker(threshold=3, cooldown=10, cooldown_max=100)
+    _open_breaker(breaker)
+    _expire_cooldown(breaker)
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+    assert breaker.cooldown == 20
+    assert not breaker.allow()
+
+
+def test_abandoned_trial_frees_slot():
+    breaker = CircuitBreaker(threshold=3, cooldown=10, cooldown_max=100)
+    _open_breaker(breaker)
+    _expire_cooldown(breaker)
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_cancelled_trial_request_does_not_wedge_breaker():
+    """한도 대기 중에 취소된 시험 호출이 서킷을 영구히 막지 않아야 한다"""
+    async def scenario():
+        api = ERClient("test", rate_per_sec=1)
+        try:
+            _open_breaker(api.breaker)
+            _expire_cooldown(api.breaker)
+            api.rl.next_slot = time.monotonic() + 5  # 시험 호출이 한도 대기에 걸리도록
+
+            task = asyncio.create_task(api._request("http://127.0.0.1:9", "/rank/uid/1", {}, 0))
+            await asyncio.sleep(0.05)
+            assert api.breaker.state == "half_open"
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            assert api.breaker.allow()
+        finally:
+            await api.close()
+
+    asyncio.run(scenario())
+
+
+def test_budget_timeout_during_trial_does_not_wedge_breaker():
+    async def scenario():
+        api = ERClient("test", rate_per_sec=1)
+        try:
+            _open_breaker(api.breaker)
+            _expire_cooldown(api.breaker)
+            api.rl.next_slot = time.monotonic() + 5
+
+            with pytest.raises(asyncio.TimeoutError):
+                async with asyncio.timeout(0.05):
+                    await api._request("http://127.0.0.1:9", "/rank/uid/1", {}, 0)
+
+            assert api.breaker.allow()
+            assert not api.breaker.allow()  # 다시 시험 호출 하나만
+            with pytest.raises(CircuitOpen):
+                await api._request("http://127.0.0.1:9", "/rank/uid/1", {}, 0)
+        finally:
+            await api.close()
+
+    asyncio.run(scenario())
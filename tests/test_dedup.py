@@ -0,0 +1,129 @@
+# tests/test_dedup.py
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+import dedup
+
+_ids = itertools.count(1)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.messages = {}
+
+    async def fetch_message(self, message_id):
+        if message_id not in self.messages:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+        return self.messages[message_id]
+
+
+class FakeMessage:
+    def __init__(self, channel: FakeChannel, content: str = ""):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.jump_url = f"https://discord.com/channels/1/1/{self.id}"
+        channel.messages[self.id] = self
+
+    async def delete(self):
+        self.channel.messages.pop(self.id, None)
+
+    async def add_reaction(self, emoji):
+        pass
+
+    async def remove_reaction(self, emoji, member):
+        pass
+
+
+class FakeContext:
+    def __init__(self, channel: FakeChannel, content: str):
+        self.channel = channel
+        self.message = FakeMessage(channel, content)
+        self.prefix = "ㅇ"
+        self.invoked_with = "전적"
+        self.command = SimpleNamespace(qualified_name="전적")
+        self.author = SimpleNamespace(id=42)
+        self.me = SimpleNamespace(id=1)
+        self.command_failed = False
+        self.replies = []
+
+    async def send(self, content=None, **kwargs):
+        msg = FakeMessage(self.channel, content or "")
+        self.replies.append(msg)
+        return msg
+
+    async def reply(self, content=None, **kwargs):
+        return await self.send(content, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    dedup._registry.clear()
+    yield
+    dedup._registry.clear()
+
+
+async def _run_duplicate(original: FakeContext, duplicate: FakeContext) -> str:
+    check = dedup.coalesce().predicate
+    with pytest.raises(dedup.DuplicateCommand):
+        await check(duplicate)
+    await asyncio.gather(*dedup._tasks)
+    return duplicate.replies[-1].content
+
+
+def test_points_to_result_when_loading_message_deleted():
+    async def scenario():
+        channel = FakeChannel()
+        original = FakeContext(channel, "ㅇ전적 닉네임")
+        assert await dedup.coalesce().predicate(original)
+        dedup.command_started(original)
+
+        loading = await original.reply("🔍 검색 중...")
+        await loading.delete()
+        result = await original.reply("결과")
+        dedup.command_finished(original)
+
+        text = await _run_duplicate(original, FakeContext(channel, "ㅇ전적 닉네임"))
+        assert result.jump_url in text
+        assert loading.jump_url not in text
+
+    asyncio.run(scenario())
+
+
+def test_marked_result_wins_over_later_replies():
+    async def scenario():
+        channel = FakeChannel()
+        original = FakeContext(channel, "ㅇ전적 닉네임")
+        assert await dedup.coalesce().predicate(original)
+        dedup.command_started(original)
+
+        result = await original.reply("결과")
+        dedup.mark_result(original, result)
+        await original.send("추가 안내")
+        dedup.command_finished(original)
+
+        text = await _run_duplicate(original, FakeContext(channel, "ㅇ전적 닉네임"))
+        assert result.jump_url in text
+
+    asyncio.run(scenario())
+
+
+def test_falls_back_to_command_message_when_every_reply_deleted():
+    async def scenario():
+        channel = FakeChannel()
+        original = FakeContext(channel, "ㅇ전적 닉네임")
+        assert await dedup.coalesce().predicate(original)
+        dedup.command_started(original)
+
+        loading = await original.reply("🔍 검색 중...")
+        await loading.delete()
+        dedup.command_finished(original)
+
+        text = await _run_duplicate(original, FakeContext(channel, "ㅇ전적 닉네임"))
+        assert original.message.jump_url in text
+
+    asyncio.run(scenario())
@@ -0,0 +1,341 @@
+# tools/mock_er_api.py
+"""
+ER Open API 로컬 대역 서버 (부하 테스트 / 회귀 테스트용).
+
+  python tools/mock_er_api.py --port 8080 --rps 1 --latency-ms 120
+  ER_API_BASE=http://127.0.0.1:8080 python main.py
+
+- fixtures 디렉터리에 녹화된 응답이 있으면 그대로 재생하고,
+  없으면 닉네임/유저 ID로 시드를 잡은 결정적 가짜 데이터를 만든다.
+- --record 를 주면 실제 API(ER_KEY 필요)로 요청을 넘기고 응답을 fixtures에 저장한다.
+- 200 응답에는 ETag를 붙이고, If-None-Match 가 같으면 304를 돌려준다.
+- GET /_mock/stats 로 엔드포인트별 호출 수, 429 / 304 횟수를 확인할 수 있다.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web, ClientSession
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data import Character_Names, Weapon_Types, CURRENT_SEASON_NUM  # noqa: E402
+
+REAL_API_BASE   = "https://open-api.bser.io"
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+ENDPOINTS = [
+    "/v1/user/nickname", "/v1/user/games/uid", "/v1/user/stats", "/v1/rank/uid",
+    "/v1/unionTeam/uid", "/v1/games", "/v2/data/Season",
+]
+
+GAMES_PER_PAGE = 10
+GAMES_PER_USER = 200
+
+
+# ────────────────────────────────────────────
+# 녹화 응답 (fixtures)
+# ────────────────────────────────────────────
+def fixture_key(path: str, query: dict) -> str:
+    raw = path + "?" + "&".join(f"{k}={query[k]}" for k in sorted(query))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class FixtureStore:
+    """{key}.json = {"path", "query", "status", "body"}"""
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.entries: dict[str, dict] = {}
+        if os.path.isdir(folder):
+            for fname in os.listdir(folder):
+                if not fname.endswith(".json"):
+                    continue
+                with open(os.path.join(folder, fname), encoding="utf-8") as f:
+                    entry = json.load(f)
+                self.entries[fixture_key(entry["path"], entry.get("query") or {})] = entry
+
+    def get(self, path: str, query: dict) -> dict | None:
+        return self.entries.get(fixture_key(path, query))
+
+    def save(self, path: str, query: dict, status: int, body):
+        os.makedirs(self.folder, exist_ok=True)
+        key = fixture_key(path, query)
+        entry = {"path": path, "query": query, "status": status, "body": body}
+        with open(os.path.join(self.folder, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=1)
+        self.entries[key] = entry
+
+
+# ────────────────────────────────────────────
+# 가짜 데이터 생성 (시드 고정 → 같은 요청엔 같은 응답)
+# ────────────────────────────────────────────
+def _rng(*seed) -> random.Random:
+    return random.Random(hashlib.md5("|".join(map(str, seed)).encode("utf-8")).hexdigest())
+
+
+def _user_id(nickname: str) -> str:
+    return "m" + hashlib.md5(nickname.encode("utf-8")).hexdigest()[:12]
+
+
+def _fake_game(user_id: str, game_id: int, nickname: str = None) -> dict:
+    r = _rng(user_id, game_id)
+    mode = r.choice([2, 3, 3, 3, 8])
+    rank = r.randint(1, 8)
+    kills = r.randint(0, 9)
+    mmr_before = r.randint(1000, 8000)
+    mmr_gain = r.randint(-60, 80) if mode == 3 else None
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=game_id % 500000)
+    game = {
+        "gameId": game_id,
+        "nickname": nickname or f"player{game_id % 1000}",
+        "accountLevel": r.randint(20, 400),
+        "seasonId": CURRENT_SEASON_NUM if mode != 2 else 0,
+        "matchingMode": mode,
+        "matchingTeamMode": 3,
+        "characterNum": r.choice(list(Character_Names)),
+        "skinCode": 1000000 + r.randint(0, 3),
+        "characterLevel": r.randint(10, 20),
+        "gameRank": rank,
+        "playerKill": kills,
+        "playerAssistant": r.randint(0, 12),
+        "playerDeaths": r.randint(0, 3),
+        "totalDeaths": r.randint(0, 3),
+        "teamKill": kills + r.randint(0, 10),
+        "monsterKill": r.randint(10, 60),
+        "bestWeapon": r.choice(list(Weapon_Types)),
+        "bestWeaponLevel": r.randint(10, 20),
+        "duration": r.randint(600, 1500),
+        "playTime": r.randint(600, 1500),
+        "botAdded": 0,
+        "damageToPlayer": r.randint(2000, 40000),
+        "damageFromPlayer": r.randint(2000, 40000),
+        "damageToMonster": r.randint(10000, 90000),
+        "craftUncommon": r.randint(0, 6), "craftRare": r.randint(0, 6),
+        "craftEpic": r.randint(0, 6), "craftLegend": r.randint(0, 4), "craftMythic": r.randint(0, 1),
+        "startDtm": start.strftime("%Y-%m-%dT%H:%M:%S.000+0000"),
+        "teamNumber": 1,
+    }
+    if mmr_gain is not None:
+        game.update(mmrBefore=mmr_before, mmrAfter=mmr_before + mmr_gain,
+                    mmrGain=mmr_gain, mmrAvg=r.randint(1000, 8000))
+    return game
+
+
+def _user_game_ids(user_id: str) -> list[int]:
+    base = int(user_id[1:9], 16) % 10**6 * 1000 + 40_000_000
+    return [base + GAMES_PER_USER - i for i in range(GAMES_PER_USER)]
+
+
+def fake_response(path: str, query: dict) -> tuple[int, dict]:
+    parts = [p for p in path.split("/") if p]
+    ok = {"code": 200, "message": "Success"}
+
+    if parts[:3] == ["v1", "user", "nickname"]:
+        nickname = query.get("query", "")
+        return 200, {**ok, "user": {"userId": _user_id(nickname), "nickname": nickname}}
+
+    if parts[:4] == ["v1", "user", "games", "uid"] and len(parts) == 5:
+        uid = parts[4]
+        ids = _user_game_ids(uid)
+        start = 0
+        if query.get("next"):
+            nxt = int(query["next"])
+            start = next((i for i, g in enumerate(ids) if g <= nxt), len(ids))
+        page = ids[start:start + GAMES_PER_PAGE]
+        body = {**ok, "userGames": [_fake_game(uid, g) for g in page]}
+        if start + GAMES_PER_PAGE < len(ids):
+            body["next"] = ids[start + GAMES_PER_PAGE]
+        return 200, body
+
+    if parts[:3] == ["v1", "rank", "uid"] and len(parts) == 6:
+        uid, season = parts[3], int(parts[4])
+        r = _rng(uid, season)
+        if r.random() < 0.3:
+            return 200, {**ok, "userRank": {"userId": uid, "mmr": 0, "rank": 0, "totalGames": 0}}
+        mmr = r.randint(600, 8400)
+        return 200, {**ok, "userRank": {
+            "userId": uid, "nickname": f"player-{uid[1:5]}", "mmr": mmr,
+            "rank": max(1, (8500 - mmr) * 7), "rankPercent": 0.1, "totalGames": r.randint(5, 400),
+        }}
+
+    if parts[:3] == ["v1", "user", "stats"] and len(parts) == 5:
+        r = _rng(parts[3], parts[4])
+        chars = r.sample(list(Character_Names), 6)
+        return 200, {**ok, "userStats": [{
+            "seasonId": int(parts[4]),
+            "characterStats": [
+                {"characterCode": c, "totalGames": r.randint(1, 300), "totalSecondsPlayed": r.randint(600, 300000)}
+                for c in chars
+            ],
+        }]}
+
+    if parts[:3] == ["v1", "unionTeam", "uid"] and len(parts) == 5:
+        r = _rng(parts[3], parts[4])
+        if r.random() < 0.5:
+            return 200, {**ok, "teams": []}
+        return 200, {**ok, "teams": [{
+            "tnm": f"팀{r.randint(1, 999)}", "ti": r.randint(10, 90),
+            "ssstw": r.randint(0, 3), "aaatw": r.randint(0, 10), "btw": r.randint(0, 20),
+            "cdt": 1735689600000, "udt": 1760000000000,
+        }]}
+
+    if parts[:2] == ["v1", "games"] and len(parts) == 3:
+        game_id = int(parts[2])
+        players = []
+        for i in range(24):
+            g = _fake_game(f"g{game_id}", game_id * 100 + i, nickname=f"player{i:02d}")
+            g.update(gameId=game_id, teamNumber=i // 3 + 1, gameRank=i // 3 + 1)
+            players.append(g)
+        return 200, {**ok, "userGames": players}
+
+    if parts[:3] == ["v2", "data", "Season"]:
+        seasons = []
+        start = datetime(2020, 1, 1)
+        for sid in range(1, CURRENT_SEASON_NUM + 1):
+            pre = sid >= 18 and sid % 2 == 0
+            seasons.append({
+                "seasonID": sid,
+                "seasonName": f"Pre-Season {sid}" if pre else f"Season {sid}",
+                "seasonStart": (start + timedelta(days=60 * sid)).strftime("%Y-%m-%d %H:%M:%S"),
+                "seasonEnd": (start + timedelta(days=60 * sid + 59)).strftime("%Y-%m-%d %H:%M:%S"),
+                "isCurrent": 1 if sid == CURRENT_SEASON_NUM else 0,
+            })
+        return 200, {**ok, "data": seasons}
+
+    return 404, {"code": 404, "message": "Not Found"}
+
+
+# ────────────────────────────────────────────
+# 서버
+# ────────────────────────────────────────────
+class MockERApi:
+    def __init__(self, args):
+        self.args = args
+        self.fixtures = FixtureStore(args.fixtures)
+        self.calls: Counter = Counter()
+        self.throttled: Counter = Counter()
+        self.not_modified: Counter = Counter()
+        self.windows: dict[str, deque] = {}   # api key → 최근 1초 요청 시각
+        self.rng = random.Random(args.seed)
+        self.session: ClientSession | None = None
+
+    @staticmethod
+    def endpoint_name(path: str) -> str:
+        """/v1/rank/uid/abc/37/3 → /v1/rank/uid (통계 집계용)"""
+        return next((p for p in ENDPOINTS if path.startswith(p)), path)
+
+    def _over_rate_limit(self, api_key: str) -> bool:
+        if self.args.rps <= 0:
+            return False
+        now = time.monotonic()
+        window = self.windows.setdefault(api_key, deque())
+        while window and now - window[0] >= 1.0:
+            window.popleft()
+        if len(window) >= self.args.rps:
+            return True
+        window.append(now)
+        return False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        path = request.path
+        query = dict(request.query)
+        endpoint = self.endpoint_name(path)
+        self.calls[endpoint] += 1
+
+        latency = max(0.0, self.args.latency_ms + self.rng.uniform(-1, 1) * self.args.jitter_ms) / 1000
+        if latency:
+            await asyncio.sleep(latency)
+
+        api_key = request.headers.get("x-api-key", "")
+        if self._over_rate_limit(api_key) or self.rng.random() < self.args.error_429_rate:
+            self.throttled[endpoint] += 1
+            return web.json_response(
+                {"code": 429, "message": "Too Many Requests"}, status=429,
+                headers={"Retry-After": "1"},
+            )
+
+        if self.args.record:
+            status, body = await self._proxy(path, query)
+            self.fixtures.save(path, query, status, body)
+            return web.json_response(body, status=status)
+
+        entry = self.fixtures.get(path, query)
+        if entry is not None:
+            status, body = entry["status"], entry["body"]
+        elif self.args.fixtures_only:
+            status, body = 404, {"code": 404, "message": "Not Found"}
+        else:
+            status, body = fake_response(path, query)
+        return self._respond(request, status, body)
+
+    def _respond(self, request: web.Request, status: int, body) -> web.Response:
+        """200 응답에는 ETag를 붙이고, If-None-Match가 같으면 304"""
+        if status != 200:
+            return web.json_response(body, status=status)
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified[self.endpoint_name(request.path)] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(body, status=status, headers={"ETag": etag})
+
+    async def _proxy(self, path: str, query: dict) -> tuple[int, dict]:
+        if self.session is None:
+            self.session = ClientSession(headers={"x-api-key": os.getenv("ER_KEY", "")})
+        async with self.session.get(f"{REAL_API_BASE}{path}", params=query or None) as r:
+            return r.status, await r.json(content_type=None)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "calls": dict(self.calls),
+            "throttled": dict(self.throttled),
+            "not_modified": dict(self.not_modified),
+            "total": sum(self.calls.values()),
+        })
+
+    async def reset(self, request: web.Request) -> web.Response:
+        self.calls.clear()
+        self.throttled.clear()
+        self.not_modified.clear()
+        return web.json_response({"ok": True})
+
+    async def on_cleanup(self, app):
+        if self.session:
+            await self.session.close()
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/_mock/stats", self.stats)
+        app.router.add_post("/_mock/reset", self.reset)
+        app.router.add_get("/{tail:v[12]/.*}", self.handle)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="ER Open API 로컬 대역 서버")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="녹화 응답 디렉터리")
+    p.add_argument("--fixtures-only", action="store_true", help="녹화 응답이 없으면 404 (가짜 데이터 생성 안 함)")
+    p.add_argument("--record", action="store_true", help="실제 API로 넘기고 응답을 녹화")
+    p.add_argument("--latency-ms", type=float, default=80.0, help="응답 지연 평균")
+    p.add_argument("--jitter-ms", type=float, default=30.0, help="응답 지연 편차")
+    p.add_argument("--rps", type=int, default=1, help="API 키별 초당 허용 요청 수 (0이면 제한 없음)")
+    p.add_argument("--error-429-rate", type=float, default=0.0, help="무작위 429 응답 비율 (0~1)")
+    p.add_argument("--seed", type=int, default=0)
+    return p.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    web.run_app(MockERApi(args).make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()